@@ -1,13 +1,51 @@
+import os
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import tempfile
+import time
 from datetime import datetime, date, timedelta
-from database import Database
+from database import DEFAULT_LEDGER_ID, Database
+from importer import import_upload, DEFAULT_BATCH_SIZE
+from categorize import (
+    MATCH_TYPES, add_category_rule, delete_category_rule, get_category_rules, recategorize
+)
+from export import export_transactions, FORMATS as EXPORT_FORMATS
+from recurring import (
+    FREQUENCIES, add_months, add_rule, delete_rule, get_rules, post_due, preview, projected_cash_flow
+)
+from money import to_cents, format_cents, format_cents_column
+from charts import GRANULARITIES, balance_figure, category_figure, load_figure, pick_granularity, trend_figure
+from archive import archive_all_ledgers, get_partitions
+from queries import (
+    get_categories, add_transaction, get_transactions_page_frame, count_transactions,
+    get_transactions_summary, set_budget, save_month_budgets, copy_budgets, get_budgets,
+    get_budget_vs_actual_frame, get_period_totals, month_bounds,
+    search_terms, search_transactions_frame, search_totals, get_ledgers, create_ledger
+)
 
 # Initialize database
-db = Database()
-db.initialize_database()
+# The Database (and its connection pool) is shared by every session and rerun
+@st.cache_resource(show_spinner=False)
+def get_database():
+    return Database()
+
+root_db = get_database()
+root_db.initialize_database()
+
+# Post recurring transactions that have come due in every ledger, once per process and day
+@st.cache_resource(show_spinner=False)
+def post_recurring(day):
+    return [post_due(root_db.for_ledger(ledger['id']), day) for ledger in get_ledgers(root_db)]
+
+post_recurring(date.today())
+
+# With ARCHIVE_KEEP_YEARS set, older years are moved to the archive in the
+# background, once per process and day
+@st.cache_resource(show_spinner=False)
+def archive_in_background(day):
+    keep_years = os.getenv('ARCHIVE_KEEP_YEARS')
+    return root_db.submit(archive_all_ledgers, int(keep_years), day) if keep_years else None
+
+archive_in_background(date.today())
 
 # Page configuration
 st.set_page_config(
@@ -36,110 +74,47 @@ st.markdown("""
 # App title
 st.markdown('<h1 class="main-header">💰 Personal Finance Tracker</h1>', unsafe_allow_html=True)
 
+# Every page reads and writes only the session's ledger. Ledgers are not an
+# access boundary: the sidebar picker lists and creates every ledger in the
+# database, so it is only shown with LEDGER_PICKER=1, for a single user. A
+# deployment serving several households runs one app per household, each
+# pinned with LEDGER_ID behind its own authentication.
+ledgers = {ledger['id']: ledger['name'] for ledger in get_ledgers(root_db)}
+if os.getenv('LEDGER_PICKER') == '1' and not os.getenv('LEDGER_ID'):
+    ledger_id = st.sidebar.selectbox("Ledger", list(ledgers), format_func=ledgers.get, key="ledger")
+    with st.sidebar.expander("New ledger"):
+        with st.form("new_ledger", clear_on_submit=True):
+            ledger_name = st.text_input("Name")
+            if st.form_submit_button("Create") and ledger_name.strip():
+                if create_ledger(root_db, ledger_name.strip()):
+                    st.rerun()
+                st.error("Could not create the ledger; the name may already be taken")
+else:
+    ledger_id = int(os.getenv('LEDGER_ID', DEFAULT_LEDGER_ID))
+    if ledger_id not in ledgers:
+        st.error(f"LEDGER_ID {ledger_id} is not a ledger in this database")
+        st.stop()
+db = root_db.for_ledger(ledger_id)
+
 # Sidebar navigation
 st.sidebar.title("Navigation")
-page = st.sidebar.radio("Go to", ["Dashboard", "Add Transaction", "View Transactions", "Budget Management", "Reports"])
-
-# Utility functions
-def get_categories(type_filter=None):
-    if type_filter:
-        query = "SELECT name FROM categories WHERE type = %s ORDER BY name"
-        result = db.execute_query(query, (type_filter,), fetch=True)
-        return [cat['name'] for cat in result] if result else []
-    else:
-        query = "SELECT name, type FROM categories ORDER BY type, name"
-        result = db.execute_query(query, fetch=True)
-        return result if result else []
-
-def add_transaction(amount, category, type, description, date):
-    query = """
-        INSERT INTO transactions (amount, category, type, description, date)
-        VALUES (%s, %s, %s, %s, %s)
-    """
-    return db.execute_query(query, (amount, category, type, description, date))
-
-def get_transactions(start_date=None, end_date=None):
-    query = "SELECT * FROM transactions"
-    params = []
-    
-    if start_date and end_date:
-        query += " WHERE date BETWEEN %s AND %s"
-        params.extend([start_date, end_date])
-    elif start_date:
-        query += " WHERE date >= %s"
-        params.append(start_date)
-    elif end_date:
-        query += " WHERE date <= %s"
-        params.append(end_date)
-    
-    query += " ORDER BY date DESC"
-    return db.execute_query(query, params, fetch=True)
-
-def get_transactions_summary(start_date=None, end_date=None):
-    query = """
-        SELECT 
-            type,
-            category,
-            SUM(amount) as total_amount,
-            COUNT(*) as transaction_count
-        FROM transactions
-    """
-    params = []
-    
-    if start_date and end_date:
-        query += " WHERE date BETWEEN %s AND %s"
-        params.extend([start_date, end_date])
-    elif start_date:
-        query += " WHERE date >= %s"
-        params.append(start_date)
-    elif end_date:
-        query += " WHERE date <= %s"
-        params.append(end_date)
-    
-    query += " GROUP BY type, category ORDER BY type, total_amount DESC"
-    return db.execute_query(query, params, fetch=True)
+pages = ["Dashboard", "Add Transaction", "Import", "View Transactions", "Budget Management", "Recurring",
+         "Reports"]
+# Diagnostics stays hidden unless SHOW_DIAGNOSTICS=1 or the URL has ?diagnostics=1
+if os.getenv('SHOW_DIAGNOSTICS') == '1' or st.query_params.get("diagnostics") == "1":
+    pages.append("Diagnostics")
+page = st.sidebar.radio("Go to", pages, key="page")
+render_started = time.perf_counter()
 
-def set_budget(category, amount, month):
-    # Check if budget already exists for this category and month
-    check_query = "SELECT id FROM budgets WHERE category = %s AND month = %s"
-    existing = db.execute_query(check_query, (category, month), fetch=True)
-    
-    if existing:
-        # Update existing budget
-        query = "UPDATE budgets SET amount = %s WHERE category = %s AND month = %s"
-        return db.execute_query(query, (amount, category, month))
-    else:
-        # Insert new budget
-        query = "INSERT INTO budgets (category, amount, month) VALUES (%s, %s, %s)"
-        return db.execute_query(query, (category, amount, month))
-
-def get_budgets(month=None):
-    query = "SELECT * FROM budgets"
-    params = []
-    
-    if month:
-        query += " WHERE month = %s"
-        params.append(month)
-    
-    query += " ORDER BY category"
-    return db.execute_query(query, params, fetch=True)
-
-def get_budget_vs_actual(month):
-    query = """
-        SELECT 
-            b.category,
-            b.amount as budget_amount,
-            COALESCE(SUM(CASE WHEN t.type = 'expense' THEN t.amount ELSE 0 END), 0) as actual_expenses
-        FROM budgets b
-        LEFT JOIN transactions t ON b.category = t.category 
-            AND DATE_FORMAT(t.date, '%Y-%m') = %s
-        WHERE b.month = %s
-        GROUP BY b.category, b.amount
-    """
-    return db.execute_query(query, (month, month), fetch=True)
+# pandas and plotly dominate a cold start, so each page imports only what it
+# draws with and pages without tables or charts never load them
 
 # Dashboard Page
 if page == "Dashboard":
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     st.header("Financial Dashboard")
     
     # Date filters
@@ -149,30 +124,43 @@ if page == "Dashboard":
     with col2:
         end_date = st.date_input("End Date", value=date.today())
     
-    # Get transactions summary
-    summary = get_transactions_summary(start_date, end_date)
+    # Totals and balances come from two prefix-sum lookups; the breakdowns from the summary
+    totals, summary, balance_chart = db.gather(
+        (get_period_totals, start_date, end_date),
+        (get_transactions_summary, start_date, end_date),
+        (balance_figure, start_date, end_date)
+    )
     
-    if summary:
-        # Calculate totals
-        total_income = sum(item['total_amount'] for item in summary if item['type'] == 'income')
-        total_expenses = sum(item['total_amount'] for item in summary if item['type'] == 'expense')
-        net_flow = total_income - total_expenses
+    if totals and totals['transaction_count']:
+        total_income = totals['income_cents']
+        total_expenses = totals['expense_cents']
+        net_flow = totals['net_cents']
+        # Charts plot dollars
+        summary_df = pd.DataFrame(summary or [], columns=['type', 'category', 'total_cents', 'transaction_count'])
+        summary_df['total'] = summary_df['total_cents'] / 100
         
         # Display metrics
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Income", f"${total_income:,.2f}")
+            st.metric("Total Income", format_cents(total_income))
         with col2:
-            st.metric("Total Expenses", f"${total_expenses:,.2f}")
+            st.metric("Total Expenses", format_cents(total_expenses))
         with col3:
-            st.metric("Net Cash Flow", f"${net_flow:,.2f}", delta_color="inverse" if net_flow < 0 else "normal")
+            st.metric("Net Cash Flow", format_cents(net_flow), delta_color="inverse" if net_flow < 0 else "normal")
+        with col4:
+            st.metric("Closing Balance", format_cents(totals['closing_balance_cents']))
+        
+        # Running balance, starting from the balance carried into the range
+        if balance_chart:
+            st.subheader("Running Balance")
+            st.plotly_chart(load_figure(balance_chart), use_container_width=True)
         
         # Income vs Expenses chart
         st.subheader("Income vs Expenses")
         fig = go.Figure()
         fig.add_trace(go.Bar(
             x=['Income', 'Expenses'],
-            y=[total_income, total_expenses],
+            y=[total_income / 100, total_expenses / 100],
             marker_color=['green', 'red']
         ))
         fig.update_layout(
@@ -183,24 +171,24 @@ if page == "Dashboard":
         st.plotly_chart(fig, use_container_width=True)
         
         # Expense breakdown
-        expense_data = [item for item in summary if item['type'] == 'expense']
-        if expense_data:
+        expense_data = summary_df[summary_df['type'] == 'expense']
+        if not expense_data.empty:
             st.subheader("Expense Breakdown")
             fig = px.pie(
                 expense_data, 
-                values='total_amount', 
+                values='total', 
                 names='category',
                 title="Expenses by Category"
             )
             st.plotly_chart(fig, use_container_width=True)
         
         # Income breakdown
-        income_data = [item for item in summary if item['type'] == 'income']
-        if income_data:
+        income_data = summary_df[summary_df['type'] == 'income']
+        if not income_data.empty:
             st.subheader("Income Breakdown")
             fig = px.pie(
                 income_data, 
-                values='total_amount', 
+                values='total', 
                 names='category',
                 title="Income by Category"
             )
@@ -221,7 +209,7 @@ elif page == "Add Transaction":
             transaction_date = st.date_input("Date", value=date.today())
         
         with col2:
-            categories = get_categories(transaction_type)
+            categories = get_categories(db, transaction_type)
             category = st.selectbox("Category", categories)
             description = st.text_input("Description")
         
@@ -229,7 +217,7 @@ elif page == "Add Transaction":
         
         if submitted:
             if amount > 0:
-                result = add_transaction(amount, category, transaction_type, description, transaction_date)
+                result = add_transaction(db, to_cents(amount), category, transaction_type, description, transaction_date)
                 if result:
                     st.success("Transaction added successfully!")
                 else:
@@ -237,10 +225,143 @@ elif page == "Add Transaction":
             else:
                 st.error("Amount must be greater than 0.")
 
+# Import Page
+elif page == "Import":
+    st.header("Import Bank Statement")
+    st.write(
+        "Upload a CSV (date, amount, category, type, description) or OFX/QFX export. "
+        "Rows that were already imported are skipped."
+    )
+    
+    tab_import, tab_rules = st.tabs(["Import Statement", "Category Rules"])
+
+    with tab_import:
+        with st.form("import_form"):
+            uploaded_file = st.file_uploader("Statement file", type=["csv", "ofx", "qfx"])
+            batch_size = st.number_input("Batch size", min_value=1, max_value=50000, value=DEFAULT_BATCH_SIZE, step=100)
+            submitted = st.form_submit_button("Import")
+        
+            if submitted:
+                if uploaded_file is None:
+                    st.error("Please choose a file to import.")
+                else:
+                    result = import_upload(db, uploaded_file, int(batch_size))
+                    if result is None:
+                        st.error("Import failed and was rolled back. Please check the file and try again.")
+                    else:
+                        st.success(
+                            f"Imported {result['inserted']} transactions "
+                            f"({result['rows_per_sec']:,.0f} rows/sec)."
+                        )
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            st.metric("Inserted", result['inserted'])
+                        with col2:
+                            st.metric("Already imported", result['duplicates'])
+                        with col3:
+                            st.metric("Rejected", result['rejected_count'])
+                        with col4:
+                            st.metric("Categorized by rules", result['categorized'])
+                    
+                        if result['rejected']:
+                            import pandas as pd
+
+                            st.subheader("Rejected Rows")
+                            st.dataframe(
+                                pd.DataFrame(result['rejected'], columns=['line', 'reason']),
+                                use_container_width=True,
+                                hide_index=True
+                            )
+
+    with tab_rules:
+        st.write(
+            "Statement lines without a category get the category of the highest-priority rule that "
+            "matches their description and amount."
+        )
+        category_rules = get_category_rules(db)
+        if category_rules:
+            for rule in category_rules:
+                amounts = ""
+                if rule['min_amount_cents'] is not None:
+                    amounts += f", from {format_cents(rule['min_amount_cents'])}"
+                if rule['max_amount_cents'] is not None:
+                    amounts += f", up to {format_cents(rule['max_amount_cents'])}"
+                col1, col2 = st.columns([5, 1])
+                with col1:
+                    st.write(
+                        f"{'Matches' if rule['match_type'] == 'regex' else 'Contains'} "
+                        f"`{rule['pattern']}` → **{rule['category']}** ({rule['type']}{amounts}), "
+                        f"priority {rule['priority']}"
+                    )
+                with col2:
+                    if st.button("Delete", key=f"delete_category_rule_{rule['id']}"):
+                        if delete_category_rule(db, rule['id']):
+                            st.rerun()
+                        else:
+                            st.error("Error deleting rule. Please try again.")
+        else:
+            st.info("No category rules yet.")
+
+        with st.form("category_rule_form"):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                pattern = st.text_input("Description contains")
+                match_type = st.radio("Match", MATCH_TYPES, horizontal=True,
+                                      format_func=lambda value: "Text" if value == 'contains' else "Regular expression")
+                priority = st.number_input("Priority", value=0, step=1, help="Higher priorities win")
+
+            with col2:
+                category_types = {category['name']: category['type'] for category in get_categories(db)}
+                rule_category = st.selectbox("Category", list(category_types),
+                                             format_func=lambda name: f"{name} ({category_types[name]})")
+                min_amount = st.number_input("Minimum amount ($, optional)", min_value=0.0, value=None,
+                                             step=0.01, format="%.2f")
+                max_amount = st.number_input("Maximum amount ($, optional)", min_value=0.0, value=None,
+                                             step=0.01, format="%.2f")
+
+            submitted = st.form_submit_button("Add Rule")
+
+            if submitted:
+                try:
+                    rule_id = add_category_rule(
+                        db, pattern, rule_category, match_type,
+                        to_cents(min_amount) if min_amount is not None else None,
+                        to_cents(max_amount) if max_amount is not None else None,
+                        int(priority)
+                    )
+                except ValueError as e:
+                    st.error(f"Invalid rule: {e}")
+                else:
+                    if rule_id:
+                        st.success("Rule added. It applies to new imports; re-categorize below to apply it to history.")
+                    else:
+                        st.error("Error adding rule. Please try again.")
+
+        st.subheader("Re-categorize History")
+        overwrite = st.checkbox(
+            "Also change transactions that already have a specific category",
+            help="By default only transactions in Other Income / Other Expense are changed"
+        )
+        if st.button("Re-categorize", disabled=not category_rules):
+            with st.spinner("Applying rules..."):
+                result = recategorize(db, overwrite=overwrite)
+            if result is None:
+                st.error("Re-categorizing failed. Batches finished before the error were kept.")
+            else:
+                st.success(
+                    f"Changed {result['changed']:,} of {result['scanned']:,} transactions "
+                    f"in {len(result['months'])} months."
+                )
+
 # View Transactions Page
 elif page == "View Transactions":
     st.header("View Transactions")
     
+    # Full-text search over descriptions; words match as prefixes
+    search = st.text_input("Search descriptions", key="view_search", placeholder="e.g. uber ride")
+    searching = bool(search_terms(search))
+    
     # Date filters
     col1, col2 = st.columns(2)
     with col1:
@@ -248,48 +369,115 @@ elif page == "View Transactions":
     with col2:
         end_date = st.date_input("End Date", key="view_end")
     
-    # Type filter
-    type_filter = st.selectbox("Filter by Type", ["All", "income", "expense"])
+    # Type, category and page size filters
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        type_filter = st.selectbox("Filter by Type", ["All", "income", "expense"])
+    with col2:
+        category_options = get_categories(db, type_filter) if type_filter != "All" else [
+            cat['name'] for cat in get_categories(db)
+        ]
+        category_filter = st.selectbox("Filter by Category", ["All"] + category_options)
+    with col3:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
     
-    # Get transactions
-    transactions = get_transactions(start_date, end_date)
+    filters = (
+        start_date,
+        end_date,
+        type_filter if type_filter != "All" else None,
+        category_filter if category_filter != "All" else None
+    )
     
-    if transactions:
-        # Convert to DataFrame for easier manipulation
-        df = pd.DataFrame(transactions)
-        
-        # Apply type filter
-        if type_filter != "All":
-            df = df[df['type'] == type_filter]
-        
-        # Format date and amount
-        df['date'] = pd.to_datetime(df['date']).dt.date
-        df['amount'] = df['amount'].apply(lambda x: f"${x:,.2f}")
+    # Keyset cursors for the pages seen so far; start over when the filters change
+    if st.session_state.get('view_filters') != (ledger_id, filters, search, page_size):
+        st.session_state['view_filters'] = (ledger_id, filters, search, page_size)
+        st.session_state['view_cursors'] = [None]
+    cursors = st.session_state['view_cursors']
+    
+    # Get one page of transactions, as a DataFrame built a column at a time, and the total count
+    # Count in the background while the page itself is fetched
+    if searching:
+        totals_future = db.submit(search_totals, search, *filters)
+        df = search_transactions_frame(db, search, *filters, after=cursors[-1], page_size=page_size)
+        search_summary = totals_future.result()
+        total = search_summary['transaction_count'] if search_summary else 0
+    else:
+        total_future = db.submit(count_transactions, *filters)
+        df = get_transactions_page_frame(db, *filters, after=cursors[-1], page_size=page_size)
+        total = total_future.result()
+        if total is None:
+            st.error("Error counting transactions. Please try again.")
+    
+    if df is not None and len(df):
+        # Format date and amount; only the rows on this page are ever formatted
+        df['date'] = df['date'].dt.date
+        df['amount'] = format_cents_column(df['amount_cents'])
         
         # Display transactions
+        first_row = (len(cursors) - 1) * page_size + 1
+        st.caption(f"Showing {first_row}-{first_row + len(df) - 1}" + (f" of {total}" if total is not None else ""))
+        if searching and search_summary:
+            st.caption(
+                f"Matching transactions total {format_cents(search_summary['income_cents'])} income "
+                f"and {format_cents(search_summary['expense_cents'])} expenses."
+            )
         st.dataframe(
             df[['date', 'type', 'category', 'amount', 'description']],
             use_container_width=True,
             hide_index=True
         )
         
-        # Export option
-        if st.button("Export to CSV"):
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name=f"transactions_{date.today()}.csv",
-                mime="text/csv"
-            )
+        # Page navigation
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Previous", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            # Without a total, a short page is the last one
+            last_page = len(df) < page_size if total is None else first_row + len(df) - 1 >= total
+            if st.button("Next", disabled=last_page):
+                cursors.append((df['date'].iloc[-1], int(df['id'].iloc[-1])))
+                st.rerun()
+        
+        # Export option; exports apply the filters but not the search
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            export_format = st.selectbox("Export format", list(EXPORT_FORMATS), format_func=str.upper)
+        if st.button("Export"):
+            # Stream to a temporary file so the export never sits in memory as a
+            # DataFrame; download_button only needs the finished file's bytes
+            with tempfile.TemporaryFile() as export_file:
+                try:
+                    count = export_transactions(db, export_file, export_format, *filters)
+                    error = "Error exporting transactions. Please try again."
+                except RuntimeError as e:
+                    count = None
+                    error = str(e)
+                if count is None:
+                    st.error(error)
+                else:
+                    export_file.seek(0)
+                    extension, mime = EXPORT_FORMATS[export_format]
+                    st.download_button(
+                        label=f"Download {count} transactions",
+                        data=export_file.read(),
+                        file_name=f"transactions_{date.today()}{extension}",
+                        mime=mime
+                    )
+    elif searching:
+        st.info(f"No transactions match \"{search}\" in the selected period.")
     else:
         st.info("No transactions found for the selected period.")
 
 # Budget Management Page
 elif page == "Budget Management":
+    import pandas as pd
+    import plotly.graph_objects as go
+
     st.header("Budget Management")
     
-    tab1, tab2 = st.tabs(["Set Budget", "View Budgets"])
+    tab1, tab_edit, tab2 = st.tabs(["Set Budget", "Edit Month", "View Budgets"])
     
     with tab1:
         st.subheader("Set Monthly Budget")
@@ -304,7 +492,7 @@ elif page == "Budget Management":
                 month = st.text_input("Month (YYYY-MM)", value=current_month)
             
             with col2:
-                expense_categories = get_categories("expense")
+                expense_categories = get_categories(db, "expense")
                 category = st.selectbox("Category", expense_categories)
             
             with col3:
@@ -314,7 +502,7 @@ elif page == "Budget Management":
             
             if submitted:
                 if amount > 0:
-                    result = set_budget(category, amount, month)
+                    result = set_budget(db, category, to_cents(amount), month)
                     if result:
                         st.success("Budget set successfully!")
                     else:
@@ -322,40 +510,97 @@ elif page == "Budget Management":
                 else:
                     st.error("Amount must be greater than 0.")
     
+    with tab_edit:
+        st.subheader("Edit a Whole Month")
+
+        edit_month = st.text_input("Month (YYYY-MM)", value=current_month, key="edit_month")
+        try:
+            previous_month = (month_bounds(edit_month)[0] - timedelta(days=1)).strftime("%Y-%m")
+        except ValueError:
+            st.error("Enter the month as YYYY-MM.")
+            previous_month = None
+
+        if previous_month:
+            # Copy last month's budgets in one statement
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                overwrite = st.checkbox("Overwrite existing budgets")
+            with col2:
+                if st.button(f"Copy budgets from {previous_month}"):
+                    if copy_budgets(db, previous_month, edit_month, overwrite):
+                        st.success(f"Copied budgets from {previous_month}.")
+                    else:
+                        st.error("Error copying budgets. Please try again.")
+
+            # Every expense category in one grid, saved in one transaction
+            month_budgets, expense_categories = db.gather(
+                (get_budgets, edit_month), (get_categories, "expense")
+            )
+            # Without the stored budgets the grid would show, and save, every amount as cleared
+            if month_budgets is None:
+                st.error("Error loading budgets. Please try again.")
+            else:
+                current = {budget['category']: budget['amount_cents'] / 100 for budget in month_budgets}
+                grid = pd.DataFrame({'category': expense_categories})
+                grid['amount'] = grid['category'].map(current)
+                edited = st.data_editor(
+                    grid,
+                    column_config={
+                        'category': st.column_config.TextColumn("Category", disabled=True),
+                        'amount': st.column_config.NumberColumn("Budget Amount ($)", min_value=0.0,
+                                                                step=0.01, format="%.2f")
+                    },
+                    hide_index=True,
+                    use_container_width=True,
+                    key=f"budget_grid_{edit_month}"
+                )
+                st.caption("Clear an amount to remove that category's budget.")
+
+                if st.button("Save month"):
+                    amounts = {
+                        row['category']: to_cents(row['amount']) if pd.notna(row['amount']) else None
+                        for row in edited.to_dict('records')
+                    }
+                    if save_month_budgets(db, edit_month, amounts):
+                        st.success(f"Saved budgets for {edit_month}.")
+                    else:
+                        st.error("Error saving budgets. Nothing was changed.")
+
     with tab2:
         st.subheader("View Budgets")
         
         # Month selection
         selected_month = st.text_input("View Month (YYYY-MM)", value=current_month)
         
-        # Get budgets for selected month
-        budgets = get_budgets(selected_month)
+        # Get budgets and budget vs actual for the selected month side by side
+        budgets, comp_df = db.gather(
+            (get_budgets, selected_month), (get_budget_vs_actual_frame, selected_month)
+        )
         
         if budgets:
             # Display budgets
             st.write(f"Budgets for {selected_month}")
             for budget in budgets:
-                st.write(f"- {budget['category']}: ${budget['amount']:,.2f}")
+                st.write(f"- {budget['category']}: {format_cents(budget['amount_cents'])}")
             
             # Budget vs Actual comparison
             st.subheader("Budget vs Actual")
-            comparison = get_budget_vs_actual(selected_month)
-            
-            if comparison:
-                comp_df = pd.DataFrame(comparison)
-                comp_df['difference'] = comp_df['budget_amount'] - comp_df['actual_expenses']
-                comp_df['status'] = comp_df['difference'].apply(
-                    lambda x: 'Under Budget' if x >= 0 else 'Over Budget'
-                )
+            if comp_df is not None and len(comp_df):
+                comp_df['difference_cents'] = comp_df['budget_cents'] - comp_df['actual_cents']
+                budget_text = format_cents_column(comp_df['budget_cents'])
+                actual_text = format_cents_column(comp_df['actual_cents'])
+                difference_text = format_cents_column(comp_df['difference_cents'])
                 
                 # Display comparison
-                for _, row in comp_df.iterrows():
-                    status_color = "green" if row['difference'] >= 0 else "red"
+                for category, budget_str, actual_str, difference_str, difference in zip(
+                    comp_df['category'], budget_text, actual_text, difference_text, comp_df['difference_cents']
+                ):
+                    status_color = "green" if difference >= 0 else "red"
                     st.write(
-                        f"- {row['category']}: "
-                        f"Budget: ${row['budget_amount']:,.2f}, "
-                        f"Actual: ${row['actual_expenses']:,.2f}, "
-                        f"Difference: <span style='color:{status_color}'>${row['difference']:,.2f}</span>",
+                        f"- {category}: "
+                        f"Budget: {budget_str}, "
+                        f"Actual: {actual_str}, "
+                        f"Difference: <span style='color:{status_color}'>{difference_str}</span>",
                         unsafe_allow_html=True
                     )
                 
@@ -363,13 +608,13 @@ elif page == "Budget Management":
                 fig = go.Figure()
                 fig.add_trace(go.Bar(
                     x=comp_df['category'],
-                    y=comp_df['budget_amount'],
+                    y=comp_df['budget_cents'] / 100,
                     name='Budget',
                     marker_color='blue'
                 ))
                 fig.add_trace(go.Bar(
                     x=comp_df['category'],
-                    y=comp_df['actual_expenses'],
+                    y=comp_df['actual_cents'] / 100,
                     name='Actual',
                     marker_color='orange'
                 ))
@@ -382,88 +627,266 @@ elif page == "Budget Management":
         else:
             st.info(f"No budgets set for {selected_month}.")
 
+# Recurring Page
+elif page == "Recurring":
+    import pandas as pd
+    import plotly.graph_objects as go
+
+    st.header("Recurring Transactions")
+
+    tab_rules, tab_add, tab_preview = st.tabs(["Rules", "Add Rule", "Preview"])
+
+    with tab_rules:
+        rules = get_rules(db)
+        if rules:
+            for rule in rules:
+                every = f"every {rule['interval_count']} " if rule['interval_count'] > 1 else ""
+                finished = rule['end_date'] and rule['next_date'] > rule['end_date']
+                col1, col2 = st.columns([5, 1])
+                with col1:
+                    st.write(
+                        f"**{rule['description']}** ({rule['category']}, {rule['type']}): "
+                        f"{format_cents(rule['amount_cents'])} {every}{rule['frequency']}, "
+                        + ("finished" if finished else f"next on {rule['next_date']}")
+                        + (f", until {rule['end_date']}" if rule['end_date'] and not finished else "")
+                    )
+                with col2:
+                    if st.button("Delete", key=f"delete_rule_{rule['id']}"):
+                        if delete_rule(db, rule['id']):
+                            st.rerun()
+                        else:
+                            st.error("Error deleting rule. Please try again.")
+            st.caption("Deleting a rule keeps the transactions it has already posted.")
+        else:
+            st.info("No recurring rules yet.")
+
+        if st.button("Post due transactions now"):
+            result = post_due(db)
+            if result is None:
+                st.error("Error posting recurring transactions. Nothing was written.")
+            else:
+                st.success(f"Posted {result['posted']} transactions from {result['rules']} due rules.")
+
+    with tab_add:
+        with st.form("recurring_form"):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                rule_type = st.radio("Type", ["income", "expense"], key="rule_type")
+                amount = st.number_input("Amount ($)", min_value=0.01, step=0.01, format="%.2f",
+                                         key="rule_amount")
+                frequency = st.selectbox("Repeats", FREQUENCIES, index=FREQUENCIES.index('monthly'))
+                interval_count = st.number_input("Every", min_value=1, value=1, step=1,
+                                                 help="e.g. 2 with weekly repeats every other week")
+
+            with col2:
+                category = st.selectbox("Category", get_categories(db, rule_type), key="rule_category")
+                description = st.text_input("Description", key="rule_description")
+                start = st.date_input("First date", value=date.today(), key="rule_start")
+                end = st.date_input("Last date (optional)", value=None, key="rule_end")
+
+            submitted = st.form_submit_button("Add Rule")
+
+            if submitted:
+                if not description:
+                    st.error("Enter a description.")
+                elif end and end < start:
+                    st.error("The last date is before the first date.")
+                else:
+                    rule_id = add_rule(db, description, category, rule_type, to_cents(amount), frequency,
+                                       start, end, int(interval_count))
+                    if rule_id:
+                        # Occurrences up to today are posted straight away
+                        result = post_due(db)
+                        posted = result['posted'] if result else 0
+                        st.success(f"Rule added. Posted {posted} transactions that were already due.")
+                    else:
+                        st.error("Error adding rule. Please try again.")
+
+    with tab_preview:
+        months_ahead = st.slider("Months ahead", min_value=1, max_value=24, value=6)
+        today = date.today()
+        until = add_months(today, months_ahead)
+
+        # Projections start from today's balance; nothing is written
+        upcoming, flow, totals = db.gather(
+            (preview, today, until),
+            (projected_cash_flow, today, until),
+            (get_period_totals, None, today)
+        )
+
+        if flow:
+            flow_df = pd.DataFrame(flow)
+            opening = totals['closing_balance_cents'] if totals else 0
+            flow_df['balance_cents'] = opening + flow_df['net_cents'].cumsum()
+
+            fig = go.Figure()
+            fig.add_trace(go.Bar(x=flow_df['month'], y=flow_df['income_cents'] / 100,
+                                 name='Income', marker_color='green'))
+            fig.add_trace(go.Bar(x=flow_df['month'], y=-flow_df['expense_cents'] / 100,
+                                 name='Expenses', marker_color='red'))
+            fig.add_trace(go.Scatter(x=flow_df['month'], y=flow_df['balance_cents'] / 100,
+                                     mode='lines+markers', name='Projected balance'))
+            fig.update_layout(
+                xaxis_title="Month",
+                yaxis_title="Amount ($)",
+                barmode='relative'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+            upcoming_df = pd.DataFrame(upcoming)
+            upcoming_df['amount'] = format_cents_column(upcoming_df['amount_cents'])
+            st.dataframe(
+                upcoming_df[['date', 'description', 'category', 'type', 'amount']],
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("No recurring transactions fall due in this period.")
+
 # Reports Page
 elif page == "Reports":
+    import pandas as pd
+
     st.header("Financial Reports")
     
     # Date range selection
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         start_date = st.date_input("Start Date", value=date.today().replace(day=1), key="report_start")
     with col2:
         end_date = st.date_input("End Date", value=date.today(), key="report_end")
+    with col3:
+        granularity = st.selectbox("Granularity", ["Auto"] + list(GRANULARITIES), key="report_granularity")
+    granularity = pick_granularity(start_date, end_date) if granularity == "Auto" else granularity
     
-    # Get transaction summary
-    summary = get_transactions_summary(start_date, end_date)
+    # The summary feeds the table; both charts come ready-built from the cache
+    summary, trend_chart, category_chart = db.gather(
+        (get_transactions_summary, start_date, end_date),
+        (trend_figure, start_date, end_date, granularity),
+        (category_figure, start_date, end_date)
+    )
     
     if summary:
-        # Convert to DataFrame
-        df = pd.DataFrame(summary)
-        
-        # Monthly trend chart
-        st.subheader("Monthly Trends")
-        
-        # Get monthly data
-        monthly_query = """
-            SELECT 
-                DATE_FORMAT(date, '%Y-%m') as month,
-                type,
-                SUM(amount) as total_amount
-            FROM transactions
-            WHERE date BETWEEN %s AND %s
-            GROUP BY month, type
-            ORDER BY month
-        """
-        monthly_data = db.execute_query(monthly_query, (start_date, end_date), fetch=True)
-        
-        if monthly_data:
-            monthly_df = pd.DataFrame(monthly_data)
-            
-            # Pivot the data
-            pivot_df = monthly_df.pivot(index='month', columns='type', values='total_amount').fillna(0)
-            
-            # Create line chart
-            fig = go.Figure()
-            if 'income' in pivot_df.columns:
-                fig.add_trace(go.Scatter(
-                    x=pivot_df.index,
-                    y=pivot_df['income'],
-                    mode='lines+markers',
-                    name='Income'
-                ))
-            if 'expense' in pivot_df.columns:
-                fig.add_trace(go.Scatter(
-                    x=pivot_df.index,
-                    y=pivot_df['expense'],
-                    mode='lines+markers',
-                    name='Expenses'
-                ))
-            fig.update_layout(
-                xaxis_title="Month",
-                yaxis_title="Amount ($)",
-                hovermode='x unified'
-            )
-            st.plotly_chart(fig, use_container_width=True)
+        # Income and expense trend
+        st.subheader("Trends")
+        if trend_chart:
+            st.caption(f"Totals per {granularity}")
+            st.plotly_chart(load_figure(trend_chart), use_container_width=True)
         
         # Category breakdown
         st.subheader("Category Breakdown")
-        
-        # Create treemap
-        fig = px.treemap(
-            df, 
-            path=['type', 'category'], 
-            values='total_amount',
-            color='type',
-            color_discrete_map={'income':'green', 'expense':'red'}
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        if category_chart:
+            st.plotly_chart(load_figure(category_chart), use_container_width=True)
         
         # Detailed summary table
         st.subheader("Detailed Summary")
+        df = pd.DataFrame(summary)
+        df['total_amount'] = format_cents_column(df['total_cents'])
         st.dataframe(
             df[['type', 'category', 'total_amount', 'transaction_count']],
             use_container_width=True,
             hide_index=True
         )
     else:
-        st.info("No transactions found for the selected period.")
\ No newline at end of file
+        st.info("No transactions found for the selected period.")
+
+# Diagnostics Page
+elif page == "Diagnostics":
+    import pandas as pd
+
+    st.header("Diagnostics")
+
+    profile = db.profiler.stats()
+    if not profile['enabled']:
+        st.info("Query profiling is disabled (DB_PROFILE=0).")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Queries", f"{profile['queries']['count']:,}")
+    with col2:
+        st.metric("Query p95", f"{profile['queries']['p95_ms']:,.1f} ms")
+    with col3:
+        st.metric("Connection wait p95", f"{profile['acquire']['p95_ms']:,.1f} ms")
+    with col4:
+        st.metric("Slow queries", f"{profile['slow_queries']:,}",
+                  help=f"Queries slower than {profile['slow_query_ms']:g} ms")
+
+    # Most expensive queries
+    st.subheader("Top Queries")
+    col1, col2 = st.columns(2)
+    with col1:
+        top_n = st.slider("Show", min_value=5, max_value=50, value=10, step=5)
+    with col2:
+        order_by = st.selectbox("Order by", ["total_ms", "mean_ms", "p95_ms", "max_ms", "count"])
+    top = db.profiler.top_queries(top_n, by=order_by)
+    if top:
+        st.dataframe(
+            pd.DataFrame(top)[['helper', 'count', 'total_ms', 'mean_ms', 'p95_ms', 'max_ms',
+                               'rows_per_call', 'acquire_ms', 'cache_hits', 'errors', 'query']],
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No queries recorded yet.")
+
+    # Latency distributions
+    histograms = db.profiler.histograms()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Query Latency")
+        latency_df = pd.DataFrame(histograms['latency'], columns=['bucket', 'queries'])
+        st.bar_chart(latency_df, x='bucket', y='queries')
+    with col2:
+        st.subheader("Connection Wait")
+        acquire_df = pd.DataFrame(histograms['acquire'], columns=['bucket', 'queries'])
+        st.bar_chart(acquire_df, x='bucket', y='queries')
+
+    # Page render times
+    st.subheader("Page Render Times")
+    timings = db.profiler.page_timings()
+    if timings:
+        st.dataframe(
+            pd.DataFrame(timings)[['page', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms']],
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No page renders recorded yet.")
+
+    # Slow query log
+    st.subheader("Recent Slow Queries")
+    if db.profiler.slow_queries:
+        st.dataframe(pd.DataFrame(list(db.profiler.slow_queries)[::-1]),
+                     use_container_width=True, hide_index=True)
+    else:
+        st.info("No slow queries recorded.")
+
+    # Years moved out of the transactions table
+    st.subheader("Archived Years")
+    partitions = get_partitions(db)
+    if partitions:
+        st.dataframe(
+            pd.DataFrame(partitions)[['year', 'row_count', 'min_date', 'max_date', 'version', 'path']],
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.info("No transactions have been archived.")
+
+    # Cache and pool state
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Query Cache")
+        st.json(db.cache_stats())
+    with col2:
+        st.subheader("Connection Pool")
+        st.json(db.pool_stats())
+
+    if st.button("Reset statistics"):
+        db.profiler.reset()
+        st.rerun()
+
+# Diagnostics renders are left out so viewing the page doesn't skew the numbers
+if page != "Diagnostics":
+    db.profiler.record_page(page, time.perf_counter() - render_started)
@@ -0,0 +1,720 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import date, datetime
+
+# Archival of closed years to compressed columnar files.
+#
+# The archive job moves a ledger's transactions of a closed year out of the
+# transactions table into one zstd-compressed Parquet file, sorted by
+# (date, id) in row groups whose min/max statistics let a date filter skip
+# most of the file. archived_partitions catalogs every file with its date
+# range, row count, totals and checksum, so readers pick the files a date
+# range needs without opening the others. The rollup and the daily
+# balances keep summarizing all of history; only the raw rows move.
+#
+# Archive files are never changed once written. Rows backdated into an
+# archived year land in the transactions table as usual; archiving the year
+# again writes a new version of its file holding the old rows and the new,
+# and the catalog row moves to it in the transaction that deletes them.
+#
+# Because the files are immutable, a backup hard-links them instead of
+# reading them again, and only the transactions table and the small tables
+# are dumped, from one consistent snapshot.
+
+# Columns of an archived transaction, in file order
+ARCHIVE_COLUMNS = "id, date, type, category, amount_cents, description, import_hash, created_at"
+
+CATALOG_COLUMNS = (
+    "ledger_id, year, version, path, min_date, max_date, row_count, income_cents, expense_cents, checksum"
+)
+
+# About a month of rows per row group, the unit a date filter can skip
+ROW_GROUP_SIZE = 16384
+FETCH_SIZE = 10000
+
+# By default everything before the current year is archived
+DEFAULT_KEEP_YEARS = 1
+
+# Tables a backup dumps besides transactions and the catalog; the rollup,
+# the daily balances and the search index are rebuilt on restore
+BACKUP_TABLES = ('ledgers', 'categories', 'budgets', 'recurring_rules', 'category_rules')
+BACKUP_FORMAT = 1
+MANIFEST = "manifest.json"
+
+def archive_dir():
+    """Return the directory archive files are kept in (ARCHIVE_DIR, default ./archive)"""
+    return os.getenv('ARCHIVE_DIR', 'archive')
+
+def partition_path(path):
+    """Return the file of a catalog path, which is relative to archive_dir()"""
+    return os.path.join(archive_dir(), path)
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("The transaction archive requires pyarrow (pip install pyarrow)")
+    return pa, ds, pq
+
+def _schema(pa):
+    return pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.date32()),
+        ('type', pa.string()),
+        ('category', pa.string()),
+        ('amount_cents', pa.int64()),
+        ('description', pa.string()),
+        ('import_hash', pa.string()),
+        ('created_at', pa.timestamp('us'))
+    ])
+
+def _checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _link_or_copy(source, target):
+    """Hard-link source to target, copying when they are on different file systems"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+def _partitions_query(ledger_id, start_date=None, end_date=None):
+    """Return the catalog query and params for a ledger's partitions overlapping the inclusive date range"""
+    query = f"SELECT {CATALOG_COLUMNS} FROM archived_partitions WHERE ledger_id = %s"
+    params = [ledger_id]
+    if start_date:
+        query += " AND max_date >= %s"
+        params.append(start_date)
+    if end_date:
+        query += " AND min_date <= %s"
+        params.append(end_date)
+    return query + " ORDER BY year", params
+
+def get_partitions(db, start_date=None, end_date=None):
+    """Return the ledger's archived partitions overlapping the inclusive date range, oldest first, or None on error"""
+    query, params = _partitions_query(db.ledger_id, start_date, end_date)
+    return db.execute_query(query, params, fetch=True, cache_tags=['archive'])
+
+def read_partitions(partitions, columns, start_date=None, end_date=None, type_filter=None, category=None,
+                    before=None, limit=None):
+    """Return the partitions' rows matching the View Transactions filters as one pyarrow Table.
+
+    Rows come back in (date, id) order. before is a (date, id) keyset bound
+    that only rows strictly below are kept under. Row groups whose
+    statistics rule out the date filter are never read; with limit only the
+    newest limit rows are returned, and row groups are read newest first
+    until they are found. Returns None on error.
+    """
+    try:
+        pa, ds, pq = _arrow()
+        clauses = []
+        if start_date:
+            clauses.append(ds.field('date') >= start_date)
+        if end_date:
+            clauses.append(ds.field('date') <= end_date)
+        if type_filter:
+            clauses.append(ds.field('type') == type_filter)
+        if category:
+            clauses.append(ds.field('category') == category)
+        if before:
+            before_date, before_id = before
+            clauses.append((ds.field('date') < before_date) |
+                           ((ds.field('date') == before_date) & (ds.field('id') < before_id)))
+        expression = None
+        for clause in clauses:
+            expression = clause if expression is None else expression & clause
+
+        paths = []
+        for partition in partitions:
+            path = partition_path(partition['path'])
+            if not os.path.exists(path):
+                print(f"Error reading archived transactions: {path} is missing (is ARCHIVE_DIR set?)")
+                return None
+            paths.append(path)
+        if limit is None:
+            tables = [pq.read_table(path, columns=columns, filters=expression) for path in paths]
+            return pa.concat_tables(tables) if tables else _schema(pa).empty_table().select(columns)
+
+        # Partitions hold disjoint years and row groups ascending dates, so
+        # reading both backwards meets the newest rows first
+        newest = []
+        found = 0
+        for path in reversed(paths):
+            fragment = next(iter(ds.dataset(path, format="parquet").get_fragments()))
+            for row_group in reversed(fragment.split_by_row_group(expression)):
+                table = row_group.to_table(columns=columns, filter=expression)
+                newest.append(table)
+                found += table.num_rows
+                if found >= limit:
+                    break
+            if found >= limit:
+                break
+        table = pa.concat_tables(newest[::-1]) if newest else _schema(pa).empty_table().select(columns)
+        return table.slice(max(0, table.num_rows - limit))
+    except (RuntimeError, OSError, ValueError) as e:
+        # Arrow's I/O and format errors subclass OSError and ValueError
+        print(f"Error reading archived transactions: {e}")
+        return None
+
+def archived_transactions(db, columns, start_date=None, end_date=None, type_filter=None, category=None,
+                          before=None, limit=None):
+    """Return archived rows matching the View Transactions filters as dicts, newest first, or None on error.
+
+    With limit only the newest limit rows are read. Limited reads are cached
+    until the next archive run.
+    """
+    upper = end_date
+    if before and (upper is None or before[0] < upper):
+        upper = before[0]
+    partitions = get_partitions(db, start_date, upper)
+    if not partitions:
+        return partitions
+
+    def read():
+        table = read_partitions(partitions, columns, start_date, end_date, type_filter, category, before, limit)
+        return table.to_pylist()[::-1] if table is not None else None
+
+    if limit is None:
+        return read()
+    key = ('archived_transactions', tuple(columns), start_date, end_date, type_filter, category, before, limit)
+    return db.cached(key, read, ['archive'])
+
+def count_archived(db, start_date=None, end_date=None, type_filter=None, category=None):
+    """Return the number of archived rows matching the View Transactions filters, or None on error.
+
+    Partitions wholly inside an unfiltered date range are counted from the
+    catalog without being read.
+    """
+    partitions = get_partitions(db, start_date, end_date)
+    if not partitions:
+        return 0 if partitions is not None else None
+
+    def count():
+        total = 0
+        for partition in partitions:
+            if (not type_filter and not category
+                    and (not start_date or partition['min_date'] >= start_date)
+                    and (not end_date or partition['max_date'] <= end_date)):
+                total += partition['row_count']
+                continue
+            table = read_partitions([partition], ['id'], start_date, end_date, type_filter, category)
+            if table is None:
+                return None
+            total += table.num_rows
+        return total
+
+    return db.cached(('count_archived', start_date, end_date, type_filter, category), count, ['archive'])
+
+def archived_totals(db, start_date, end_date, keys):
+    """Return SUM(amount_cents) and COUNT(*) of the archived rows in the inclusive range, grouped by keys.
+
+    Each row is a dict of the key columns plus total_cents and
+    transaction_count; a key may appear once per partition. Returns None on
+    error.
+    """
+    partitions = get_partitions(db, start_date, end_date)
+    if not partitions:
+        return partitions
+
+    def totals():
+        rows = []
+        for partition in partitions:
+            table = read_partitions([partition], list(keys) + ['amount_cents'], start_date, end_date)
+            if table is None:
+                return None
+            grouped = table.group_by(list(keys)).aggregate([('amount_cents', 'sum'), ('amount_cents', 'count')])
+            for row in grouped.to_pylist():
+                totals_row = {key: row[key] for key in keys}
+                totals_row['total_cents'] = row['amount_cents_sum']
+                totals_row['transaction_count'] = row['amount_cents_count']
+                rows.append(totals_row)
+        return rows
+
+    return db.cached(('archived_totals', start_date, end_date, tuple(keys)), totals, ['archive'])
+
+def archived_daily_totals(db):
+    """Return (ledger_id, date, type, category, total_cents, transaction_count) over every ledger's archive, or None on error"""
+    partitions = db.execute_query("SELECT ledger_id, path FROM archived_partitions ORDER BY ledger_id, year",
+                                  fetch=True)
+    if partitions is None:
+        return None
+    result = []
+    for partition in partitions:
+        table = read_partitions([partition], ['date', 'type', 'category', 'amount_cents'])
+        if table is None:
+            return None
+        grouped = table.group_by(['date', 'type', 'category']).aggregate(
+            [('amount_cents', 'sum'), ('amount_cents', 'count')]
+        )
+        result.extend(
+            (partition['ledger_id'], row['date'], row['type'], row['category'],
+             row['amount_cents_sum'], row['amount_cents_count'])
+            for row in grouped.to_pylist()
+        )
+    return result
+
+def archived_import_hashes(cursor, ledger_id, start_date, end_date):
+    """Return the import hashes of the ledger's archived rows in the inclusive range, or None on error.
+
+    The catalog is read through the caller's transaction cursor, so an
+    import neither needs a second connection nor races an archive run.
+    """
+    cursor.execute(*_partitions_query(ledger_id, start_date, end_date))
+    partitions = cursor.fetchall()
+    if not partitions:
+        return set()
+    table = read_partitions(partitions, ['import_hash'], start_date, end_date)
+    if table is None:
+        return None
+    return {value for value in table.column('import_hash').to_pylist() if value}
+
+def iter_archived_chunks(partitions, columns, start_date=None, end_date=None, type_filter=None, category=None,
+                         chunk_size=FETCH_SIZE):
+    """Yield the partitions' matching rows as lists of tuples in columns order, oldest first.
+
+    A partition that cannot be read raises RuntimeError.
+    """
+    for partition in partitions:
+        table = read_partitions([partition], columns, start_date, end_date, type_filter, category)
+        if table is None:
+            raise RuntimeError(f"Could not read archived transactions from {partition['path']}")
+        for batch in table.to_batches(chunk_size):
+            yield list(zip(*[column.to_pylist() for column in batch.columns]))
+
+def archive_year(db, year):
+    """Move the ledger's transactions of year from the transactions table into its archive file.
+
+    The rows are read, written out and deleted in one database transaction,
+    so no write to the year can slip in between. Returns a dict with year,
+    rows (moved out of the table), path and row_count (in the file), or None
+    on error.
+    """
+    from queries import transaction_write_tags
+
+    pa, ds, pq = _arrow()
+    schema = _schema(pa)
+    start, end = date(year, 1, 1), date(year + 1, 1, 1)
+    written = []
+    replaced = []
+
+    def work(cursor):
+        cursor.execute(
+            f"SELECT {CATALOG_COLUMNS} FROM archived_partitions WHERE ledger_id = %s AND year = %s FOR UPDATE",
+            (db.ledger_id, year)
+        )
+        previous = cursor.fetchall()
+        previous = previous[0] if previous else None
+
+        cursor.execute(
+            f"SELECT {ARCHIVE_COLUMNS} FROM transactions"
+            " WHERE ledger_id = %s AND date >= %s AND date < %s ORDER BY date, id FOR UPDATE",
+            (db.ledger_id, start, end)
+        )
+        batches = []
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            batches.append(pa.RecordBatch.from_arrays(
+                [pa.array([row[field.name] for row in rows], type=field.type) for field in schema],
+                schema=schema
+            ))
+        moved = sum(batch.num_rows for batch in batches)
+        if not moved:
+            return {'year': year, 'rows': 0, 'path': previous['path'] if previous else None,
+                    'row_count': previous['row_count'] if previous else 0}
+
+        version = previous['version'] + 1 if previous else 1
+        relative = f"ledger-{db.ledger_id}/transactions-{year}-v{version}.parquet"
+        path = partition_path(relative)
+        try:
+            table = pa.Table.from_batches(batches, schema=schema)
+            if previous:
+                # Never carry a damaged file forward into the new version
+                old_path = partition_path(previous['path'])
+                if _checksum(old_path) != previous['checksum']:
+                    raise db.Error(f"{previous['path']} does not match its checksum")
+                table = pa.concat_tables([pq.read_table(old_path, schema=schema), table])
+                table = table.sort_by([('date', 'ascending'), ('id', 'ascending')])
+                replaced.append(old_path)
+
+            dates = table.column('date')
+            min_date, max_date = dates[0].as_py(), dates[-1].as_py()
+            totals = {'income': 0, 'expense': 0}
+            for row in table.group_by('type').aggregate([('amount_cents', 'sum')]).to_pylist():
+                totals[row['type']] = row['amount_cents_sum']
+            table = table.replace_schema_metadata({
+                'ledger_id': str(db.ledger_id),
+                'year': str(year),
+                'min_date': min_date.isoformat(),
+                'max_date': max_date.isoformat(),
+                'row_count': str(table.num_rows)
+            })
+
+            # Written under a temporary name so a half-written file is never picked up
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            written.append(path)
+            pq.write_table(table, path + ".tmp", compression="zstd", row_group_size=ROW_GROUP_SIZE)
+            with open(path + ".tmp", "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            checksum = _checksum(path)
+        except (OSError, ValueError) as e:
+            raise db.Error(f"Could not write {relative}: {e}")
+
+        cursor.execute("DELETE FROM transactions WHERE ledger_id = %s AND date >= %s AND date < %s",
+                       (db.ledger_id, start, end))
+        if cursor.rowcount != moved:
+            raise db.Error(f"Deleted {cursor.rowcount} rows of {year} but archived {moved}")
+        if previous:
+            cursor.execute("DELETE FROM archived_partitions WHERE ledger_id = %s AND year = %s",
+                           (db.ledger_id, year))
+        cursor.execute(
+            f"INSERT INTO archived_partitions ({CATALOG_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            (db.ledger_id, year, version, relative, min_date, max_date, table.num_rows,
+             totals['income'], totals['expense'], checksum)
+        )
+        return {'year': year, 'rows': moved, 'path': relative, 'row_count': table.num_rows}
+
+    result = db.run_in_transaction(work)
+    if result is None:
+        for path in written:
+            for leftover in (path, path + ".tmp"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        return None
+    if result['rows']:
+        for path in replaced:
+            if os.path.exists(path):
+                os.remove(path)
+        months = [f"{year}-{month:02d}" for month in range(1, 13)]
+        db.invalidate(transaction_write_tags(months) + ['archive'])
+    return result
+
+def archive_closed_years(db, keep_years=DEFAULT_KEEP_YEARS, today=None):
+    """Archive the ledger's years before the last keep_years (the current one included).
+
+    Each year is archived in its own transaction. Returns the archive_year
+    results of the years that had rows to move, or None on error (years
+    already archived stay archived).
+    """
+    first_kept = (today or date.today()).year - keep_years + 1
+    oldest = db.execute_query(
+        "SELECT date FROM transactions WHERE ledger_id = %s AND date < %s ORDER BY date LIMIT 1",
+        (db.ledger_id, date(first_kept, 1, 1)), fetch=True
+    )
+    if oldest is None:
+        return None
+    results = []
+    for year in range(oldest[0]['date'].year, first_kept) if oldest else []:
+        result = archive_year(db, year)
+        if result is None:
+            return None
+        if result['rows']:
+            results.append(result)
+    return results
+
+def archive_all_ledgers(db, keep_years=DEFAULT_KEEP_YEARS, today=None):
+    """Run archive_closed_years for every ledger, returning {ledger_id: results}"""
+    from queries import get_ledgers
+
+    return {
+        ledger['id']: archive_closed_years(db.for_ledger(ledger['id']), keep_years, today)
+        for ledger in get_ledgers(db)
+    }
+
+def verify_archive(db):
+    """Return (ledger_id, year, problem) for every catalogued file that is missing or does not match the catalog"""
+    partitions = db.execute_query(
+        f"SELECT {CATALOG_COLUMNS} FROM archived_partitions ORDER BY ledger_id, year", fetch=True
+    )
+    if partitions is None:
+        return None
+    pa, ds, pq = _arrow()
+    problems = []
+    for partition in partitions:
+        path = partition_path(partition['path'])
+        try:
+            if _checksum(path) != partition['checksum']:
+                problems.append((partition['ledger_id'], partition['year'], "checksum mismatch"))
+                continue
+            rows = pq.ParquetFile(path).metadata.num_rows
+        except (OSError, ValueError) as e:
+            problems.append((partition['ledger_id'], partition['year'], str(e)))
+            continue
+        if rows != partition['row_count']:
+            problems.append((partition['ledger_id'], partition['year'],
+                             f"{rows} rows in file, {partition['row_count']} in catalog"))
+    return problems
+
+def backup(db, directory):
+    """Write a consistent backup of every ledger to the new directory.
+
+    The small tables, the transactions table and the archive catalog are
+    read in one snapshot and written as Parquet files; archive files are
+    hard-linked (or copied) rather than read. manifest.json, written last,
+    records each file's row count and checksum. Returns the manifest, or
+    None on error.
+    """
+    from migrations import latest_version
+
+    pa, ds, pq = _arrow()
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        print(f"Error creating backup directory: {e}")
+        return None
+
+    def dump(cursor, table, query, schema=None):
+        """Write a query's rows to table.parquet; without a schema they are read whole and their types inferred"""
+        cursor.execute(query)
+        names = [column[0] for column in cursor.description]
+        path = os.path.join(directory, f"{table}.parquet")
+        if schema is None:
+            columns = list(zip(*cursor.fetchall())) or [[] for _ in names]
+            data = pa.table({name: pa.array(list(column)) for name, column in zip(names, columns)})
+            pq.write_table(data, path, compression="zstd")
+            return {'file': f"{table}.parquet", 'rows': data.num_rows}
+
+        count = 0
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)],
+                    schema=schema
+                ))
+                count += len(rows)
+        return {'file': f"{table}.parquet", 'rows': count}
+
+    def work(cursor):
+        tables = {}
+        try:
+            for table in BACKUP_TABLES:
+                tables[table] = dump(cursor, table, f"SELECT * FROM {table} ORDER BY id")
+            schema = pa.schema([('ledger_id', pa.int64())] + list(_schema(pa)))
+            tables['transactions'] = dump(cursor, 'transactions',
+                                          f"SELECT ledger_id, {ARCHIVE_COLUMNS} FROM transactions", schema)
+        except (OSError, ValueError) as e:
+            raise db.Error(f"Could not write backup: {e}")
+        cursor.execute(f"SELECT {CATALOG_COLUMNS} FROM archived_partitions ORDER BY ledger_id, year")
+        names = [column[0] for column in cursor.description]
+        return tables, [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    snapshot = db.read_snapshot(work)
+    if snapshot is None:
+        return None
+    tables, partitions = snapshot
+
+    try:
+        for partition in partitions:
+            target = os.path.join(directory, "archive", partition['path'])
+            _link_or_copy(partition_path(partition['path']), target)
+            if _checksum(target) != partition['checksum']:
+                print(f"Error backing up {partition['path']}: the file does not match its checksum")
+                return None
+        for entry in tables.values():
+            entry['checksum'] = _checksum(os.path.join(directory, entry['file']))
+        manifest = {
+            'format': BACKUP_FORMAT,
+            'schema_version': latest_version(),
+            'created_at': datetime.now().isoformat(timespec="seconds"),
+            'tables': tables,
+            'partitions': [
+                dict(partition, min_date=partition['min_date'].isoformat(),
+                     max_date=partition['max_date'].isoformat())
+                for partition in partitions
+            ]
+        }
+        with open(os.path.join(directory, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+    except FileNotFoundError as e:
+        # The archive job replaced a file after the snapshot was read
+        print(f"Error backing up the archive, which changed during the backup (run it again): {e}")
+        return None
+    except OSError as e:
+        print(f"Error writing backup: {e}")
+        return None
+    return manifest
+
+def restore(db, directory, force=False):
+    """Replace the database's contents with the backup in directory.
+
+    Every file is checked against the manifest first, and a database that
+    already holds transactions is only overwritten with force. Archive
+    files are linked or copied into archive_dir(), the tables are refilled
+    in one transaction, and the rollup and daily balances are rebuilt.
+    Returns {table: rows restored}, or None on error.
+    """
+    from balances import rebuild_balances
+    from migrations import latest_version
+    from rollup import rebuild_rollup
+
+    pa, ds, pq = _arrow()
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading backup manifest: {e}")
+        return None
+    if manifest.get('format') != BACKUP_FORMAT or manifest.get('schema_version') != latest_version():
+        print(f"Backup is at schema version {manifest.get('schema_version')}, "
+              f"this database at {latest_version()}; restore it with a matching version")
+        return None
+
+    files = [entry['file'] for entry in manifest['tables'].values()]
+    checksums = [entry['checksum'] for entry in manifest['tables'].values()]
+    files += [os.path.join("archive", partition['path']) for partition in manifest['partitions']]
+    checksums += [partition['checksum'] for partition in manifest['partitions']]
+    try:
+        for file, checksum in zip(files, checksums):
+            if _checksum(os.path.join(directory, file)) != checksum:
+                print(f"Error restoring backup: {file} does not match its checksum")
+                return None
+    except OSError as e:
+        print(f"Error restoring backup: {e}")
+        return None
+
+    if not force:
+        existing = db.execute_query("SELECT id FROM transactions LIMIT 1", fetch=True)
+        archived = db.execute_query("SELECT id FROM archived_partitions LIMIT 1", fetch=True)
+        if existing is None or archived is None:
+            return None
+        if existing or archived:
+            print("Database already holds transactions; restore with force to replace them")
+            return None
+
+    try:
+        for partition in manifest['partitions']:
+            target = partition_path(partition['path'])
+            if os.path.exists(target) and _checksum(target) == partition['checksum']:
+                continue
+            if os.path.exists(target):
+                os.remove(target)
+            _link_or_copy(os.path.join(directory, "archive", partition['path']), target)
+    except OSError as e:
+        print(f"Error restoring archive files: {e}")
+        return None
+
+    def work(cursor):
+        counts = {}
+        with db.backend.bulk_load(cursor):
+            for table in ('transactions', 'archived_partitions', 'monthly_category_totals',
+                          'daily_balances') + BACKUP_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            for table, entry in manifest['tables'].items():
+                data = pq.ParquetFile(os.path.join(directory, entry['file']))
+                names = data.schema_arrow.names
+                query = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join(['%s'] * len(names))})"
+                for batch in data.iter_batches(batch_size=FETCH_SIZE):
+                    cursor.executemany(query, list(zip(*[column.to_pylist() for column in batch.columns])))
+                counts[table] = data.metadata.num_rows
+        if manifest['partitions']:
+            cursor.executemany(
+                f"INSERT INTO archived_partitions ({CATALOG_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                [
+                    (partition['ledger_id'], partition['year'], partition['version'], partition['path'],
+                     date.fromisoformat(partition['min_date']), date.fromisoformat(partition['max_date']),
+                     partition['row_count'], partition['income_cents'], partition['expense_cents'],
+                     partition['checksum'])
+                    for partition in manifest['partitions']
+                ]
+            )
+        counts['archived_partitions'] = len(manifest['partitions'])
+        return counts
+
+    counts = db.run_in_transaction(work)
+    if counts is None:
+        return None
+    db.cache.clear()
+    if rebuild_rollup(db) is None or rebuild_balances(db) is None:
+        return None
+    return counts
+
+def main(argv=None):
+    from database import Database
+    from queries import get_ledgers
+
+    parser = argparse.ArgumentParser(description="Archive closed years of transactions, and back up or restore the database")
+    parser.add_argument("--ledger", type=int, help="only this ledger (default: every ledger)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="archive every closed year")
+    run.add_argument("--keep-years", type=int, default=DEFAULT_KEEP_YEARS,
+                     help="recent years to keep in the transactions table, the current one included")
+    subparsers.add_parser("list", help="list the archived partitions")
+    subparsers.add_parser("verify", help="check every archive file against the catalog")
+    save = subparsers.add_parser("backup", help="write a consistent backup to a new directory")
+    save.add_argument("directory")
+    load = subparsers.add_parser("restore", help="replace the database's contents with a backup")
+    load.add_argument("directory")
+    load.add_argument("--force", action="store_true", help="overwrite a database that holds transactions")
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if not db.initialize_database():
+        return 1
+
+    try:
+        if args.command == "backup":
+            manifest = backup(db, args.directory)
+            if manifest is None:
+                return 1
+            print(f"Backed up {manifest['tables']['transactions']['rows']} transactions and "
+                  f"{len(manifest['partitions'])} archived partitions to {args.directory}")
+            return 0
+
+        if args.command == "restore":
+            counts = restore(db, args.directory, args.force)
+            if counts is None:
+                return 1
+            print(f"Restored {counts['transactions']} transactions and "
+                  f"{counts['archived_partitions']} archived partitions")
+            return 0
+
+        if args.command == "verify":
+            problems = verify_archive(db)
+            if problems is None:
+                return 1
+            for ledger_id, year, problem in problems:
+                print(f"ledger {ledger_id} {year}: {problem}")
+            print("Archive is consistent" if not problems else f"{len(problems)} damaged partitions")
+            return 0 if not problems else 1
+
+        ledger_ids = [args.ledger] if args.ledger else [ledger['id'] for ledger in get_ledgers(db)]
+        for ledger_id in ledger_ids:
+            scoped = db.for_ledger(ledger_id)
+            if args.command == "list":
+                partitions = get_partitions(scoped)
+                if partitions is None:
+                    return 1
+                for partition in partitions:
+                    print(f"ledger {ledger_id} {partition['year']}: {partition['row_count']:>9,} rows "
+                          f"{partition['min_date']}..{partition['max_date']}  {partition['path']}")
+                continue
+
+            results = archive_closed_years(scoped, args.keep_years)
+            if results is None:
+                return 1
+            for result in results:
+                print(f"ledger {ledger_id} {result['year']}: moved {result['rows']:,} transactions "
+                      f"to {result['path']} ({result['row_count']:,} rows)")
+        return 0
+    except RuntimeError as e:
+        print(str(e))
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,450 @@
+import os
+import re
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+# Storage backends for Database.
+#
+# The app's SQL is written in the MySQL dialect. Each backend knows how to
+# connect, create its base schema, and run that SQL, translating it first
+# where its own dialect differs (see SQLiteBackend.translate).
+
+# Base tables, per backend. Later changes go in migrations.py.
+MYSQL_SCHEMA = [
+    """
+        CREATE TABLE IF NOT EXISTS categories (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(50) UNIQUE NOT NULL,
+            type ENUM('income', 'expense') NOT NULL
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            amount DECIMAL(10, 2) NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            type ENUM('income', 'expense') NOT NULL,
+            description TEXT,
+            date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS budgets (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            category VARCHAR(50) NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            month VARCHAR(7) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+]
+
+# Declared types matter in SQLite: DATE, TIMESTAMP and DECIMAL columns are
+# converted back to date, datetime and Decimal when read
+SQLITE_SCHEMA = [
+    """
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(50) UNIQUE NOT NULL,
+            type TEXT NOT NULL CHECK (type IN ('income', 'expense'))
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            amount DECIMAL(10, 2) NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+            description TEXT,
+            date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS budgets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category VARCHAR(50) NOT NULL,
+            amount DECIMAL(10, 2) NOT NULL,
+            month VARCHAR(7) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """
+]
+
+def get_backend(name=None):
+    """Create the backend named by DB_BACKEND (mysql or sqlite)"""
+    name = (name or os.getenv('DB_BACKEND', 'mysql')).lower()
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        return SQLiteBackend()
+    raise ValueError(f"Unknown DB_BACKEND {name!r}; expected 'mysql' or 'sqlite'")
+
+class MySQLBackend:
+    """MySQL server accessed through mysql-connector-python"""
+
+    name = 'mysql'
+    schema = MYSQL_SCHEMA
+
+    def __init__(self):
+        import mysql.connector
+        from mysql.connector.constants import FieldType
+
+        self._connector = mysql.connector
+        self.Error = mysql.connector.Error
+        self.host = os.getenv('DB_HOST', 'localhost')
+        self.database = os.getenv('DB_NAME', 'finance_tracker')
+        self.user = os.getenv('DB_USER', 'root')
+        self.password = os.getenv('DB_PASSWORD', '')
+
+        # MySQL column types grouped by the kind of array fetch_arrays builds
+        self._kinds = {}
+        for kind, names in {
+            'decimal': ('DECIMAL', 'NEWDECIMAL'),
+            'int': ('TINY', 'SHORT', 'INT24', 'LONG', 'LONGLONG', 'YEAR'),
+            'float': ('FLOAT', 'DOUBLE'),
+            'date': ('DATE', 'NEWDATE'),
+            'datetime': ('DATETIME', 'TIMESTAMP')
+        }.items():
+            for type_name in names:
+                self._kinds[getattr(FieldType, type_name)] = kind
+
+    def connect(self):
+        try:
+            return self._connector.connect(
+                host=self.host,
+                database=self.database,
+                user=self.user,
+                password=self.password
+            )
+        except self.Error as e:
+            print(f"Error connecting to MySQL: {e}")
+            return None
+
+    def translate(self, query):
+        return query
+
+    def cursor(self, conn, dictionary=False, buffered=None):
+        return conn.cursor(dictionary=dictionary, buffered=buffered)
+
+    def begin(self, conn):
+        conn.start_transaction()
+
+    def begin_snapshot(self, conn):
+        conn.start_transaction(consistent_snapshot=True, readonly=True)
+
+    def is_healthy(self, conn):
+        try:
+            return conn.is_connected()
+        except self.Error:
+            return False
+
+    def finish_stream(self, conn):
+        # Drain anything the caller did not read so the connection can be reused
+        if conn.unread_result:
+            conn.consume_results()
+
+    def fetch_columns(self, conn, query, params, chunk_size):
+        """Return (names, kinds, columns) with raw bytes values, read in chunks"""
+        cursor = conn.cursor(raw=True)
+        try:
+            cursor.execute(query, params)
+            names = cursor.column_names
+            kinds = [self._kinds.get(column[1], 'text') for column in cursor.description]
+            columns = _read_columns(cursor, len(names), chunk_size)
+            return names, kinds, columns
+        finally:
+            cursor.close()
+
+    def explain(self, cursor, query, params):
+        cursor.execute("EXPLAIN " + query, params)
+        return cursor.fetchall()
+
+    def bulk_load(self, cursor):
+        """Context for replacing every transaction at once; InnoDB adds FULLTEXT entries at commit anyway"""
+        return nullcontext()
+
+    def text_search(self, terms, ledger_id=None, broad=False):
+        """Return (FROM clause, WHERE clause, param) for transactions whose description has every term as a word prefix"""
+        # The caller's WHERE clause filters by ledger, so ledger_id is not needed here.
+        # InnoDB ignores stopwords and words shorter than innodb_ft_min_token_size.
+        # MySQL always reads matches through the FULLTEXT index, so broad has no separate plan
+        return (
+            "transactions",
+            "MATCH(transactions.description) AGAINST (%s IN BOOLEAN MODE)",
+            " ".join(f"+{term}*" for term in terms)
+        )
+
+    def text_match_count(self, terms, ledger_id=None):
+        """Return (query, param) counting index matches for terms, or None when there is no cheaper plan to pick"""
+        return None
+
+def _read_columns(cursor, width, chunk_size):
+    columns = [[] for _ in range(width)]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return columns
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+
+# SQLite stores dates as ISO text and amounts as numbers; convert on the way
+# in and, for declared DATE/TIMESTAMP/DECIMAL columns, on the way out
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()))
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_DATE_FORMAT = re.compile(r"DATE_FORMAT\(\s*([^,()]+?)\s*,\s*('[^']*')\s*\)", re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\(\s*(\w+)\s*\)", re.IGNORECASE)
+# Row locks are implied: SQLite transactions begin IMMEDIATE and hold the write lock
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def translate_to_sqlite(query):
+    """Rewrite a MySQL-dialect query for SQLite"""
+    query = _DATE_FORMAT.sub(r"strftime(\2, \1)", query)
+    parts = _STRING_LITERAL.split(query)
+    # Odd-numbered parts are string literals and are left untouched
+    for i in range(0, len(parts), 2):
+        code = parts[i].replace("%s", "?")
+        code = _INSERT_IGNORE.sub("INSERT OR IGNORE", code)
+        code = _FOR_UPDATE.sub("", code)
+        match = _ON_DUPLICATE.search(code)
+        if match:
+            head, tail = code[:match.start()], code[match.end():]
+            code = head + "ON CONFLICT DO UPDATE SET" + _VALUES_REF.sub(r"excluded.\1", tail)
+        parts[i] = code
+    return "".join(parts)
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+class SQLiteCursor:
+    """sqlite3 cursor that accepts the app's MySQL-dialect SQL"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate_to_sqlite(query), params or ())
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(translate_to_sqlite(query), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+class SQLiteBackend:
+    """Embedded SQLite database file in WAL mode, for single-user installs and benchmarks"""
+
+    name = 'sqlite'
+    schema = SQLITE_SCHEMA
+    Error = sqlite3.Error
+
+    # Matches the plan lines of EXPLAIN QUERY PLAN, e.g.
+    # "SEARCH t USING INDEX idx_transactions_category_date (category=? AND date>? AND date<?)"
+    _PLAN_LINE = re.compile(
+        r"^(SCAN|SEARCH) (\S+)(?: AS \S+)?(?: USING (?:COVERING )?(?:INDEX (\S+)|(INTEGER PRIMARY KEY|PRIMARY KEY)))?"
+        r"(?: (VIRTUAL TABLE INDEX \S+))?"
+    )
+
+    def __init__(self):
+        self.path = os.getenv('DB_PATH', 'finance_tracker.db')
+
+    def connect(self):
+        try:
+            # Autocommit mode; Database starts explicit transactions where it needs them
+            conn = sqlite3.connect(
+                self.path,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None,
+                check_same_thread=False,
+                timeout=float(os.getenv('DB_BUSY_TIMEOUT', '5'))
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            return conn
+        except sqlite3.Error as e:
+            print(f"Error opening SQLite database {self.path}: {e}")
+            return None
+
+    def translate(self, query):
+        return translate_to_sqlite(query)
+
+    def cursor(self, conn, dictionary=False, buffered=None):
+        cursor = conn.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row
+        return SQLiteCursor(cursor)
+
+    def begin(self, conn):
+        # Take the write lock up front so a read-then-write transaction cannot deadlock
+        conn.execute("BEGIN IMMEDIATE")
+
+    def begin_snapshot(self, conn):
+        # In WAL mode a deferred transaction reads one snapshot from its
+        # first read on, without blocking writers
+        conn.execute("BEGIN")
+
+    def is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def finish_stream(self, conn):
+        pass
+
+    def fetch_columns(self, conn, query, params, chunk_size):
+        """Return (names, kinds, columns) with Python values, read in chunks"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(translate_to_sqlite(query), params or ())
+            names = [column[0] for column in cursor.description]
+            columns = _read_columns(cursor, len(names), chunk_size)
+            return names, [_infer_kind(values) for values in columns], columns
+        finally:
+            cursor.close()
+
+    def explain(self, cursor, query, params):
+        """Run EXPLAIN QUERY PLAN and shape each step like a MySQL EXPLAIN row"""
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        plan = []
+        for row in cursor.fetchall():
+            detail = row['detail']
+            match = self._PLAN_LINE.match(detail)
+            if not match:
+                continue
+            operation, table, index, primary_key, virtual = match.groups()
+            if virtual:
+                # An FTS5 MATCH, reported the way MySQL reports a FULLTEXT lookup
+                access = 'fulltext'
+            elif operation == 'SEARCH':
+                access = 'ref'
+            elif index or primary_key:
+                access = 'index'
+            else:
+                access = 'ALL'
+            plan.append({
+                'table': table,
+                'type': access,
+                'key': index or primary_key or virtual,
+                'rows': None,
+                'Extra': detail
+            })
+        return plan
+
+    @contextmanager
+    def bulk_load(self, cursor):
+        """Context for replacing every transaction at once in the caller's transaction.
+
+        The triggers keeping the full-text index in step are dropped inside
+        it and the index is rebuilt once at the end, which is several times
+        faster than updating it a row at a time.
+        """
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"
+            " AND name IN ('transactions_fts_insert', 'transactions_fts_delete')"
+        )
+        triggers = cursor.fetchall()
+        for trigger in triggers:
+            cursor.execute(f"DROP TRIGGER {trigger['name']}")
+        yield
+        cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+        for trigger in triggers:
+            cursor.execute(trigger['sql'])
+
+    def text_search(self, terms, ledger_id=None, broad=False):
+        """Return (FROM clause, WHERE clause, param) for transactions whose description has every term as a word prefix.
+
+        By default every match is looked up and sorted, which is cheap when
+        few rows match. A broad search instead walks transactions in date
+        order, checking each row against the matches, and stops once a page
+        is filled. With ledger_id the index itself is narrowed to that
+        ledger's rows; the caller filters by ledger either way.
+        """
+        # transactions_fts is an external-content FTS5 index kept in step by triggers
+        param = _fts_match(terms, ledger_id)
+        if broad:
+            # The unary + keeps SQLite from looking rows up by id, so it scans the date index instead
+            return (
+                "transactions",
+                "+transactions.id IN (SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH %s)",
+                param
+            )
+        # CROSS JOIN pins the index as the outer loop; otherwise with date or type
+        # filters SQLite may walk transactions and query the index once per row
+        return (
+            "transactions_fts CROSS JOIN transactions ON transactions.id = transactions_fts.rowid",
+            "transactions_fts MATCH %s",
+            param
+        )
+
+    def text_match_count(self, terms, ledger_id=None):
+        """Return (query, param) counting index matches for terms, or None when there is no cheaper plan to pick"""
+        return (
+            "SELECT COUNT(*) AS matches FROM transactions_fts WHERE transactions_fts MATCH %s",
+            _fts_match(terms, ledger_id)
+        )
+
+def _fts_match(terms, ledger_id=None):
+    """Return an FTS5 query for rows with every term as a word prefix, in one ledger if given"""
+    # ledger_id is indexed too, so the terms must be confined to the
+    # description column or a numeric term would match the ledger token
+    prefixes = " ".join(f'"{term}"*' for term in terms)
+    prefixes = f'description : ({prefixes})'
+    if ledger_id is None:
+        return prefixes
+    # The ledger is indexed as a token of its own, so FTS5 intersects the
+    # term postings with one ledger's instead of reading every ledger's matches
+    return f'ledger_id : "{int(ledger_id)}" AND {prefixes}'
+
+def _infer_kind(values):
+    """Pick an array kind for a column of SQLite values from the Python types present"""
+    types = {type(value) for value in values if value is not None}
+    if types == {Decimal}:
+        return 'decimal'
+    if types <= {int, bool} and types:
+        return 'int'
+    if types <= {int, float, Decimal} and types:
+        return 'float'
+    if types == {datetime}:
+        return 'datetime'
+    if types == {date}:
+        return 'date'
+    return 'text'
@@ -0,0 +1,240 @@
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date
+
+# daily_balances holds one row per ledger and day that has transactions: the day's
+# income, expenses and count, plus running (prefix) sums of each up to and
+# including that day within the ledger. Totals for any date range are then the difference of
+# two prefix rows, and the running balance is the cumulative income minus
+# the cumulative expenses, so neither needs a scan of transactions. Rows
+# moved to the archive (see archive.py) stay counted.
+
+# Exclusive upper bound for the last shifted range of prefix sums
+_END_OF_TIME = date.max
+
+PREFIX_COLUMNS = "cumulative_income_cents, cumulative_expense_cents, cumulative_count"
+
+INSERT_DAY_QUERY = f"""
+    INSERT INTO daily_balances (ledger_id, date, income_cents, expense_cents, transaction_count, {PREFIX_COLUMNS})
+    VALUES (%s, %s, 0, 0, 0, %s, %s, %s)
+"""
+
+ADD_TO_DAY_QUERY = """
+    UPDATE daily_balances
+    SET income_cents = income_cents + %s,
+        expense_cents = expense_cents + %s,
+        transaction_count = transaction_count + %s
+    WHERE ledger_id = %s AND date = %s
+"""
+
+SHIFT_PREFIX_QUERY = """
+    UPDATE daily_balances
+    SET cumulative_income_cents = cumulative_income_cents + %s,
+        cumulative_expense_cents = cumulative_expense_cents + %s,
+        cumulative_count = cumulative_count + %s
+    WHERE ledger_id = %s AND date >= %s AND date < %s
+"""
+
+DAILY_TOTALS_QUERY = """
+    SELECT
+        ledger_id,
+        date,
+        SUM(CASE WHEN type = 'income' THEN amount_cents ELSE 0 END) as income_cents,
+        SUM(CASE WHEN type = 'expense' THEN amount_cents ELSE 0 END) as expense_cents,
+        COUNT(*) as transaction_count
+    FROM transactions
+    GROUP BY ledger_id, date
+"""
+
+REBUILD_QUERY = f"""
+    INSERT INTO daily_balances (ledger_id, date, income_cents, expense_cents, transaction_count, {PREFIX_COLUMNS})
+    SELECT
+        ledger_id,
+        date,
+        income_cents,
+        expense_cents,
+        transaction_count,
+        SUM(income_cents) OVER (PARTITION BY ledger_id ORDER BY date),
+        SUM(expense_cents) OVER (PARTITION BY ledger_id ORDER BY date),
+        SUM(transaction_count) OVER (PARTITION BY ledger_id ORDER BY date)
+    FROM ({DAILY_TOTALS_QUERY}) daily
+"""
+
+def apply_to_balances(cursor, ledger_id, rows):
+    """Add a ledger's freshly inserted (amount_cents, type, date) rows to its daily balances"""
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for cents, type, day in rows:
+        delta = deltas[day]
+        delta[0 if type == 'income' else 1] += cents
+        delta[2] += 1
+    apply_daily_totals(cursor, ledger_id, deltas)
+
+def apply_daily_totals(cursor, ledger_id, deltas):
+    """Add {date: [income_cents, expense_cents, count]} to a ledger's daily balances.
+
+    Days not seen before get a row carrying the prefix sums of the day
+    before them. Each day's own totals are then added, and the prefix sums
+    of every later day are shifted once: the rows between two consecutive
+    touched days all move by the same running delta, so one range UPDATE
+    per touched day covers them.
+
+    Balance writes to one ledger are serialized on its ledgers row, and the
+    prefix rows are read with locking reads, which see the latest committed
+    sums rather than the transaction's snapshot. Otherwise two concurrent
+    writers on MySQL could each insert a day carrying prefix sums without
+    the other's delta.
+    """
+    if not deltas:
+        return
+
+    days = sorted(deltas)
+    cursor.execute("SELECT id FROM ledgers WHERE id = %s FOR UPDATE", (ledger_id,))
+    cursor.fetchall()
+    cursor.execute(
+        f"SELECT date, {PREFIX_COLUMNS} FROM daily_balances"
+        " WHERE ledger_id = %s AND date <= %s ORDER BY date DESC LIMIT 1 FOR UPDATE",
+        (ledger_id, days[0])
+    )
+    before = cursor.fetchall()
+    cursor.execute(
+        f"SELECT date, {PREFIX_COLUMNS} FROM daily_balances"
+        " WHERE ledger_id = %s AND date > %s AND date <= %s ORDER BY date FOR UPDATE",
+        (ledger_id, days[0], days[-1])
+    )
+    existing = before + cursor.fetchall()
+    known = {row['date'] for row in existing}
+
+    # Prefix sums as they stand before this batch, for each new day
+    new_rows = []
+    prefix = (0, 0, 0)
+    position = 0
+    for day in days:
+        while position < len(existing) and existing[position]['date'] <= day:
+            row = existing[position]
+            prefix = (int(row['cumulative_income_cents']), int(row['cumulative_expense_cents']),
+                      int(row['cumulative_count']))
+            position += 1
+        if day not in known:
+            new_rows.append((ledger_id, day) + prefix)
+    if new_rows:
+        cursor.executemany(INSERT_DAY_QUERY, new_rows)
+
+    cursor.executemany(ADD_TO_DAY_QUERY, [tuple(deltas[day]) + (ledger_id, day) for day in days])
+
+    shifts = []
+    running = [0, 0, 0]
+    for day, next_day in zip(days, days[1:] + [_END_OF_TIME]):
+        running = [total + delta for total, delta in zip(running, deltas[day])]
+        shifts.append(tuple(running) + (ledger_id, day, next_day))
+    cursor.executemany(SHIFT_PREFIX_QUERY, shifts)
+
+def _archived_days(db):
+    """Return {ledger_id: {date: [income_cents, expense_cents, count]}} over the archive, or None on error"""
+    from archive import archived_daily_totals
+
+    rows = archived_daily_totals(db)
+    if rows is None:
+        return None
+    days = defaultdict(lambda: defaultdict(lambda: [0, 0, 0]))
+    for ledger_id, day, type, category, cents, count in rows:
+        totals = days[ledger_id][day]
+        totals[0 if type == 'income' else 1] += cents
+        totals[2] += count
+    return days
+
+def rebuild_balances(db):
+    """Recompute every ledger's daily balances from the transactions table and the archive"""
+    archived = _archived_days(db)
+    if archived is None:
+        return None
+
+    def rebuild(cursor):
+        cursor.execute("DELETE FROM daily_balances")
+        cursor.execute(REBUILD_QUERY)
+        if not archived:
+            return cursor.rowcount
+        for ledger_id, deltas in archived.items():
+            apply_daily_totals(cursor, ledger_id, deltas)
+        cursor.execute("SELECT COUNT(*) AS n FROM daily_balances")
+        return cursor.fetchall()[0]['n']
+
+    return db.run_in_transaction(rebuild)
+
+def verify_balances(db):
+    """Return (ledger_id, date, expected, actual) for every daily balance that disagrees with transactions.
+
+    expected and actual are (income, expense, count, cumulative income,
+    cumulative expense, cumulative count) tuples recomputed in Python from
+    the raw per-day sums.
+    """
+    expected_rows = db.execute_query(DAILY_TOTALS_QUERY + " ORDER BY ledger_id, date", fetch=True)
+    actual_rows = db.execute_query(f"""
+        SELECT ledger_id, date, income_cents, expense_cents, transaction_count, {PREFIX_COLUMNS}
+        FROM daily_balances
+        ORDER BY ledger_id, date
+    """, fetch=True)
+    archived = _archived_days(db)
+    if expected_rows is None or actual_rows is None or archived is None:
+        return None
+
+    days = defaultdict(lambda: [0, 0, 0])
+    for row in expected_rows:
+        # MySQL returns SUM() of a BIGINT as DECIMAL
+        days[(row['ledger_id'], row['date'])] = [
+            int(row['income_cents']), int(row['expense_cents']), int(row['transaction_count'])
+        ]
+    for ledger_id, deltas in archived.items():
+        for day, totals in deltas.items():
+            days[(ledger_id, day)] = [total + value for total, value in zip(days[(ledger_id, day)], totals)]
+
+    expected = {}
+    running = {}
+    for (ledger_id, day), totals in sorted(days.items()):
+        prefix = tuple(total + value for total, value in zip(running.get(ledger_id, (0, 0, 0)), totals))
+        running[ledger_id] = prefix
+        expected[(ledger_id, day)] = tuple(totals) + prefix
+
+    actual = {
+        (row['ledger_id'], row['date']): (
+            int(row['income_cents']), int(row['expense_cents']), int(row['transaction_count']),
+            int(row['cumulative_income_cents']), int(row['cumulative_expense_cents']),
+            int(row['cumulative_count'])
+        )
+        for row in actual_rows
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            mismatches.append(key + (expected.get(key), actual.get(key)))
+    return mismatches
+
+def main(argv=None):
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Maintain the daily_balances prefix sums")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if not db.initialize_database():
+        return 1
+
+    if args.command == "rebuild":
+        rows = rebuild_balances(db)
+        if rows is None:
+            return 1
+        print(f"Rebuilt daily balances with {rows} rows")
+        return 0
+
+    mismatches = verify_balances(db)
+    if mismatches is None:
+        return 1
+    for ledger_id, day, expected, actual in mismatches:
+        print(f"ledger {ledger_id} {day}: expected {expected}, daily_balances has {actual}")
+    print("Daily balances are consistent" if not mismatches else f"{len(mismatches)} mismatched days")
+    return 0 if not mismatches else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Performance benchmarks for the finance tracker's data-access paths"""
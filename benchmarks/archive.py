@@ -0,0 +1,136 @@
+"""Time the archive job, backup and restore, and page latency before and after archival.
+
+Loads (or reuses) a synthetic ledger and copies it to a temporary SQLite
+file, since archiving deletes rows. The page helpers are timed with the
+query cache disabled, then every year before the last --keep-years is
+archived and they are timed again, reading the archive files on every
+call and then with archive results served from the cache. Finally the
+archived database is backed up and restored into a fresh file.
+
+    python -m benchmarks.archive --size 1m
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from benchmarks.ledger import END_DATE, SIZES, open_ledger, parse_size
+from benchmarks.ledgers import measure
+
+def cases(end=END_DATE):
+    """Return (name, helper, arg, ...) read helpers reaching into the years before end's"""
+    from queries import (count_transactions, get_monthly_trend, get_transactions, get_transactions_page,
+                         get_transactions_summary)
+
+    old_month = date(end.year - 2, 6, 1)
+    old_month_end = date(end.year - 2, 6, 30)
+    # Edge months in archived years, whole months from the rollup in between
+    across = (date(end.year - 2, 1, 15), end - timedelta(days=20))
+    return [
+        ("page, newest (no filter)", get_transactions_page),
+        ("page, archived month", get_transactions_page, old_month, old_month_end),
+        ("page, expense (archived year)", get_transactions_page, None, old_month_end, 'expense'),
+        ("count, archived month", count_transactions, old_month, old_month_end, 'expense'),
+        ("count, all", count_transactions),
+        ("get_transactions, archived month", get_transactions, old_month, old_month_end),
+        ("summary, across archive", get_transactions_summary) + across,
+        ("monthly trend, across archive", get_monthly_trend) + across,
+    ]
+
+def file_size(path):
+    return sum(
+        os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)
+    )
+
+def archive_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=SIZES['1m'],
+                        help="10k, 1m, 10m or a row count (default: 1m)")
+    parser.add_argument("--keep-years", type=int, default=1,
+                        help="years before END_DATE's kept in the table, its own included")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db-path", help="SQLite file to load or reuse; it is copied, never archived in place")
+    args = parser.parse_args(argv)
+
+    if os.getenv('DB_BACKEND', 'sqlite').lower() != 'sqlite':
+        print("This benchmark archives a copy of a SQLite ledger; unset DB_BACKEND")
+        return 1
+
+    db, _ = open_ledger(args.size, db_path=args.db_path)
+    if db is None:
+        return 1
+    source = os.environ['DB_PATH']
+    db.close()
+
+    from archive import archive_closed_years, backup, restore
+    from cache import QueryCache
+    from database import Database
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DB_PATH'] = os.path.join(workdir, "archived.db")
+    os.environ['ARCHIVE_DIR'] = os.path.join(workdir, "archive")
+    shutil.copy(source, os.environ['DB_PATH'])
+    db = Database()
+    if not db.initialize_database():
+        return 1
+    db.cache = QueryCache(max_entries=0)
+
+    calls = cases()
+    before = {name: measure(db, call, args.repeat) for name, *call in calls}
+    hot_before = db.execute_query("SELECT COUNT(*) AS n FROM transactions", fetch=True)[0]['n']
+    size_before = file_size(os.environ['DB_PATH'])
+
+    started = time.perf_counter()
+    results = archive_closed_years(db, args.keep_years, today=END_DATE)
+    archived_seconds = time.perf_counter() - started
+    if results is None:
+        return 1
+    # Archiving leaves free pages behind; VACUUM hands them back
+    db.execute_query("VACUUM")
+    hot_after = db.execute_query("SELECT COUNT(*) AS n FROM transactions", fetch=True)[0]['n']
+    print(f"Archived {len(results)} years ({hot_before - hot_after:,} rows) in {archived_seconds:.1f}s: "
+          f"table {hot_before:,} -> {hot_after:,} rows, database file "
+          f"{size_before / 2**20:.0f} -> {file_size(os.environ['DB_PATH']) / 2**20:.0f} MB, "
+          f"archive {archive_size(os.environ['ARCHIVE_DIR']) / 2**20:.1f} MB")
+
+    cold = {name: measure(db, call, args.repeat) for name, *call in calls}
+    db.cache = QueryCache()
+    warm = {name: measure(db, call, args.repeat) for name, *call in calls}
+
+    print(f"\n{'p50 / p95 ms':<34} {'before':>17} {'archive read':>17} {'archive cached':>17}")
+    for name, *_ in calls:
+        cells = [f"{p50:7.2f} / {p95:7.2f}" for p50, p95 in (before[name], cold[name], warm[name])]
+        print(f"{name:<34} " + " ".join(f"{cell:>17}" for cell in cells))
+
+    started = time.perf_counter()
+    manifest = backup(db, os.path.join(workdir, "backup"))
+    backup_seconds = time.perf_counter() - started
+    db.close()
+    if manifest is None:
+        return 1
+
+    os.environ['DB_PATH'] = os.path.join(workdir, "restored.db")
+    os.environ['ARCHIVE_DIR'] = os.path.join(workdir, "restored-archive")
+    restored = Database()
+    if not restored.initialize_database():
+        return 1
+    started = time.perf_counter()
+    counts = restore(restored, os.path.join(workdir, "backup"))
+    restore_seconds = time.perf_counter() - started
+    restored.close()
+    if counts is None:
+        return 1
+    print(f"\nBackup of {manifest['tables']['transactions']['rows']:,} table rows and "
+          f"{len(manifest['partitions'])} archive files: {backup_seconds:.1f}s; restore: {restore_seconds:.1f}s")
+    shutil.rmtree(workdir)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Measure category rule throughput: descriptions/sec and re-categorized rows/sec.
+
+Compiles one rule per synthetic merchant plus --rules filler rules (a few
+of them regexes or amount-limited) and times CategoryMatcher over
+statement-like descriptions, against checking the rules one by one in
+priority order. Then adds the merchant rules, pointing each merchant at a
+different category of the same type, to a synthetic ledger and times
+re-categorizing its history.
+
+    python -m benchmarks.categorize --rules 500 --size 100000
+"""
+import argparse
+import random
+import re
+import string
+import sys
+import time
+from benchmarks.ledger import MERCHANTS, open_ledger, parse_size
+from database import DEFAULT_CATEGORIES
+
+def make_rules(filler, seed=42):
+    """Return rule dicts: one per merchant, then filler rules with random patterns"""
+    rng = random.Random(seed)
+    types = dict(DEFAULT_CATEGORIES)
+    rules = []
+    for category, merchants in MERCHANTS.items():
+        for merchant in merchants:
+            rules.append({'pattern': merchant.lower(), 'match_type': 'contains', 'category': category})
+    names = list(types)
+    for i in range(filler):
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+        rule = {'pattern': word, 'match_type': 'contains', 'category': rng.choice(names)}
+        if i % 50 == 0:
+            rule.update(pattern=rf"\b{word}\s*#?\d+", match_type='regex')
+        if i % 7 == 0:
+            rule['min_amount_cents'] = rng.randint(0, 10000)
+        rules.append(rule)
+
+    for i, rule in enumerate(rules):
+        rule.setdefault('min_amount_cents', None)
+        rule.update(id=i + 1, type=types[rule['category']], max_amount_cents=None, priority=i % 3)
+    return rules
+
+def make_descriptions(count, distinct, seed=42):
+    """Return (description, type, amount_cents) rows shaped like bank statement lines"""
+    rng = random.Random(seed)
+    types = dict(DEFAULT_CATEGORIES)
+    choices = [(merchant, types[category]) for category, merchants in MERCHANTS.items()
+               for merchant in merchants]
+    references = [f"{rng.randint(1000, 9999)}" for _ in range(max(1, distinct // len(choices)))]
+    rows = []
+    for _ in range(count):
+        merchant, type = rng.choice(choices)
+        description = f"POS {merchant.upper()} #{rng.choice(references)} CARD"
+        rows.append((description, type, rng.randint(100, 100000)))
+    return rows
+
+def naive_match(rules, description, type, amount_cents):
+    """Check every rule in priority order, as a loop over the rules table would"""
+    text = description.lower()
+    for rule in rules:
+        if rule['type'] != type:
+            continue
+        if rule['min_amount_cents'] is not None and amount_cents < rule['min_amount_cents']:
+            continue
+        if rule['match_type'] == 'regex':
+            if not rule['compiled'].search(text):
+                continue
+        elif rule['pattern'] not in text:
+            continue
+        return rule['category']
+    return None
+
+def time_rate(fn, rows):
+    """Return (rows/sec, results) for calling fn on every row"""
+    started = time.perf_counter()
+    results = [fn(*row) for row in rows]
+    return len(rows) / (time.perf_counter() - started), results
+
+def main(argv=None):
+    from categorize import CategoryMatcher, add_category_rule, recategorize
+    from rollup import verify_rollup
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=500, help="filler rules on top of the merchant rules")
+    parser.add_argument("--descriptions", type=int, default=200000)
+    parser.add_argument("--size", type=parse_size, default=100000,
+                        help="ledger rows to re-categorize, 0 to skip (default: 100000)")
+    parser.add_argument("--db-path", help="SQLite file to use; its category rules and categories are changed")
+    args = parser.parse_args(argv)
+
+    rules = make_rules(args.rules)
+    started = time.perf_counter()
+    matcher = CategoryMatcher(rules)
+    print(f"{len(rules)} rules compiled in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    ordered = sorted(rules, key=lambda rule: (-rule['priority'], rule['id']))
+    for rule in ordered:
+        if rule['match_type'] == 'regex':
+            rule['compiled'] = re.compile(rule['pattern'], re.IGNORECASE)
+
+    print(f"{'descriptions':<34} {'matcher':>14} {'rule loop':>14}")
+    for label, distinct in (("all distinct", args.descriptions), ("statement-like (1k distinct)", 1000)):
+        rows = make_descriptions(args.descriptions, distinct)
+        matcher._cache.clear()
+        fast, matched = time_rate(matcher.match, rows)
+        slow, expected = time_rate(lambda *row: naive_match(ordered, *row), rows[:20000])
+        if matched[:20000] != expected:
+            print("MISMATCH between the matcher and the rule loop")
+            return 1
+        print(f"{label:<34} {fast:>9,.0f} /sec {slow:>9,.0f} /sec")
+
+    if not args.size:
+        return 0
+
+    db, _ = open_ledger(args.size, db_path=args.db_path)
+    if db is None:
+        return 1
+    # Send every merchant to another category of the same type, so each matched row changes
+    by_type = {}
+    for name, type in DEFAULT_CATEGORIES:
+        by_type.setdefault(type, []).append(name)
+    db.execute_query("DELETE FROM category_rules")
+    for category, merchants in MERCHANTS.items():
+        names = by_type[dict(DEFAULT_CATEGORIES)[category]]
+        target = names[(names.index(category) + 1) % len(names)]
+        for merchant in merchants:
+            add_category_rule(db, merchant, target)
+
+    started = time.perf_counter()
+    result = recategorize(db, overwrite=True)
+    seconds = time.perf_counter() - started
+    db.execute_query("DELETE FROM category_rules")
+    if result is None:
+        return 1
+    print(f"re-categorized {result['changed']:,} of {result['scanned']:,} rows in {seconds:.2f}s "
+          f"({result['scanned'] / seconds:,.0f} rows/sec)")
+    mismatches = verify_rollup(db)
+    print("rollup consistent" if mismatches == [] else f"ROLLUP MISMATCH {mismatches[:5]}")
+    db.close()
+    return 0 if mismatches == [] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Compare chart payloads built from every daily point with the charts module's.
+
+For each range, builds the running balance and income/expense trend the
+way a page would from raw daily rows (one point per day), then with
+charts.balance_figure and charts.trend_figure: cold (cache cleared) and
+warm (served from the cache). Reports the figure JSON size sent to the
+browser and the build time of each.
+
+    python -m benchmarks.charts --size 1m
+"""
+import argparse
+import sys
+import time
+from datetime import timedelta
+from benchmarks.ledger import END_DATE, SIZES, open_ledger, parse_size
+
+RANGES = (("one month", 30), ("one year", 365), ("five years", 5 * 365))
+
+def daily_figures(db, start_date, end_date):
+    """Build both charts from every daily row, returning their JSON"""
+    import plotly.graph_objects as go
+    from queries import get_balance_series, get_period_totals
+
+    totals = get_period_totals(db, start_date, end_date)
+    rows = get_balance_series(db, start_date, end_date)
+    days = [start_date] + [row['date'] for row in rows]
+    balance = go.Figure(go.Scatter(
+        x=days,
+        y=[totals['opening_balance_cents'] / 100] + [row['balance_cents'] / 100 for row in rows],
+        mode='lines', line_shape='hv'
+    ))
+    trend = go.Figure()
+    trend.add_trace(go.Scatter(x=days[1:], y=[row['income_cents'] / 100 for row in rows],
+                               mode='lines+markers', name='Income'))
+    trend.add_trace(go.Scatter(x=days[1:], y=[row['expense_cents'] / 100 for row in rows],
+                               mode='lines+markers', name='Expenses'))
+    return balance.to_json(), trend.to_json()
+
+def timed(fn):
+    """Return (milliseconds, result) of one call"""
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+def main(argv=None):
+    from cache import QueryCache
+    from charts import balance_figure, pick_granularity, trend_figure
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=SIZES['1m'],
+                        help="10k, 1m, 10m or a row count (default: 1m)")
+    parser.add_argument("--db-path", help="SQLite file to use; an existing ledger of at least --size rows is reused")
+    args = parser.parse_args(argv)
+
+    db, _ = open_ledger(args.size, db_path=args.db_path)
+    if db is None:
+        return 1
+    # Payloads are served from the cache, so this benchmark needs one
+    db.cache = QueryCache()
+
+    # Import plotly and warm the connection before timing anything
+    daily_figures(db, END_DATE - timedelta(days=1), END_DATE)
+
+    print(f"{'range':<12} {'granularity':<12} {'daily':>10} {'payload':>10} {'daily ms':>9} "
+          f"{'cold ms':>9} {'warm ms':>9}")
+    for label, days in RANGES:
+        start_date = END_DATE - timedelta(days=days - 1)
+        db.cache.clear()
+        daily_ms, (daily_balance, daily_trend) = timed(lambda: daily_figures(db, start_date, END_DATE))
+        db.cache.clear()
+        cold_ms, payloads = timed(lambda: (balance_figure(db, start_date, END_DATE),
+                                           trend_figure(db, start_date, END_DATE)))
+        warm_ms, _ = timed(lambda: (balance_figure(db, start_date, END_DATE),
+                                    trend_figure(db, start_date, END_DATE)))
+        daily_bytes = len(daily_balance) + len(daily_trend)
+        payload_bytes = sum(len(payload) for payload in payloads)
+        print(f"{label:<12} {pick_granularity(start_date, END_DATE):<12} {daily_bytes / 1024:7.1f} KB "
+              f"{payload_bytes / 1024:7.1f} KB {daily_ms:9.1f} {cold_ms:9.1f} {warm_ms:9.3f}")
+    db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
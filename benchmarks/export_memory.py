@@ -0,0 +1,100 @@
+"""Check that streaming export memory stays bounded as the row count grows.
+
+Rows are generated in process rather than read from MySQL, so this
+measures the export engine itself. Run with:
+
+    python -m benchmarks.export_memory --rows 1000000 --format csv.gz
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from database import DEFAULT_LEDGER_ID
+from export import DEFAULT_CHUNK_SIZE, FORMATS, export_transactions
+
+class SyntheticDatabase:
+    """Minimal Database stand-in whose stream_query yields generated rows"""
+
+    Error = Exception
+    ledger_id = DEFAULT_LEDGER_ID
+
+    def __init__(self, rows, seed=42):
+        self.rows = rows
+        self.seed = seed
+
+    def execute_query(self, query, params=None, fetch=False, cache_tags=None):
+        # The only query an export runs this way reads the archive catalog, which is empty here
+        return []
+
+    def stream_query(self, query, params=None, chunk_size=1000):
+        rng = random.Random(self.seed)
+        first_day = date(2015, 1, 1)
+        chunk = []
+        for id in range(1, self.rows + 1):
+            chunk.append((
+                id,
+                first_day + timedelta(days=id // 300),
+                'expense',
+                'Food',
+                rng.randrange(1, 100000),
+                'Synthetic transaction'
+            ))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def measure(rows, format, chunk_size):
+    """Return (peak traced bytes, seconds) for exporting rows to /dev/null.
+
+    Raises RuntimeError unless export_transactions reports every generated
+    row as written, so a failed export cannot pass as a cheap one.
+    """
+    db = SyntheticDatabase(rows)
+    with open(os.devnull, "wb") as out:
+        tracemalloc.start()
+        try:
+            started = time.perf_counter()
+            count = export_transactions(db, out, format, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    if count != rows:
+        raise RuntimeError(f"exported {count} of {rows:,} rows")
+    return peak, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--ceiling-mb", type=float, default=32.0,
+                        help="fail if peak traced memory exceeds this many MiB")
+    args = parser.parse_args(argv)
+
+    # Peak memory should not grow with the number of rows exported
+    small_rows = max(args.rows // 10, args.chunk_size)
+    try:
+        small_peak, _ = measure(small_rows, args.format, args.chunk_size)
+        peak, elapsed = measure(args.rows, args.format, args.chunk_size)
+    except RuntimeError as e:
+        print(f"FAIL: {e}")
+        return 1
+
+    print(f"{small_rows:,} rows: peak {small_peak / 2**20:.1f} MiB")
+    print(f"{args.rows:,} rows: peak {peak / 2**20:.1f} MiB, "
+          f"{elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/sec)")
+
+    if peak > args.ceiling_mb * 2**20:
+        print(f"FAIL: peak memory above the {args.ceiling_mb} MiB ceiling")
+        return 1
+    print(f"OK: peak memory within the {args.ceiling_mb} MiB ceiling")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
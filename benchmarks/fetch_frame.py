@@ -0,0 +1,95 @@
+"""Compare the dict-per-row fetch path with columnar fetch_frame / fetch_arrays.
+
+Runs against the database configured in .env, MySQL or SQLite. Rows are
+loaded into a scratch table shaped like transactions, which is dropped
+afterwards. Run with:
+
+    python -m benchmarks.fetch_frame --rows 100000 1000000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from benchmarks.ledger import generate_transactions
+from database import Database
+
+SCRATCH_TABLE = "benchmark_fetch_transactions"
+
+# Portable DDL, so both backends declare the same column types; DATE in
+# particular is what makes SQLite hand dates back as date objects
+SCRATCH_SCHEMA = f"""
+    CREATE TABLE {SCRATCH_TABLE} (
+        id INTEGER PRIMARY KEY,
+        amount_cents BIGINT NOT NULL,
+        category VARCHAR(50) NOT NULL,
+        type VARCHAR(7) NOT NULL,
+        description TEXT,
+        date DATE NOT NULL,
+        import_hash CHAR(64) NULL
+    )
+"""
+
+def load_rows(db, rows, seed=42, batch_size=5000):
+    """Fill the scratch table with rows synthetic transactions"""
+    def fill(cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        cursor.execute(SCRATCH_SCHEMA)
+        query = (f"INSERT INTO {SCRATCH_TABLE} (id, amount_cents, category, type, description, date, import_hash) "
+                 "VALUES (%s, %s, %s, %s, %s, %s, %s)")
+        batch = []
+        for id, row in enumerate(generate_transactions(rows, seed=seed), 1):
+            batch.append((id,) + tuple(row))
+            if len(batch) == batch_size:
+                cursor.executemany(query, batch)
+                batch = []
+        if batch:
+            cursor.executemany(query, batch)
+        return rows
+
+    return db.run_in_transaction(fill)
+
+def measure(label, fn, repeat):
+    """Print the best wall time and the tracemalloc peak of fn()"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"    {label:<28} {best * 1000:9.1f} ms   peak {peak / 2**20:8.1f} MiB")
+    return best
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if not db.initialize_database():
+        return 1
+
+    query = f"SELECT id, date, type, category, amount_cents, description FROM {SCRATCH_TABLE}"
+    try:
+        for rows in args.rows:
+            print(f"{rows:,} rows")
+            if load_rows(db, rows) is None:
+                return 1
+            dicts = measure("execute_query + DataFrame",
+                            lambda: pd.DataFrame(db.execute_query(query, fetch=True)), args.repeat)
+            measure("fetch_arrays", lambda: db.fetch_arrays(query), args.repeat)
+            frame = measure("fetch_frame", lambda: db.fetch_frame(query), args.repeat)
+            print(f"    speedup: {dicts / frame:.1f}x")
+    finally:
+        db.execute_query(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""Deterministic synthetic ledgers for benchmarking.
+
+Builds a ledger of the requested size from the categories every new
+database starts with. Each user gets a monthly salary, rent and utility
+bill plus discretionary spending drawn from per-category lognormal
+distributions, so the month/type/category mix looks like a real household
+rather than uniform noise. The same arguments always produce the same rows.
+
+    python -m benchmarks.ledger --size 1m --db-path /tmp/ledger.db
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from database import DEFAULT_CATEGORIES
+
+SIZES = {
+    '10k': 10_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000
+}
+
+# Last day of every generated ledger, so results do not depend on today's date
+END_DATE = date(2025, 12, 31)
+
+# Bills every user pays once a month: category -> (day of month, lognormal mu, sigma)
+MONTHLY = {
+    'Salary': (25, 8.3, 0.25),
+    'Rent': (1, 7.2, 0.30),
+    'Utilities': (15, 4.9, 0.35)
+}
+
+# Everything else: category -> (relative frequency, lognormal mu, sigma)
+DISCRETIONARY = {
+    'Food': (40, 3.0, 0.8),
+    'Transportation': (18, 2.8, 0.9),
+    'Shopping': (14, 3.9, 1.0),
+    'Entertainment': (10, 3.3, 0.9),
+    'Other Expense': (6, 3.5, 1.1),
+    'Healthcare': (4, 4.3, 1.0),
+    'Education': (2, 5.0, 0.9),
+    'Freelance': (3, 6.0, 0.7),
+    'Investment': (2, 5.5, 1.2),
+    'Gift': (1, 4.5, 0.8),
+    'Other Income': (1, 4.0, 1.0)
+}
+
+MERCHANTS = {
+    'Salary': ['Payroll'],
+    'Rent': ['Monthly rent'],
+    'Utilities': ['Electricity', 'Water', 'Internet', 'Gas'],
+    'Food': ['Fresh Mart groceries', 'Corner Cafe', 'Pizza Palace', 'Sushi Bar', 'Bakery'],
+    'Transportation': ['Metro card', 'Fuel station', 'Ride share', 'Parking'],
+    'Shopping': ['Online order', 'Clothing store', 'Electronics', 'Home goods'],
+    'Entertainment': ['Cinema', 'Streaming subscription', 'Concert tickets', 'Bowling'],
+    'Other Expense': ['Bank fee', 'Post office', 'Donation'],
+    'Healthcare': ['Pharmacy', 'Dentist', 'Clinic visit'],
+    'Education': ['Course fee', 'Books', 'Workshop'],
+    'Freelance': ['Client invoice', 'Consulting'],
+    'Investment': ['Dividend', 'Interest'],
+    'Gift': ['Birthday gift'],
+    'Other Income': ['Refund', 'Cashback']
+}
+
+def _months(years, end):
+    """Return the first day of each of the last years * 12 months up to end"""
+    first = date(end.year - years, end.month, 1) + timedelta(days=31)
+    first = first.replace(day=1)
+    months = []
+    while first <= end:
+        months.append(first)
+        first = (first + timedelta(days=31)).replace(day=1)
+    return months
+
+def _month_length(first_day):
+    return ((first_day + timedelta(days=31)).replace(day=1) - first_day).days
+
+def _cents(rng, mu, sigma, scale=1.0):
+    """Draw a lognormal dollar amount and return it in whole cents"""
+    return max(round(rng.lognormvariate(mu, sigma) * scale * 100), 1)
+
+def generate_transactions(rows, years=5, users=1, categories=None, seed=42, end=END_DATE):
+    """Yield rows insertable by write_transactions, oldest month first.
+
+    categories restricts the ledger to a subset of the default category
+    names. Monthly bills come first; the remaining rows are spread evenly
+    over the months as discretionary spending and income.
+    """
+    allowed = dict(DEFAULT_CATEGORIES)
+    if categories:
+        unknown = set(categories) - set(allowed)
+        if unknown:
+            raise ValueError(f"unknown categories: {', '.join(sorted(unknown))}")
+        allowed = {name: allowed[name] for name in categories}
+
+    rng = random.Random(seed)
+    months = _months(years, end)
+    monthly = [(name, *MONTHLY[name]) for name in MONTHLY if name in allowed]
+    names = [name for name in DISCRETIONARY if name in allowed]
+    weights = [DISCRETIONARY[name][0] for name in names]
+
+    # Each user's bills vary around their own level
+    levels = [rng.uniform(0.7, 1.4) for _ in range(users)]
+
+    bills = min(rows, len(months) * users * len(monthly))
+    extra, remainder = divmod(rows - bills, len(months))
+
+    for index, first_day in enumerate(months):
+        days = _month_length(first_day)
+        month_rows = []
+        for level in levels:
+            for name, day, mu, sigma in monthly:
+                if bills:
+                    bills -= 1
+                    month_rows.append((_cents(rng, mu, sigma, level), name, min(day, days)))
+
+        count = extra + (1 if index < remainder else 0)
+        if names:
+            for name in rng.choices(names, weights, k=count):
+                _, mu, sigma = DISCRETIONARY[name]
+                month_rows.append((_cents(rng, mu, sigma), name, rng.randint(1, days)))
+
+        month_rows.sort(key=lambda row: row[2])
+        for cents, name, day in month_rows:
+            yield (
+                cents,
+                name,
+                allowed[name],
+                rng.choice(MERCHANTS[name]),
+                first_day.replace(day=day),
+                None
+            )
+
+def generate_budgets(years=5, seed=42, end=END_DATE):
+    """Yield (category, amount_cents, month) budgets for every expense category and month"""
+    rng = random.Random(seed)
+    for first_day in _months(years, end):
+        month = first_day.strftime("%Y-%m")
+        for name, type in DEFAULT_CATEGORIES:
+            if type == 'expense':
+                yield name, rng.randrange(100, 2000, 50) * 100, month
+
+def load_ledger(db, rows, years=5, users=1, categories=None, seed=42, end=END_DATE,
+                batch_size=5000, commit_every=50_000):
+    """Write a synthetic ledger and its budgets through the app's write path.
+
+    Rows go through write_transactions so the rollup is maintained exactly
+    as it is for real inserts. Returns the number of transactions written,
+    or None if a batch failed.
+    """
+    from queries import write_transactions
+
+    rows_iter = generate_transactions(rows, years, users, categories, seed, end)
+    written = 0
+
+    def write_chunk(cursor):
+        count = 0
+        batch = []
+        for row in rows_iter:
+            batch.append(row)
+            if len(batch) == batch_size:
+                write_transactions(cursor, db.ledger_id, batch)
+                count += len(batch)
+                batch = []
+                if count >= commit_every:
+                    break
+        if batch:
+            write_transactions(cursor, db.ledger_id, batch)
+            count += len(batch)
+        return count
+
+    while True:
+        count = db.run_in_transaction(write_chunk)
+        if count is None:
+            return None
+        if not count:
+            break
+        written += count
+
+    budgets = list(generate_budgets(years, seed, end))
+    def write_budgets(cursor):
+        cursor.executemany(
+            "INSERT IGNORE INTO budgets (ledger_id, category, amount_cents, month) VALUES (%s, %s, %s, %s)",
+            [(db.ledger_id,) + budget for budget in budgets]
+        )
+        return len(budgets)
+
+    if db.run_in_transaction(write_budgets) is None:
+        return None
+    db.cache.clear()
+    return written
+
+def open_ledger(rows, years=5, users=1, seed=42, db_path=None, cache=False):
+    """Return (db, load_seconds) for a database holding at least rows synthetic transactions.
+
+    Uses a fresh temporary SQLite file unless db_path is given or DB_BACKEND
+    names another backend; an existing ledger that is large enough is reused
+    and load_seconds is None. The query cache is disabled unless cache is
+    set. Returns (None, None) if the database could not be prepared.
+    """
+    if db_path or os.getenv('DB_BACKEND', 'sqlite').lower() == 'sqlite':
+        os.environ['DB_BACKEND'] = 'sqlite'
+        os.environ['DB_PATH'] = db_path or os.path.join(tempfile.mkdtemp(), "ledger.db")
+
+    from cache import QueryCache
+    from database import Database
+
+    db = Database()
+    if not db.initialize_database():
+        return None, None
+    if not cache:
+        db.cache = QueryCache(max_entries=0)
+
+    existing = db.execute_query("SELECT COUNT(*) AS n FROM transactions WHERE ledger_id = %s",
+                                (db.ledger_id,), fetch=True)
+    if existing is None:
+        return None, None
+    if existing[0]['n'] >= rows:
+        return db, None
+
+    print(f"Loading {rows:,} synthetic transactions...", file=sys.stderr)
+    started = time.perf_counter()
+    if load_ledger(db, rows, years, users, seed=seed) is None:
+        return None, None
+    return db, time.perf_counter() - started
+
+def parse_size(value):
+    """Accept a named size (10k, 1m, 10m) or a plain row count"""
+    return SIZES.get(value.lower()) or int(value.replace("_", ""))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a database with a synthetic ledger")
+    parser.add_argument("--size", type=parse_size, default=SIZES['10k'],
+                        help="10k, 1m, 10m or a row count (default: 10k)")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--categories", nargs="+", help="limit the ledger to these categories")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-path", help="SQLite file to fill (sets DB_BACKEND=sqlite)")
+    args = parser.parse_args(argv)
+
+    if args.db_path:
+        os.environ['DB_BACKEND'] = 'sqlite'
+        os.environ['DB_PATH'] = args.db_path
+
+    from database import Database
+    db = Database()
+    if not db.initialize_database():
+        return 1
+
+    started = time.perf_counter()
+    written = load_ledger(db, args.size, args.years, args.users, args.categories, args.seed)
+    if written is None:
+        return 1
+    seconds = time.perf_counter() - started
+    print(f"Wrote {written:,} transactions in {seconds:.1f}s ({written / seconds:,.0f} rows/sec)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Show per-ledger query latency staying flat as the number of ledgers grows.
+
+Fills one database with ledgers of --rows synthetic transactions each,
+growing it to every count in --ledgers, and after each step times the
+page helpers against the first ledger with the query cache disabled.
+Exits with status 1 when a helper's median at the largest count is more
+than --max-growth times its median with one ledger (plus 1 ms for noise).
+
+Search is timed but not held to that: the full-text index is shared, so
+a term's postings from every ledger are read before the ledger's own are
+picked out, and its latency grows with the deployment's matches.
+
+    python -m benchmarks.ledgers --rows 20000 --ledgers 1 10 50
+"""
+import argparse
+import sys
+import time
+from datetime import timedelta
+from benchmarks.ledger import END_DATE, load_ledger, open_ledger, parse_size
+from benchmarks.suite import percentile
+
+def cases(end=END_DATE):
+    """Return (name, helper, arg, ...) read helpers the pages call for one ledger"""
+    from queries import (count_transactions, get_budget_vs_actual, get_monthly_trend,
+                         get_period_totals, get_transactions_page, get_transactions_summary,
+                         search_transactions)
+
+    month_start = end.replace(day=1)
+    month = month_start.strftime("%Y-%m")
+    year_start = end - timedelta(days=365)
+    return [
+        ("get_transactions_page (expense)", get_transactions_page, None, None, 'expense'),
+        ("count_transactions (one month)", count_transactions, month_start, end),
+        ("get_transactions_summary (year)", get_transactions_summary, year_start, end),
+        ("get_period_totals (year)", get_period_totals, year_start, end),
+        ("get_monthly_trend (year)", get_monthly_trend, year_start, end),
+        ("get_budget_vs_actual", get_budget_vs_actual, month),
+        ("search_transactions (one month)", search_transactions, "sushi", month_start, end),
+    ]
+
+def measure(db, call, repeat):
+    """Return the p50 and p95 wall time in milliseconds of call after one warmup"""
+    helper, *args = call
+    helper(db, *args)
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        helper(db, *args)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 50), percentile(latencies, 95)
+
+def add_ledgers(db, count, rows):
+    """Create and fill ledgers until count exist, returning False if one failed"""
+    from queries import create_ledger, get_ledgers
+
+    existing = len(get_ledgers(db))
+    for number in range(existing + 1, count + 1):
+        ledger_id = create_ledger(db, f"Benchmark {number}")
+        if ledger_id is None or load_ledger(db.for_ledger(ledger_id), rows, seed=ledger_id) is None:
+            return False
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=parse_size, default=20000, help="transactions per ledger")
+    parser.add_argument("--ledgers", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--max-growth", type=float, default=1.5)
+    parser.add_argument("--db-path", help="SQLite file to use; ledgers already in it are kept")
+    args = parser.parse_args(argv)
+
+    db, _ = open_ledger(args.rows, db_path=args.db_path)
+    if db is None:
+        return 1
+
+    calls = cases()
+    medians = {}
+    print(f"{'ledgers':>8} {'rows':>11}  " + "  ".join(f"{name.split(' ')[0]:>24}" for name, *_ in calls))
+    for count in sorted(args.ledgers):
+        started = time.perf_counter()
+        if not add_ledgers(db, count, args.rows):
+            return 1
+        loaded = time.perf_counter() - started
+        if loaded > 1:
+            print(f"  (loaded up to {count} ledgers in {loaded:.1f}s)", file=sys.stderr)
+        total = db.execute_query("SELECT COUNT(*) AS n FROM transactions", fetch=True)[0]['n']
+        cells = []
+        for name, *call in calls:
+            p50, p95 = measure(db, call, args.repeat)
+            medians.setdefault(name, []).append(p50)
+            cells.append(f"{p50:7.2f} / {p95:7.2f} ms")
+        print(f"{count:>8} {total:>11,}  " + "  ".join(f"{cell:>24}" for cell in cells))
+    db.close()
+
+    grew = [
+        name for name, values in medians.items()
+        if not name.startswith("search") and values[-1] > values[0] * args.max_growth + 1
+    ]
+    for name in grew:
+        values = medians[name]
+        print(f"NOT FLAT {name}: p50 {values[0]:.2f} ms -> {values[-1]:.2f} ms")
+    return 1 if grew else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
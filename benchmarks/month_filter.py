@@ -0,0 +1,100 @@
+"""Compare function-wrapped vs sargable month filters on a SQLite stand-in.
+
+Run with: python -m benchmarks.month_filter --rows 1000000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+CATEGORIES = ['Food', 'Transportation', 'Entertainment', 'Utilities', 'Rent',
+              'Healthcare', 'Education', 'Shopping', 'Other Expense']
+
+def build_database(rows, years, seed=42):
+    """Create an in-memory transactions table shaped like the MySQL schema"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY,
+            amount_cents INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            type TEXT NOT NULL,
+            description TEXT,
+            date TEXT NOT NULL,
+            month TEXT GENERATED ALWAYS AS (strftime('%Y-%m', date)) STORED
+        )
+    """)
+    rng = random.Random(seed)
+    first_day = date.today() - timedelta(days=365 * years)
+    span = 365 * years
+
+    def generate():
+        for _ in range(rows):
+            day = first_day + timedelta(days=rng.randrange(span))
+            yield (
+                round(rng.lognormvariate(3.5, 1.0) * 100),
+                rng.choice(CATEGORIES),
+                'expense',
+                None,
+                day.isoformat()
+            )
+
+    conn.executemany(
+        "INSERT INTO transactions (amount_cents, category, type, description, date) VALUES (?, ?, ?, ?, ?)",
+        generate()
+    )
+    conn.execute("CREATE INDEX idx_category_date ON transactions (category, date)")
+    conn.execute("CREATE INDEX idx_month_type_date_amount ON transactions (month, type, date, amount_cents)")
+    conn.commit()
+    return conn
+
+def timed(conn, query, params, repeat):
+    """Return the best wall time in milliseconds over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"Building {args.rows:,} rows...")
+    conn = build_database(args.rows, args.years)
+
+    # Last complete month
+    month_start = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+    month = month_start.strftime("%Y-%m")
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    trend_start = date.today() - timedelta(days=365)
+
+    cases = [
+        ("budget vs actual (one category, one month)",
+         "SELECT SUM(amount_cents) FROM transactions WHERE category = ? AND strftime('%Y-%m', date) = ?",
+         ('Food', month),
+         "SELECT SUM(amount_cents) FROM transactions WHERE category = ? AND date >= ? AND date < ?",
+         ('Food', month_start.isoformat(), next_month.isoformat())),
+        ("monthly trend (last 12 months)",
+         "SELECT strftime('%Y-%m', date) AS m, type, SUM(amount_cents) FROM transactions "
+         "WHERE date BETWEEN ? AND ? GROUP BY m, type ORDER BY m",
+         (trend_start.isoformat(), date.today().isoformat()),
+         "SELECT month, type, SUM(amount_cents) FROM transactions "
+         "WHERE month BETWEEN ? AND ? AND date >= ? AND date < ? GROUP BY month, type ORDER BY month",
+         (trend_start.strftime("%Y-%m"), date.today().strftime("%Y-%m"),
+          trend_start.isoformat(), (date.today() + timedelta(days=1)).isoformat())),
+    ]
+
+    for name, old_query, old_params, new_query, new_params in cases:
+        before = timed(conn, old_query, old_params, args.repeat)
+        after = timed(conn, new_query, new_params, args.repeat)
+        print(f"{name}: {before:.1f} ms -> {after:.1f} ms ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
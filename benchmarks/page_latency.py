@@ -0,0 +1,103 @@
+"""Compare sequential and concurrent (Database.gather) page query latency.
+
+Each page's independent queries are issued one after another, then all
+at once through the query thread pool, against a synthetic ledger with
+the query cache disabled. The gain is largest over a network: run with
+DB_BACKEND=mysql to measure against the configured server, or pass
+--round-trip-ms to delay every statement on the local SQLite ledger.
+
+    python -m benchmarks.page_latency --size 1m --round-trip-ms 2
+"""
+import argparse
+import sys
+import time
+from datetime import timedelta
+from benchmarks.ledger import END_DATE, SIZES, open_ledger, parse_size
+from benchmarks.suite import percentile
+
+def pages(end=END_DATE):
+    """Return (page, [(helper, arg, ...)]) for the pages that issue several queries"""
+    from queries import (count_transactions, get_budget_vs_actual, get_budgets, get_categories,
+                         get_monthly_trend, get_transactions_page, get_transactions_summary)
+
+    month = end.strftime("%Y-%m")
+    year_start = end - timedelta(days=365)
+    return [
+        ("Reports (last 12 months)", [
+            (get_transactions_summary, year_start, end),
+            (get_monthly_trend, year_start, end)
+        ]),
+        ("Budget Management", [
+            (get_budgets, month),
+            (get_budget_vs_actual, month)
+        ]),
+        ("Edit Month", [
+            (get_budgets, month),
+            (get_categories, "expense")
+        ]),
+        ("View Transactions", [
+            (get_transactions_page, None, None, 'expense'),
+            (count_transactions, None, None, 'expense')
+        ]),
+    ]
+
+def add_round_trip(db, seconds):
+    """Delay every statement by seconds to emulate a database server across a network"""
+    make_cursor = db.backend.cursor
+
+    def cursor(conn, *args, **kwargs):
+        inner = make_cursor(conn, *args, **kwargs)
+        execute = inner.execute
+
+        def delayed_execute(*args, **kwargs):
+            time.sleep(seconds)
+            return execute(*args, **kwargs)
+
+        inner.execute = delayed_execute
+        return inner
+
+    db.backend.cursor = cursor
+
+def sequential(db, calls):
+    return [call[0](db, *call[1:]) for call in calls]
+
+def concurrent(db, calls):
+    return db.gather(*calls)
+
+def measure(db, run, calls, repeat):
+    """Return p50 and p95 wall time in milliseconds of run(db, calls)"""
+    run(db, calls)
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(db, calls)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 50), percentile(latencies, 95)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=SIZES['1m'],
+                        help="10k, 1m, 10m or a row count (default: 1m)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--db-path",
+                        help="SQLite file to use; an existing ledger of at least --size rows is reused")
+    parser.add_argument("--round-trip-ms", type=float, default=0.0,
+                        help="emulated network round trip added to every statement")
+    args = parser.parse_args(argv)
+
+    db, _ = open_ledger(args.size, db_path=args.db_path)
+    if db is None:
+        return 1
+    if args.round_trip_ms:
+        add_round_trip(db, args.round_trip_ms / 1000)
+
+    print(f"{'page':<28} {'sequential p50':>15} {'concurrent p50':>15} {'speedup':>8}")
+    for page, calls in pages():
+        serial, _ = measure(db, sequential, calls, args.repeat)
+        gathered, _ = measure(db, concurrent, calls, args.repeat)
+        print(f"{page:<28} {serial:12.2f} ms {gathered:12.2f} ms {serial / gathered:7.2f}x")
+    db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
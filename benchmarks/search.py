@@ -0,0 +1,105 @@
+"""Time full-text description search against a LIKE scan on a synthetic ledger.
+
+Runs search_transactions (first page and a later page) and search_totals
+for a mix of rare, common, short-prefix and filtered searches, and the
+same searches as description LIKE '%word%' filters for comparison. Exits
+with status 1 when a search page misses --target-ms at p95.
+
+    python -m benchmarks.search --size 1m
+"""
+import argparse
+import sys
+import time
+from datetime import timedelta
+from benchmarks.ledger import END_DATE, SIZES, open_ledger, parse_size
+from benchmarks.suite import percentile
+
+def searches(end=END_DATE):
+    """Return (label, text, start_date, end_date, type, category) searches over the default merchants"""
+    month_start = end.replace(day=1)
+    year_start = end - timedelta(days=365)
+    return [
+        ("rare word", "birthday", None, None, None, None),
+        ("common word", "sushi", None, None, None, None),
+        ("two words", "ride share", None, None, None, None),
+        ("short prefix", "co", None, None, None, None),
+        ("prefix, last year", "elec", year_start, end, None, None),
+        ("word, one month, category", "sushi", month_start, end, 'expense', 'Food'),
+        ("no match", "zzzz", None, None, None, None),
+    ]
+
+def like_page(db, text, start_date, end_date, type_filter, category, page_size=50):
+    """The pre-index way to search: a LIKE filter per word over the date-ordered rows"""
+    from queries import TRANSACTION_COLUMNS, search_terms, transaction_filters
+
+    where, params = transaction_filters(db.ledger_id, start_date, end_date, type_filter, category)
+    for term in search_terms(text):
+        where += " AND description LIKE %s"
+        params.append(f"%{term}%")
+    query = (
+        f"SELECT {TRANSACTION_COLUMNS} FROM transactions" + where +
+        " ORDER BY date DESC, id DESC LIMIT %s"
+    )
+    return db.execute_query(query, params + [page_size], fetch=True)
+
+def measure(fn, repeat):
+    """Return (p50 ms, p95 ms, last result) of repeat calls after one warmup"""
+    result = fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 50), percentile(latencies, 95), result
+
+def main(argv=None):
+    from queries import search_totals, search_transactions
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=SIZES['1m'],
+                        help="10k, 1m, 10m or a row count (default: 1m)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--target-ms", type=float, default=100.0,
+                        help="p95 a search page must stay under (default: 100)")
+    parser.add_argument("--db-path",
+                        help="SQLite file to use; an existing ledger of at least --size rows is reused")
+    args = parser.parse_args(argv)
+
+    db, _ = open_ledger(args.size, db_path=args.db_path)
+    if db is None:
+        return 1
+
+    print(f"{'search':<28} {'matches':>9} {'page p50':>9} {'page p95':>9} {'page 5':>9} "
+          f"{'totals':>9} {'LIKE p50':>9}")
+    missed = []
+    for label, text, *filters in searches():
+        page_p50, page_p95, rows = measure(
+            lambda: search_transactions(db, text, *filters, page_size=args.page_size), args.repeat)
+
+        # Walk to the fifth page, then time fetching it from its cursor
+        after = None
+        for _ in range(4):
+            if not rows:
+                break
+            after = (rows[-1]['date'], rows[-1]['id'])
+            rows = search_transactions(db, text, *filters, after=after, page_size=args.page_size)
+        later_p50, later_p95, _ = measure(
+            lambda: search_transactions(db, text, *filters, after=after, page_size=args.page_size),
+            args.repeat)
+
+        totals_p50, _, totals = measure(lambda: search_totals(db, text, *filters), args.repeat)
+        like_p50, _, _ = measure(lambda: like_page(db, text, *filters, args.page_size), args.repeat)
+
+        print(f"{label:<28} {totals['transaction_count']:>9,} {page_p50:6.1f} ms {page_p95:6.1f} ms "
+              f"{later_p50:6.1f} ms {totals_p50:6.1f} ms {like_p50:6.1f} ms")
+        if max(page_p95, later_p95) > args.target_ms:
+            missed.append(label)
+    db.close()
+
+    for label in missed:
+        print(f"MISSED TARGET {label}: p95 over {args.target_ms:g} ms")
+    return 1 if missed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Time cold and warm starts of the Streamlit app.
+
+A cold start is the first render of a page in a fresh Python process: the
+app's imports, creating the shared Database and checking the schema. A warm
+start is every rerun after that, which is what each widget interaction
+costs. Each cold sample runs in its own subprocess through Streamlit's
+AppTest harness against a small synthetic ledger; the report also lists
+which heavy libraries the page ended up importing.
+
+    python -m benchmarks.startup --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from benchmarks.ledger import SIZES, open_ledger, parse_size
+from benchmarks.suite import percentile
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+PAGES = ["Dashboard", "Add Transaction", "Import", "View Transactions", "Budget Management", "Recurring",
+         "Reports"]
+
+# Libraries worth knowing about when they load on a page
+HEAVY_MODULES = ("pandas", "plotly", "numpy", "pyarrow")
+
+def render(page, reruns):
+    """Render page once in this process, then rerun it; return the timings as a dict"""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    framework_ms = (time.perf_counter() - started) * 1000
+
+    app = AppTest.from_file(APP, default_timeout=120)
+    app.session_state["page"] = page
+
+    started = time.perf_counter()
+    app.run()
+    cold_ms = (time.perf_counter() - started) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    warm = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        warm.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'page': page,
+        'framework_ms': framework_ms,
+        'cold_ms': cold_ms,
+        'warm_ms': warm,
+        'modules': loaded,
+        'errors': [str(e.value) for e in app.exception]
+    }
+
+def cold_sample(page, reruns):
+    """Run render() in a fresh interpreter and return its result"""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", page, "--reruns", str(reruns)],
+        capture_output=True, text=True, env=os.environ.copy(),
+        cwd=os.path.dirname(APP)
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=SIZES['10k'],
+                        help="10k, 1m, 10m or a row count (default: 10k)")
+    parser.add_argument("--repeat", type=int, default=5, help="cold starts per page")
+    parser.add_argument("--reruns", type=int, default=5, help="warm reruns after each cold start")
+    parser.add_argument("--pages", nargs="+", default=PAGES)
+    parser.add_argument("--db-path",
+                        help="SQLite file to use; an existing ledger of at least --size rows is reused")
+    parser.add_argument("--output", help="write the JSON results here")
+    parser.add_argument("--child", metavar="PAGE", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(render(args.child, args.reruns), default=str))
+        return 0
+
+    db, _ = open_ledger(args.size, db_path=args.db_path)
+    if db is None:
+        return 1
+    db.close()
+
+    results = {}
+    print(f"{'page':<20} {'cold p50':>10} {'cold p95':>10} {'warm p50':>10}  modules")
+    for page in args.pages:
+        samples = [cold_sample(page, args.reruns) for _ in range(args.repeat)]
+        samples = [sample for sample in samples if sample is not None]
+        if not samples:
+            return 1
+        errors = [error for sample in samples for error in sample['errors']]
+        cold = [sample['cold_ms'] for sample in samples]
+        warm = [ms for sample in samples for ms in sample['warm_ms']]
+        results[page] = {
+            'cold_p50_ms': percentile(cold, 50),
+            'cold_p95_ms': percentile(cold, 95),
+            'warm_p50_ms': percentile(warm, 50) if warm else None,
+            'warm_p95_ms': percentile(warm, 95) if warm else None,
+            'framework_ms': percentile([sample['framework_ms'] for sample in samples], 50),
+            'modules': samples[-1]['modules'],
+            'errors': errors
+        }
+        stats = results[page]
+        print(f"{page:<20} {stats['cold_p50_ms']:7.0f} ms {stats['cold_p95_ms']:7.0f} ms "
+              f"{stats['warm_p50_ms'] or 0:7.1f} ms  {', '.join(stats['modules']) or '-'}"
+              + (f"  ({len(errors)} errors)" if errors else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
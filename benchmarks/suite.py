@@ -0,0 +1,204 @@
+"""Time every data-access helper the app uses against a synthetic ledger.
+
+Loads a ledger from benchmarks.ledger into a local database (a temporary
+SQLite file unless --db-path or DB_BACKEND say otherwise), runs each helper
+repeatedly with the query cache disabled and writes p50/p95 latency,
+rows/sec and peak RSS as JSON. Pass --baseline with an earlier result file
+to flag helpers whose median got slower than --threshold allows.
+
+    python -m benchmarks.suite --size 10k --output baseline.json
+    python -m benchmarks.suite --size 10k --baseline baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import date, timedelta
+from benchmarks.ledger import END_DATE, SIZES, open_ledger, parse_size
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def row_count(result):
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return 1
+
+def cases(end=END_DATE):
+    """Return (name, fn(db, run)) pairs covering every helper the pages call"""
+    from queries import (add_transaction, get_balance_series, get_budget_vs_actual,
+                         get_monthly_trend, get_period_totals, get_transactions,
+                         get_transactions_page, get_transactions_summary, set_budget)
+
+    month_start = end.replace(day=1)
+    month = month_start.strftime("%Y-%m")
+    # Ranges that start mid-month exercise both the rollup and the raw edge scans
+    quarter_start = end - timedelta(days=90)
+    year_start = end - timedelta(days=365)
+    budget_categories = ['Food', 'Transportation', 'Entertainment', 'Utilities', 'Shopping']
+
+    return [
+        ("get_transactions (one month)",
+         lambda db, run: get_transactions(db, month_start, end)),
+        ("get_transactions (one month, expense, Food)",
+         lambda db, run: get_transactions(db, month_start, end, 'expense', 'Food')),
+        ("get_transactions_page (first page)",
+         lambda db, run: get_transactions_page(db, page_size=50)),
+        ("get_transactions_summary (all time)",
+         lambda db, run: get_transactions_summary(db)),
+        ("get_transactions_summary (last 90 days)",
+         lambda db, run: get_transactions_summary(db, quarter_start, end)),
+        ("get_budget_vs_actual",
+         lambda db, run: get_budget_vs_actual(db, month)),
+        ("get_monthly_trend (last 12 months)",
+         lambda db, run: get_monthly_trend(db, year_start, end)),
+        ("get_period_totals (last 90 days)",
+         lambda db, run: get_period_totals(db, quarter_start, end)),
+        ("get_period_totals (all time)",
+         lambda db, run: get_period_totals(db)),
+        ("get_balance_series (last 12 months)",
+         lambda db, run: get_balance_series(db, year_start, end)),
+        ("set_budget (update)",
+         lambda db, run: set_budget(db, budget_categories[run % len(budget_categories)],
+                                    50000 + run, month)),
+        ("add_transaction",
+         lambda db, run: add_transaction(db, 1234, 'Food', 'expense',
+                                         "Benchmark insert", end)),
+        # Shifts the prefix sums of every later day in daily_balances
+        ("add_transaction (backdated one year)",
+         lambda db, run: add_transaction(db, 1234, 'Food', 'expense',
+                                         "Benchmark insert", year_start)),
+    ]
+
+def time_case(db, fn, repeat, warmup):
+    """Run fn repeat times after warmup runs and summarise the latencies"""
+    for run in range(warmup):
+        fn(db, run)
+
+    latencies = []
+    rows = 0
+    for run in range(repeat):
+        started = time.perf_counter()
+        result = fn(db, warmup + run)
+        latencies.append(time.perf_counter() - started)
+        rows += row_count(result)
+
+    total = sum(latencies)
+    return {
+        'runs': repeat,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'mean_ms': total / repeat * 1000,
+        'rows_per_call': rows / repeat,
+        'rows_per_sec': rows / total if total else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def compare(results, baseline, threshold):
+    """Return (name, baseline p50, current p50, ratio) for helpers slower than the threshold"""
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous['p50_ms']:
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms']
+        if ratio > 1 + threshold:
+            regressions.append((name, previous['p50_ms'], current['p50_ms'], ratio))
+    return regressions
+
+def print_report(results, baseline=None):
+    print(f"{'helper':<46} {'p50 ms':>9} {'p95 ms':>9} {'rows/sec':>12} {'RSS MiB':>8}"
+          + (f" {'vs base':>8}" if baseline else ""))
+    for name, stats in results['results'].items():
+        line = (f"{name:<46} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} "
+                f"{stats['rows_per_sec']:12,.0f} {stats['peak_rss_mb'] or 0:8.1f}")
+        previous = (baseline or {}).get('results', {}).get(name)
+        if previous and previous['p50_ms']:
+            line += f" {stats['p50_ms'] / previous['p50_ms']:7.2f}x"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=parse_size, default=SIZES['10k'],
+                        help="10k, 1m, 10m or a row count (default: 10k)")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--db-path",
+                        help="SQLite file to use; an existing ledger of at least --size rows is reused")
+    parser.add_argument("--cache", action="store_true", help="leave the query cache enabled")
+    parser.add_argument("--output", help="write the JSON results here")
+    parser.add_argument("--baseline", help="earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed p50 slowdown before a helper is flagged (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    db, load_seconds = open_ledger(args.size, args.years, args.users, args.seed,
+                                   args.db_path, args.cache)
+    if db is None:
+        return 1
+
+    results = {
+        'meta': {
+            'rows': args.size,
+            'years': args.years,
+            'users': args.users,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'cache': args.cache,
+            'backend': type(db.backend).__name__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': date.today().isoformat()
+        },
+        'load': {
+            'seconds': load_seconds,
+            'rows_per_sec': args.size / load_seconds if load_seconds else None
+        },
+        'results': {}
+    }
+    for name, fn in cases():
+        results['results'][name] = time_case(db, fn, args.repeat, args.warmup)
+    results['peak_rss_mb'] = peak_rss_mb()
+    db.close()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('rows') != args.size:
+            print(f"warning: baseline was recorded with {baseline['meta'].get('rows')} rows", file=sys.stderr)
+
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, previous, current, ratio in regressions:
+            print(f"REGRESSION {name}: p50 {previous:.2f} ms -> {current:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+import argparse
+import re
+import sys
+from money import format_cents, to_cents
+from queries import transaction_write_tags
+from rollup import apply_to_rollup
+
+# Category rules pick a category for a transaction from its description and
+# amount, e.g. "uber" -> Transportation or "payroll" over $1,000 -> Salary.
+#
+# All of the rules are compiled into one CategoryMatcher. The substring
+# rules become a single regex shaped like a trie ("uber|uber eats|ubs" is
+# emitted as "ub(?:er(?: eats)?|s)"), so a description is scanned once no
+# matter how many rules there are; regex rules are checked alongside it.
+# When several rules match, the one with the highest priority wins, then
+# the oldest. A rule only applies to transactions of its category's type.
+
+MATCH_TYPES = ('contains', 'regex')
+
+RULE_COLUMNS = (
+    "category_rules.id, category_rules.pattern, category_rules.match_type, category_rules.category, "
+    "categories.type, category_rules.min_amount_cents, category_rules.max_amount_cents, "
+    "category_rules.priority"
+)
+
+DEFAULT_BATCH_SIZE = 1000
+# Statements repeat the same descriptions, so the rules matching each one are cached
+MAX_CACHED_DESCRIPTIONS = 100000
+
+def _trie_pattern(words):
+    """Return a regex matching any of words, with shared prefixes factored out"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = "|".join(branches)
+        if '' in node:
+            # A word ends here; the regex prefers the longer words that continue it
+            return f"(?:{body})?"
+        return body if len(branches) == 1 else f"(?:{body})"
+
+    return emit(trie)
+
+class CategoryMatcher:
+    """Category rules compiled for matching many descriptions"""
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: (-rule['priority'], rule['id']))
+        contains = {}
+        self.regexes = []
+        for rank, rule in enumerate(self.rules):
+            if rule['match_type'] == 'regex':
+                self.regexes.append((rank, re.compile(rule['pattern'], re.IGNORECASE)))
+            else:
+                contains.setdefault(rule['pattern'].lower(), []).append(rank)
+
+        # The scan reports the longest word starting at each position; every
+        # word that is a prefix of it matches there too
+        self.word_ranks = {
+            word: [rank for end in range(1, len(word) + 1) for rank in contains.get(word[:end], [])]
+            for word in contains
+        }
+        self.scanner = re.compile(f"(?=({_trie_pattern(contains)}))") if contains else None
+        self._cache = {}
+
+    def candidates(self, description):
+        """Return the ranks of the rules whose pattern matches description, best first"""
+        text = (description or "").lower()
+        ranks = self._cache.get(text)
+        if ranks is None:
+            found = set()
+            if self.scanner:
+                for word in self.scanner.findall(text):
+                    found.update(self.word_ranks[word])
+            for rank, regex in self.regexes:
+                if regex.search(text):
+                    found.add(rank)
+            ranks = sorted(found)
+            if len(self._cache) >= MAX_CACHED_DESCRIPTIONS:
+                self._cache.clear()
+            self._cache[text] = ranks
+        return ranks
+
+    def match(self, description, type, amount_cents):
+        """Return the category of the best rule for a transaction, or None when no rule applies"""
+        for rank in self.candidates(description):
+            rule = self.rules[rank]
+            if rule['type'] != type:
+                continue
+            if rule['min_amount_cents'] is not None and amount_cents < rule['min_amount_cents']:
+                continue
+            if rule['max_amount_cents'] is not None and amount_cents > rule['max_amount_cents']:
+                continue
+            return rule['category']
+        return None
+
+    def categorize(self, rows, positions=None):
+        """Return (amount_cents, category, type, description, ...) rows with matched categories filled in.
+
+        Only the rows at positions are considered when given; rows no rule
+        matches keep their category.
+        """
+        result = list(rows)
+        for i in range(len(rows)) if positions is None else positions:
+            row = rows[i]
+            category = self.match(row[3], row[2], row[0])
+            if category:
+                result[i] = row[:1] + (category,) + row[2:]
+        return result
+
+def get_category_rules(db):
+    query = f"""
+        SELECT {RULE_COLUMNS}
+        FROM category_rules
+        JOIN categories ON categories.ledger_id = category_rules.ledger_id
+            AND categories.name = category_rules.category
+        WHERE category_rules.ledger_id = %s
+        ORDER BY category_rules.priority DESC, category_rules.id
+    """
+    result = db.execute_query(query, (db.ledger_id,), fetch=True, cache_tags=['category_rules', 'categories'])
+    return result if result else []
+
+# The matcher compiled for each ledger's current rules, kept until they change
+_compiled = {}
+
+def load_matcher(db):
+    """Return a CategoryMatcher for the ledger's stored rules, or None when there are none"""
+    rules = get_category_rules(db)
+    if not rules:
+        return None
+    key = tuple(tuple(rule.values()) for rule in rules)
+    compiled = _compiled.get(db.ledger_id)
+    if compiled is None or compiled[0] != key:
+        compiled = _compiled[db.ledger_id] = (key, CategoryMatcher(rules))
+    return compiled[1]
+
+def add_category_rule(db, pattern, category, match_type='contains', min_amount_cents=None,
+                      max_amount_cents=None, priority=0):
+    """Create a rule and return its id; existing transactions are only changed by recategorize"""
+    pattern = (pattern or "").strip()
+    if not pattern:
+        raise ValueError("pattern is empty")
+    if match_type not in MATCH_TYPES:
+        raise ValueError(f"match_type must be one of {', '.join(MATCH_TYPES)}")
+    if match_type == 'regex':
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"invalid regex: {e}")
+    if min_amount_cents is not None and max_amount_cents is not None and min_amount_cents > max_amount_cents:
+        raise ValueError("min_amount_cents is above max_amount_cents")
+    if not db.execute_query("SELECT name FROM categories WHERE ledger_id = %s AND name = %s",
+                            (db.ledger_id, category), fetch=True):
+        raise ValueError(f"unknown category {category!r}")
+
+    result = db.execute_query(
+        """
+            INSERT INTO category_rules (ledger_id, pattern, match_type, category, min_amount_cents,
+                                        max_amount_cents, priority)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """,
+        (db.ledger_id, pattern, match_type, category, min_amount_cents, max_amount_cents, priority)
+    )
+    db.invalidate(['category_rules'])
+    return result
+
+def delete_category_rule(db, rule_id):
+    """Remove a rule; categories it already assigned are kept"""
+    result = db.execute_query("DELETE FROM category_rules WHERE ledger_id = %s AND id = %s",
+                              (db.ledger_id, rule_id))
+    db.invalidate(['category_rules'])
+    return result is not None
+
+def recategorize(db, start_date=None, end_date=None, overwrite=False, dry_run=False,
+                 batch_size=DEFAULT_BATCH_SIZE):
+    """Run the rules over stored transactions in batches of batch_size, one database transaction each.
+
+    Without overwrite only rows in the importer's fallback categories
+    (Other Income / Other Expense) are changed; with it, any row a rule
+    matches takes the rule's category. The rollup moves with each change.
+    Returns a dict with scanned, changed and months, or None when there
+    are no rules or a batch failed (batches already written stay written).
+    """
+    from importer import DEFAULT_CATEGORIES
+
+    matcher = load_matcher(db)
+    if matcher is None:
+        return None
+
+    where, params = "WHERE ledger_id = %s AND id > %s", []
+    if start_date:
+        where += " AND date >= %s"
+        params.append(start_date)
+    if end_date:
+        where += " AND date <= %s"
+        params.append(end_date)
+    if not overwrite:
+        where += f" AND category IN ({', '.join(['%s'] * len(DEFAULT_CATEGORIES))})"
+        params.extend(DEFAULT_CATEGORIES.values())
+    query = f"""
+        SELECT id, date, type, category, amount_cents, description FROM transactions
+        {where}
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE
+    """
+
+    result = {'scanned': 0, 'changed': 0, 'months': set()}
+    last_id = 0
+    while True:
+        def work(cursor):
+            cursor.execute(query, [db.ledger_id, last_id] + params + [batch_size])
+            rows = cursor.fetchall()
+            changed = []
+            for row in rows:
+                category = matcher.match(row['description'], row['type'], row['amount_cents'])
+                if category and category != row['category']:
+                    changed.append((row, category))
+            if changed and not dry_run:
+                cursor.executemany(
+                    "UPDATE transactions SET category = %s WHERE id = %s",
+                    [(category, row['id']) for row, category in changed]
+                )
+                # Move each amount from the old (month, type, category) rollup row to the new one
+                apply_to_rollup(cursor, db.ledger_id, [
+                    (row['amount_cents'], row['category'], row['type'], row['date']) for row, _ in changed
+                ], sign=-1)
+                apply_to_rollup(cursor, db.ledger_id, [
+                    (row['amount_cents'], category, row['type'], row['date']) for row, category in changed
+                ])
+            return rows, changed
+
+        batch = db.run_in_transaction(work)
+        if batch is None:
+            return None
+        rows, changed = batch
+        months = {row['date'].strftime("%Y-%m") for row, _ in changed}
+        if months and not dry_run:
+            db.invalidate(transaction_write_tags(months))
+        result['scanned'] += len(rows)
+        result['changed'] += len(changed)
+        result['months'] |= months
+        if len(rows) < batch_size:
+            return result
+        last_id = rows[-1]['id']
+
+def main(argv=None):
+    from database import DEFAULT_LEDGER_ID, Database
+    from datetime import date
+
+    parser = argparse.ArgumentParser(description="Manage category rules and re-categorize transactions")
+    parser.add_argument("--ledger", type=int, default=DEFAULT_LEDGER_ID)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list the rules, highest priority first")
+    add = subparsers.add_parser("add", help="add a rule")
+    add.add_argument("pattern")
+    add.add_argument("category")
+    add.add_argument("--regex", action="store_true", help="treat pattern as a regular expression")
+    add.add_argument("--min-amount", help="only amounts of at least this many dollars")
+    add.add_argument("--max-amount", help="only amounts of at most this many dollars")
+    add.add_argument("--priority", type=int, default=0)
+    delete = subparsers.add_parser("delete", help="delete a rule")
+    delete.add_argument("rule_id", type=int)
+    run = subparsers.add_parser("recategorize", help="apply the rules to stored transactions")
+    run.add_argument("--start", type=date.fromisoformat)
+    run.add_argument("--end", type=date.fromisoformat)
+    run.add_argument("--overwrite", action="store_true",
+                     help="also change rows that already have a specific category")
+    run.add_argument("--dry-run", action="store_true", help="count the changes without writing them")
+    run.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    db = Database().for_ledger(args.ledger)
+    if not db.initialize_database():
+        return 1
+
+    if args.command == "list":
+        for rule in get_category_rules(db):
+            amounts = ""
+            if rule['min_amount_cents'] is not None or rule['max_amount_cents'] is not None:
+                low = format_cents(rule['min_amount_cents']) if rule['min_amount_cents'] is not None else ""
+                high = format_cents(rule['max_amount_cents']) if rule['max_amount_cents'] is not None else ""
+                amounts = f" amount {low}..{high}"
+            print(f"{rule['id']:>4} [{rule['priority']:>3}] {rule['match_type']:<8} {rule['pattern']!r:<30} "
+                  f"-> {rule['category']} ({rule['type']}){amounts}")
+        return 0
+
+    if args.command == "add":
+        try:
+            rule_id = add_category_rule(
+                db, args.pattern, args.category, 'regex' if args.regex else 'contains',
+                to_cents(args.min_amount) if args.min_amount else None,
+                to_cents(args.max_amount) if args.max_amount else None,
+                args.priority
+            )
+        except ValueError as e:
+            print(f"Error adding rule: {e}")
+            return 1
+        if not rule_id:
+            return 1
+        print(f"Added rule {rule_id}")
+        return 0
+
+    if args.command == "delete":
+        return 0 if delete_category_rule(db, args.rule_id) else 1
+
+    result = recategorize(db, args.start, args.end, args.overwrite, args.dry_run, args.batch_size)
+    if result is None:
+        print("No rules to apply, or re-categorizing failed")
+        return 1
+    verb = "Would change" if args.dry_run else "Changed"
+    print(f"{verb} {result['changed']} of {result['scanned']} transactions "
+          f"in {len(result['months'])} months")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import json
+from datetime import date, timedelta
+from queries import get_balance_arrays, get_period_totals, get_transactions_summary, month_tags
+
+# Chart data for the Dashboard and Reports pages, built once per range and
+# served as Plotly figure JSON from the query cache until a write touches
+# the range.
+#
+# A series never has more than max_points points. Income and expense totals
+# are summed into days, weeks or months, the finest giving at most
+# TREND_BUCKETS points. The running balance keeps its daily steps and is
+# downsampled with Largest-Triangle-Three-Buckets (LTTB), which keeps the
+# peaks and dips a plain every-nth-point sample would drop.
+
+GRANULARITIES = ('day', 'week', 'month')
+GRANULARITY_LABELS = {'day': "Day", 'week': "Week starting", 'month': "Month"}
+DEFAULT_MAX_POINTS = 500
+# Daily totals over a year are noise; a trend reads best with fewer points
+TREND_BUCKETS = 90
+# Series with more points than this are drawn without markers
+MAX_MARKERS = 100
+
+def bucket_start(day, granularity):
+    """Return the first day of the day, week (Monday) or month bucket holding day"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def bucket_starts(start_date, end_date, granularity):
+    """Return the first day of every bucket overlapping the inclusive range"""
+    buckets = []
+    current = bucket_start(start_date, granularity)
+    while current <= end_date:
+        buckets.append(current)
+        if granularity == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += timedelta(days=7 if granularity == 'week' else 1)
+    return buckets
+
+def pick_granularity(start_date, end_date, max_buckets=TREND_BUCKETS):
+    """Return the finest granularity with at most max_buckets buckets in the range"""
+    days = (end_date - start_date).days + 1
+    if days <= max_buckets:
+        return 'day'
+    if days // 7 + 2 <= max_buckets:
+        return 'week'
+    return 'month'
+
+def lttb(points, threshold):
+    """Downsample (x, y) points sorted by x to threshold points with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept. The rest are split into
+    threshold - 2 buckets and from each the point forming the largest
+    triangle with the point kept before it and the average of the next
+    bucket is kept.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    kept = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, count)
+        following = points[end:next_end]
+        average_x = sum(point[0] for point in following) / len(following)
+        average_y = sum(point[1] for point in following) / len(following)
+
+        kept_x, kept_y = points[kept]
+        best, best_area = start, -1
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((kept_x - average_x) * (y - kept_y) - (kept_x - x) * (average_y - kept_y))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        kept = best
+    sampled.append(points[-1])
+    return sampled
+
+def trend_points(db, start_date, end_date, granularity):
+    """Return (bucket start, income_cents, expense_cents) for every bucket in the range, or None on error"""
+    import numpy as np
+
+    days = get_balance_arrays(db, start_date, end_date)
+    if days is None:
+        return None
+    buckets = bucket_starts(start_date, end_date, granularity)
+    income = np.zeros(len(buckets), dtype=np.int64)
+    expense = np.zeros(len(buckets), dtype=np.int64)
+    if len(days['date']):
+        # Buckets are sorted, so each day belongs to the last one starting on or before it
+        index = np.searchsorted(np.array(buckets, dtype='datetime64[D]'), days['date'], side='right') - 1
+        np.add.at(income, index, days['income_cents'])
+        np.add.at(expense, index, days['expense_cents'])
+    return list(zip(buckets, income.tolist(), expense.tolist()))
+
+def _range_tags(start_date, end_date):
+    return month_tags(start_date.strftime("%Y-%m"), end_date.strftime("%Y-%m"))
+
+def _scatter(points, max_points, **kwargs):
+    """Return a Scatter of (date, cents) points downsampled to max_points, plotted in dollars"""
+    import plotly.graph_objects as go
+
+    series = lttb([(day.toordinal(), cents) for day, cents in points], max_points)
+    return go.Scatter(
+        x=[date.fromordinal(x) for x, _ in series],
+        y=[cents / 100 for _, cents in series],
+        mode='lines+markers' if len(series) <= MAX_MARKERS else 'lines',
+        **kwargs
+    )
+
+def trend_figure(db, start_date, end_date, granularity=None, max_points=DEFAULT_MAX_POINTS):
+    """Return the income and expenses line chart as Plotly figure JSON, or None when nothing was recorded"""
+    granularity = granularity or pick_granularity(start_date, end_date)
+
+    def build():
+        import plotly.graph_objects as go
+
+        points = trend_points(db, start_date, end_date, granularity)
+        if not points or not any(income or expense for _, income, expense in points):
+            return None
+        fig = go.Figure()
+        fig.add_trace(_scatter([(day, income) for day, income, _ in points], max_points, name='Income'))
+        fig.add_trace(_scatter([(day, expense) for day, _, expense in points], max_points, name='Expenses'))
+        fig.update_layout(
+            xaxis_title=GRANULARITY_LABELS[granularity],
+            yaxis_title="Amount ($)",
+            hovermode='x unified'
+        )
+        return fig.to_json()
+
+    return db.cached(('trend_figure', start_date, end_date, granularity, max_points), build,
+                     _range_tags(start_date, end_date))
+
+def balance_figure(db, start_date, end_date, max_points=DEFAULT_MAX_POINTS):
+    """Return the running balance step chart as Plotly figure JSON, or None when the range has no transactions"""
+    def build():
+        import plotly.graph_objects as go
+
+        totals = get_period_totals(db, start_date, end_date)
+        days = get_balance_arrays(db, start_date, end_date)
+        if not totals or days is None or not len(days['date']):
+            return None
+        # Start from the balance carried into the range
+        points = [(start_date, totals['opening_balance_cents'])]
+        points += zip(days['date'].tolist(), days['balance_cents'].tolist())
+        fig = go.Figure(_scatter(points, max_points, line_shape='hv', showlegend=False))
+        fig.update_layout(xaxis_title="Date", yaxis_title="Balance ($)")
+        return fig.to_json()
+
+    # The opening balance depends on every earlier transaction, not just the range's
+    return db.cached(('balance_figure', start_date, end_date, max_points), build, ['balances'])
+
+def category_figure(db, start_date, end_date):
+    """Return the income and expense category treemap as Plotly figure JSON, or None when nothing was recorded"""
+    def build():
+        import plotly.graph_objects as go
+
+        summary = get_transactions_summary(db, start_date, end_date)
+        if not summary:
+            return None
+        types = sorted({row['type'] for row in summary})
+        colors = {'income': 'green', 'expense': 'red'}
+        # Each type's box is sized by the categories under it
+        fig = go.Figure(go.Treemap(
+            ids=types + [f"{row['type']}/{row['category']}" for row in summary],
+            labels=types + [row['category'] for row in summary],
+            parents=[""] * len(types) + [row['type'] for row in summary],
+            values=[0] * len(types) + [row['total_cents'] / 100 for row in summary],
+            marker_colors=[colors[type] for type in types] + [colors[row['type']] for row in summary],
+            branchvalues='remainder'
+        ))
+        return fig.to_json()
+
+    return db.cached(('category_figure', start_date, end_date), build, _range_tags(start_date, end_date))
+
+def load_figure(payload):
+    """Turn a cached figure payload into the dict st.plotly_chart draws"""
+    return json.loads(payload)
@@ -1,129 +1,586 @@
-import mysql.connector
-from mysql.connector import Error
+import asyncio
+import copy
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from backends import get_backend
+from cache import QueryCache
+from migrations import apply_migrations, latest_version
+from profiling import QueryProfiler, caller_name, internal_module
 
 load_dotenv()
 
+# Report the helper that called into the database, not the database methods themselves
+internal_module(__file__)
+
+# Ledger that existing data and unscoped Database objects belong to
+DEFAULT_LEDGER_ID = 1
+
+# Categories every new ledger starts with
+DEFAULT_CATEGORIES = [
+    ('Salary', 'income'),
+    ('Freelance', 'income'),
+    ('Investment', 'income'),
+    ('Gift', 'income'),
+    ('Other Income', 'income'),
+    ('Food', 'expense'),
+    ('Transportation', 'expense'),
+    ('Entertainment', 'expense'),
+    ('Utilities', 'expense'),
+    ('Rent', 'expense'),
+    ('Healthcare', 'expense'),
+    ('Education', 'expense'),
+    ('Shopping', 'expense'),
+    ('Other Expense', 'expense')
+]
+
+def _column_to_array(values, kind):
+    """Convert one column of values to a NumPy array in a single pass.
+
+    values are raw bytes (MySQL raw cursor) or Python objects (SQLite);
+    kind is one of decimal, int, float, date, datetime or text.
+    """
+    import numpy as np
+
+    has_null = None in values
+    first = next((v for v in values if v is not None), None)
+    raw = isinstance(first, (bytes, bytearray))
+
+    if kind in ('date', 'datetime'):
+        unit = 'datetime64[D]' if kind == 'date' else 'datetime64[s]'
+        if raw:
+            return np.array([bytes(v) if v is not None else b'NaT' for v in values], dtype='S').astype(unit)
+        return np.array([v if v is not None else np.datetime64('NaT') for v in values], dtype=unit)
+
+    if kind in ('decimal', 'int', 'float'):
+        if raw:
+            numbers = np.array([bytes(v) if v is not None else b'nan' for v in values], dtype='S')
+        else:
+            numbers = np.array([v if v is not None else np.nan for v in values], dtype=object)
+        if kind == 'int' and not has_null:
+            return numbers.astype(np.int64)
+        numbers = numbers.astype(np.float64)
+        # Money is stored as BIGINT cents, so a DECIMAL column is an aggregate
+        # such as MySQL's SUM(amount_cents), already in cents. Whole values
+        # come back as int64, as SQLite's integer sums do.
+        if kind == 'decimal' and not has_null and np.array_equal(numbers, np.trunc(numbers)):
+            return numbers.astype(np.int64)
+        return numbers
+
+    return np.array(
+        [v.decode('utf-8') if isinstance(v, (bytes, bytearray)) else v for v in values],
+        dtype=object
+    )
+
+class ConnectionPool:
+    """Bounded pool of database connections shared across threads"""
+
+    def __init__(self, factory, size=5, timeout=10.0, health_check_interval=30.0,
+                 is_healthy=None, error=Exception):
+        self.factory = factory
+        self.is_healthy = is_healthy or (lambda conn: True)
+        self.error = error
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.created = 0
+        self.timeouts = 0
+
+    def acquire(self):
+        """Check out a connection, waiting up to the pool timeout for one to free up"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    print(f"Timed out after {self.timeout}s waiting for a database connection")
+                    return None
+                self.waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            if self._idle:
+                conn, last_used = self._idle.pop()
+            else:
+                conn, last_used = None, None
+                self._open += 1
+            self.in_use += 1
+
+        # Health check connections that have been idle for a while
+        if conn is not None and time.monotonic() - last_used > self.health_check_interval:
+            if not self.is_healthy(conn):
+                self._close(conn)
+                conn = None
+
+        if conn is None:
+            conn = self.factory()
+            if conn is None:
+                with self._cond:
+                    self._open -= 1
+                    self.in_use -= 1
+                    self._cond.notify()
+                return None
+            with self._cond:
+                self.created += 1
+
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding it if it is broken"""
+        healthy = True
+        try:
+            # Never hand the next caller someone else's open transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except self.error:
+            healthy = False
+
+        with self._cond:
+            self.in_use -= 1
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if not healthy:
+            self._close(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Return a snapshot of the pool metrics"""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'waiting': self.waiting,
+                'created': self.created,
+                'timeouts': self.timeouts
+            }
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except self.error:
+            pass
+
 class Database:
-    def __init__(self):
-        self.host = os.getenv('DB_HOST', 'localhost')
-        self.database = os.getenv('DB_NAME', 'finance_tracker')
-        self.user = os.getenv('DB_USER', 'root')
-        self.password = os.getenv('DB_PASSWORD', '')
+    def __init__(self, backend=None):
+        # Every helper reads and writes the rows of this ledger only; see for_ledger
+        self.ledger_id = DEFAULT_LEDGER_ID
+        self._root = self
+        self.backend = backend or get_backend()
+        # Exception type raised by the backend's driver
+        self.Error = self.backend.Error
+        self.pool = ConnectionPool(
+            self.create_connection,
+            size=int(os.getenv('DB_POOL_SIZE', '5')),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            health_check_interval=float(os.getenv('DB_POOL_HEALTH_CHECK', '30')),
+            is_healthy=self.backend.is_healthy,
+            error=self.backend.Error
+        )
+        self.cache = QueryCache(
+            max_entries=int(os.getenv('DB_CACHE_SIZE', '256')),
+            ttl=float(os.getenv('DB_CACHE_TTL', '300'))
+        )
+        self.profiler = QueryProfiler.from_env()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Set once the schema is known to be at latest_version()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
         
     def create_connection(self):
         """Create a database connection"""
+        return self.backend.connect()
+
+    def for_ledger(self, ledger_id):
+        """Return a Database for one ledger sharing this one's connections, cache and thread pool"""
+        scoped = copy.copy(self._root)
+        scoped.ledger_id = ledger_id
+        return scoped
+
+    def _ledger_tags(self, tags):
+        # Cache entries are shared by every ledger; a write only invalidates its own ledger's
+        return [f"ledger:{self.ledger_id}:{tag}" for tag in tags]
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out of the pool for the duration of a with block"""
+        conn = self.pool.acquire()
         try:
-            conn = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password
-            )
-            return conn
-        except Error as e:
-            print(f"Error connecting to MySQL: {e}")
-            return None
+            yield conn
+        finally:
+            if conn is not None:
+                self.pool.release(conn)
+
+    @contextmanager
+    def _profiled(self, query):
+        """Check out a connection and record the query's timings with the profiler.
+
+        Yields (conn, sample); callers fill in sample['rows'] and sample['error'].
+        """
+        helper = caller_name() if self.profiler.enabled else None
+        started = time.perf_counter()
+        conn = self.pool.acquire()
+        acquired = time.perf_counter()
+        sample = {'rows': 0, 'error': conn is None}
+        try:
+            yield conn, sample
+        finally:
+            finished = time.perf_counter()
+            if conn is not None:
+                self.pool.release(conn)
+            self.profiler.record(query, finished - started, acquired - started,
+                                 sample['rows'], sample['error'], helper)
+
+    def pool_stats(self):
+        """Return connection pool metrics (in use, waiting, created, ...)"""
+        return self.pool.stats()
+
+    def close(self):
+        """Close all pooled connections"""
+        root = self._root
+        if root._executor is not None:
+            root._executor.shutdown(wait=True)
+            root._executor = None
+        self.pool.close_all()
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(self, *args, **kwargs) on the query thread pool and return its Future.
+
+        fn is any data-access helper taking the database first. The thread
+        pool has as many workers as the connection pool has connections.
+        """
+        root = self._root
+        if root._executor is None:
+            with root._executor_lock:
+                if root._executor is None:
+                    root._executor = ThreadPoolExecutor(max_workers=self.pool.size,
+                                                        thread_name_prefix="db-query")
+        return root._executor.submit(fn, self, *args, **kwargs)
+
+    def gather(self, *calls):
+        """Run independent helpers concurrently and return their results in order.
+
+        Each call is a helper or a (helper, arg, ...) tuple, e.g.
+        db.gather((get_budgets, month), (get_budget_vs_actual, month)).
+        """
+        calls = [call if isinstance(call, tuple) else (call,) for call in calls]
+        futures = [self.submit(call[0], *call[1:]) for call in calls[1:]]
+        # The first call runs on the calling thread, saving one hand-off
+        first = [calls[0][0](self, *calls[0][1:])] if calls else []
+        return first + [future.result() for future in futures]
+
+    async def run_async(self, fn, *args, **kwargs):
+        """Awaitable form of submit for asyncio callers"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
     
     def initialize_database(self):
-        """Initialize the database with required tables"""
-        conn = self.create_connection()
-        if conn is None:
+        """Initialize the database with required tables.
+
+        The first call checks the recorded schema version and only creates
+        tables, seeds categories and migrates when it is behind; every later
+        call on this Database returns at once without touching the database.
+        """
+        root = self._root
+        if root._schema_ready:
+            return True
+        with root._schema_lock:
+            if root._schema_ready:
+                return True
+            with self.connection() as conn:
+                if conn is None:
+                    return False
+                root._schema_ready = self._schema_is_current(conn) or self._initialize_tables(conn)
+            return root._schema_ready
+
+    def _schema_is_current(self, conn):
+        """Return True when schema_migrations already records latest_version()"""
+        cursor = None
+        try:
+            cursor = self.backend.cursor(conn)
+            cursor.execute("SELECT MAX(version) FROM schema_migrations")
+            row = cursor.fetchone()
+            return bool(row) and row[0] == latest_version()
+        except self.Error:
+            # No schema_migrations table yet: a new database
             return False
-            
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.rollback()
+
+    def _initialize_tables(self, conn):
+        cursor = None
         try:
-            cursor = conn.cursor()
+            cursor = self.backend.cursor(conn)
             
-            # Create categories table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    name VARCHAR(50) UNIQUE NOT NULL,
-                    type ENUM('income', 'expense') NOT NULL
-                )
-            """)
+            # Create categories, transactions and budgets tables
+            for statement in self.backend.schema:
+                cursor.execute(statement)
             
-            # Create transactions table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    amount DECIMAL(10, 2) NOT NULL,
-                    category VARCHAR(50) NOT NULL,
-                    type ENUM('income', 'expense') NOT NULL,
-                    description TEXT,
-                    date DATE NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create budgets table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS budgets (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    category VARCHAR(50) NOT NULL,
-                    amount DECIMAL(10, 2) NOT NULL,
-                    month VARCHAR(7) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Insert default categories if they don't exist
-            default_categories = [
-                ('Salary', 'income'),
-                ('Freelance', 'income'),
-                ('Investment', 'income'),
-                ('Gift', 'income'),
-                ('Other Income', 'income'),
-                ('Food', 'expense'),
-                ('Transportation', 'expense'),
-                ('Entertainment', 'expense'),
-                ('Utilities', 'expense'),
-                ('Rent', 'expense'),
-                ('Healthcare', 'expense'),
-                ('Education', 'expense'),
-                ('Shopping', 'expense'),
-                ('Other Expense', 'expense')
-            ]
-            
-            for name, type in default_categories:
+            # Insert default categories if they don't exist; migration 11 assigns them to the default ledger
+            for name, type in DEFAULT_CATEGORIES:
                 cursor.execute(
                     "INSERT IGNORE INTO categories (name, type) VALUES (%s, %s)",
                     (name, type)
                 )
             
             conn.commit()
+
+            # Bring indexes and later schema changes up to date
+            apply_migrations(conn, self.backend)
             return True
             
-        except Error as e:
+        except self.Error as e:
             print(f"Error initializing database: {e}")
             return False
         finally:
-            if conn.is_connected():
+            if cursor is not None:
                 cursor.close()
-                conn.close()
     
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a query and return results if fetch is True"""
-        conn = self.create_connection()
-        if conn is None:
-            return None
-            
-        try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(query, params)
-            
-            if fetch:
-                result = cursor.fetchall()
-            else:
-                conn.commit()
-                result = cursor.lastrowid
-            
+    def execute_query(self, query, params=None, fetch=False, cache_tags=None):
+        """Execute a query and return results if fetch is True.
+
+        Read queries given cache_tags are served from the shared query cache
+        until a write invalidates one of their tags or the entry expires.
+        """
+        if fetch and cache_tags is not None:
+            key = self.cache.make_key(query, params)
+            hit, result = self.cache.get(key)
+            if hit:
+                self.profiler.record_cache_hit(query)
+                return result
+            result = self._execute(query, params, fetch)
+            if result is not None:
+                self.cache.set(key, result, self._ledger_tags(cache_tags))
             return result
-        except Error as e:
-            print(f"Error executing query: {e}")
+        return self._execute(query, params, fetch)
+
+    def cached(self, key, compute, cache_tags):
+        """Return compute() for this ledger, served from the shared cache like execute_query.
+
+        For values built from several queries, such as chart payloads. key
+        must be hashable and identify the value within the ledger; a None
+        result is not cached.
+        """
+        key = ('cached', self.ledger_id) + tuple(key)
+        hit, result = self.cache.get(key)
+        if hit:
+            return result
+        result = compute()
+        if result is not None:
+            self.cache.set(key, result, self._ledger_tags(cache_tags))
+        return result
+
+    def invalidate(self, tags):
+        """Drop this ledger's cached results carrying any of the given tags"""
+        return self.cache.invalidate(self._ledger_tags(tags))
+
+    def cache_stats(self):
+        """Return query cache hit/miss counters"""
+        return self.cache.stats()
+
+    def query_stats(self, n=10):
+        """Return the n most expensive queries recorded by the profiler"""
+        return self.profiler.top_queries(n)
+
+    def _execute(self, query, params, fetch):
+        with self._profiled(query) as (conn, sample):
+            if conn is None:
+                return None
+
+            cursor = None
+            try:
+                cursor = self.backend.cursor(conn, dictionary=True)
+                cursor.execute(query, params)
+                
+                if fetch:
+                    result = cursor.fetchall()
+                    sample['rows'] = len(result)
+                else:
+                    conn.commit()
+                    result = cursor.lastrowid
+                    sample['rows'] = max(cursor.rowcount, 0)
+                
+                return result
+            except self.Error as e:
+                sample['error'] = True
+                print(f"Error executing query: {e}")
+                return None
+            finally:
+                if cursor is not None:
+                    cursor.close()
+
+    def fetch_arrays(self, query, params=None, chunk_size=10000, cache_tags=None):
+        """Run a read query and return its result column-wise as {name: NumPy array}.
+
+        Rows are fetched in chunks and parsed a column at a time, so no dict
+        (and, on MySQL, no Decimal) is built per row. Money is stored as BIGINT
+        cents and arrives as int64 like every integer column; DECIMAL columns,
+        such as MySQL's sums of cents, keep their value and become int64 when
+        whole, float64 otherwise. Dates become datetime64 and text object
+        arrays. Numeric columns containing NULL become float64 with NaN, in
+        the same unit (and dates NaT). With cache_tags the arrays are served
+        from the shared query cache like execute_query results, read-only.
+        Returns None on error.
+        """
+        if cache_tags is not None:
+            # Keyed apart from execute_query's rows for the same query
+            key = ('arrays',) + self.cache.make_key(query, params)
+            hit, result = self.cache.get(key)
+            if hit:
+                self.profiler.record_cache_hit(query)
+                return result
+            result = self.fetch_arrays(query, params, chunk_size)
+            if result is not None:
+                for array in result.values():
+                    array.flags.writeable = False
+                self.cache.set(key, result, self._ledger_tags(cache_tags))
+            return result
+
+        with self._profiled(query) as (conn, sample):
+            if conn is None:
+                return None
+
+            try:
+                names, kinds, columns = self.backend.fetch_columns(conn, query, params, chunk_size)
+                sample['rows'] = len(columns[0]) if columns else 0
+                return {
+                    name: _column_to_array(values, kind)
+                    for name, kind, values in zip(names, kinds, columns)
+                }
+            except self.Error as e:
+                sample['error'] = True
+                print(f"Error executing query: {e}")
+                return None
+
+    def fetch_frame(self, query, params=None, chunk_size=10000, cache_tags=None):
+        """Run a read query and return a pandas DataFrame built from fetch_arrays.
+
+        Cached arrays are shared, so a frame built from them gets its own copy.
+        """
+        import pandas as pd
+
+        arrays = self.fetch_arrays(query, params, chunk_size, cache_tags)
+        if arrays is None:
             return None
-        finally:
-            if conn.is_connected():
-                cursor.close()
-                conn.close()
\ No newline at end of file
+        return pd.DataFrame(arrays, copy=cache_tags is not None)
+
+    def stream_query(self, query, params=None, chunk_size=1000):
+        """Yield result rows as lists of tuples, chunk_size at a time, from an unbuffered cursor.
+
+        Rows are pulled from the server as the caller consumes them, so memory
+        stays flat however large the result is. Errors are printed and re-raised.
+        """
+        with self._profiled(query) as (conn, sample):
+            if conn is None:
+                raise self.Error("No database connection available")
+
+            cursor = None
+            try:
+                cursor = self.backend.cursor(conn, buffered=False)
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    sample['rows'] += len(rows)
+                    yield rows
+            except self.Error as e:
+                sample['error'] = True
+                print(f"Error streaming query: {e}")
+                raise
+            finally:
+                self.backend.finish_stream(conn)
+                if cursor is not None:
+                    cursor.close()
+
+    def explain(self, query, params=None):
+        """Return the query plan as MySQL-style EXPLAIN rows (table, type, key, rows, Extra)"""
+        with self.connection() as conn:
+            if conn is None:
+                return None
+
+            cursor = None
+            try:
+                cursor = self.backend.cursor(conn, dictionary=True)
+                return self.backend.explain(cursor, query, params)
+            except self.Error as e:
+                print(f"Error explaining query: {e}")
+                return None
+            finally:
+                if cursor is not None:
+                    cursor.close()
+
+    def read_snapshot(self, work):
+        """Call work(cursor) with an unbuffered cursor reading one consistent snapshot and return its result.
+
+        Nothing written after the snapshot starts is seen, however long work
+        takes, and writers are not blocked. Returns None on error.
+        """
+        with self._profiled("(snapshot)") as (conn, sample):
+            if conn is None:
+                return None
+
+            cursor = None
+            try:
+                self.backend.begin_snapshot(conn)
+                cursor = self.backend.cursor(conn, buffered=False)
+                result = work(cursor)
+                conn.commit()
+                return result
+            except self.Error as e:
+                sample['error'] = True
+                conn.rollback()
+                print(f"Error reading snapshot: {e}")
+                return None
+            finally:
+                if cursor is not None:
+                    cursor.close()
+
+    def run_in_transaction(self, work):
+        """Call work(cursor) inside a single transaction and return its result"""
+        with self._profiled("(transaction)") as (conn, sample):
+            if conn is None:
+                return None
+
+            cursor = None
+            try:
+                self.backend.begin(conn)
+                cursor = self.backend.cursor(conn, dictionary=True)
+                result = work(cursor)
+                conn.commit()
+                return result
+            except self.Error as e:
+                sample['error'] = True
+                conn.rollback()
+                print(f"Error executing transaction: {e}")
+                return None
+            finally:
+                if cursor is not None:
+                    cursor.close()
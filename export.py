@@ -0,0 +1,165 @@
+import argparse
+import csv
+import gzip
+import heapq
+import io
+import sys
+from archive import get_partitions, iter_archived_chunks
+from money import cents_to_str
+from queries import TRANSACTION_COLUMNS, TRANSACTION_FIELDS, transaction_filters
+
+# Streaming transaction export.
+#
+# Rows are pulled from an unbuffered cursor chunk by chunk and written out
+# straight away, so peak memory depends on the chunk size rather than on
+# the number of rows exported. Amounts are stored in cents and written as
+# plain dollar numbers, never as formatted strings, so an export can be
+# imported again. Archived rows are read a partition at a time and merged
+# into the stream in date order.
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Exported column names, in TRANSACTION_COLUMNS order with amount_cents written as amount
+COLUMNS = [name.strip() for name in TRANSACTION_COLUMNS.replace("amount_cents", "amount").split(",")]
+AMOUNT = COLUMNS.index('amount')
+
+FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet')
+}
+
+def iter_transaction_chunks(db, start_date=None, end_date=None, type_filter=None, category=None,
+                            chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of transaction row tuples in COLUMNS order, oldest first"""
+    where, params = transaction_filters(db.ledger_id, start_date, end_date, type_filter, category)
+    query = f"SELECT {TRANSACTION_COLUMNS} FROM transactions" + where + " ORDER BY date, id"
+    chunks = db.stream_query(query, params, chunk_size)
+    partitions = get_partitions(db, start_date, end_date)
+    if partitions is None:
+        raise db.Error("Could not read the archive catalog")
+    if not partitions:
+        return chunks
+
+    archived = iter_archived_chunks(partitions, TRANSACTION_FIELDS, start_date, end_date, type_filter, category,
+                                    chunk_size)
+    rows = heapq.merge(
+        (row for chunk in chunks for row in chunk),
+        (row for chunk in archived for row in chunk),
+        key=lambda row: (row[1], row[0])
+    )
+    return _rechunk(rows, chunk_size)
+
+def _rechunk(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_csv(chunks, out, compress=False):
+    """Write row chunks as CSV to the binary file object out, returning the row count"""
+    target = gzip.GzipFile(fileobj=out, mode="wb") if compress else out
+    text = io.TextIOWrapper(target, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(COLUMNS)
+    count = 0
+    for rows in chunks:
+        writer.writerows(
+            row[:AMOUNT] + (cents_to_str(row[AMOUNT]),) + row[AMOUNT + 1:] for row in rows
+        )
+        count += len(rows)
+    text.flush()
+    # Leave out open for the caller
+    text.detach()
+    if compress:
+        target.close()
+    return count
+
+def write_parquet(chunks, out):
+    """Write row chunks as Parquet row groups to out, returning the row count"""
+    try:
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    def decimal_column(cents, field):
+        # A decimal128 with scale 2 stores exactly the cents value, as a
+        # little-endian 128-bit integer, so build it straight from int64 words
+        words = np.empty((len(cents), 2), dtype='<i8')
+        words[:, 0] = cents
+        words[:, 1] = np.where(words[:, 0] < 0, -1, 0)
+        return pa.Array.from_buffers(field.type, len(cents), [None, pa.py_buffer(words)])
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.date32()),
+        ('type', pa.string()),
+        ('category', pa.string()),
+        ('amount', pa.decimal128(19, 2)),
+        ('description', pa.string())
+    ])
+    count = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [
+                    decimal_column(column, field) if field.name == 'amount'
+                    else pa.array(column, type=field.type)
+                    for column, field in zip(columns, schema)
+                ],
+                schema=schema
+            ))
+            count += len(rows)
+    return count
+
+def export_transactions(db, out, format='csv', start_date=None, end_date=None, type_filter=None,
+                        category=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream matching transactions to the binary file object out.
+
+    Returns the number of rows written, or None if the query failed.
+    """
+    try:
+        chunks = iter_transaction_chunks(db, start_date, end_date, type_filter, category, chunk_size)
+        if format == 'parquet':
+            return write_parquet(chunks, out)
+        return write_csv(chunks, out, compress=format == 'csv.gz')
+    except db.Error:
+        return None
+
+def main(argv=None):
+    from datetime import date
+    from database import DEFAULT_LEDGER_ID, Database
+
+    parser = argparse.ArgumentParser(description="Export transactions without loading them all into memory")
+    parser.add_argument("output", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--end", type=date.fromisoformat)
+    parser.add_argument("--type", choices=["income", "expense"])
+    parser.add_argument("--category")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--ledger", type=int, default=DEFAULT_LEDGER_ID)
+    args = parser.parse_args(argv)
+
+    db = Database().for_ledger(args.ledger)
+    if args.output == "-":
+        count = export_transactions(db, sys.stdout.buffer, args.format, args.start, args.end,
+                                    args.type, args.category, args.chunk_size)
+    else:
+        with open(args.output, "wb") as out:
+            count = export_transactions(db, out, args.format, args.start, args.end,
+                                        args.type, args.category, args.chunk_size)
+    if count is None:
+        return 1
+    print(f"Exported {count} transactions", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
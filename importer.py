@@ -0,0 +1,295 @@
+import argparse
+import csv
+import hashlib
+import io
+import re
+import sys
+import time
+from datetime import datetime
+from archive import archived_import_hashes
+from categorize import load_matcher
+from money import cents_to_str, to_cents
+from queries import write_new_transactions, transaction_write_tags
+
+# Streaming importer for bank statement exports (CSV and OFX/QFX).
+#
+# Records are parsed lazily, validated against the categories table and
+# written in executemany batches inside a single transaction. Every row is
+# stored with a content hash so that importing the same file again inserts
+# nothing. Lines without a category are categorized by the category rules
+# (see categorize.py), falling back to Other Income / Other Expense.
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REJECTED_DETAILS = 1000
+
+# Used when a statement line carries no category (OFX never does)
+DEFAULT_CATEGORIES = {
+    'income': 'Other Income',
+    'expense': 'Other Expense'
+}
+
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+def detect_format(filename):
+    """Guess the statement format from a file name"""
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+def parse_csv(stream):
+    """Yield (line_number, record) for each row of a CSV statement.
+
+    Expects a header with date and amount columns; type, category and
+    description are optional. Column names are case-insensitive.
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, {
+            'date': row.get('date'),
+            'amount': row.get('amount'),
+            'type': row.get('type'),
+            'category': row.get('category'),
+            'description': row.get('description')
+        }
+
+def _ofx_tokens(stream):
+    """Yield (closing, tag, value) for each tag in an OFX stream, read chunk by chunk"""
+    buffer = ""
+    for chunk in stream:
+        buffer += chunk
+        # Only tokenize up to the last '<' so a tag split across reads is kept for the next one
+        cut = buffer.rfind("<")
+        if cut <= 0:
+            continue
+        yield from OFX_TAG.findall(buffer[:cut])
+        buffer = buffer[cut:]
+    yield from OFX_TAG.findall(buffer)
+
+def parse_ofx(stream):
+    """Yield (transaction_number, record) for each STMTTRN block of an OFX/QFX statement.
+
+    Handles both SGML (unclosed tags) and XML flavours.
+    """
+    current = None
+    number = 0
+    for closing, tag, value in _ofx_tokens(stream):
+        tag = tag.upper()
+        if tag == 'STMTTRN':
+            if closing and current is not None:
+                number += 1
+                yield number, _ofx_record(current)
+                current = None
+            elif not closing:
+                current = {}
+        elif current is not None and not closing:
+            current[tag] = value.strip()
+
+def _ofx_record(fields):
+    amount = fields.get('TRNAMT', '')
+    description = " - ".join(part for part in (fields.get('NAME'), fields.get('MEMO')) if part)
+    return {
+        'date': fields.get('DTPOSTED', '')[:8],
+        'amount': amount,
+        'type': None,
+        'category': None,
+        'description': description or None,
+        'fitid': fields.get('FITID')
+    }
+
+def parse_date(value):
+    """Parse YYYY-MM-DD, YYYYMMDD, MM/DD/YYYY or DD.MM.YYYY"""
+    value = (value or "").strip()
+    for fmt in ("%Y-%m-%d", "%Y%m%d", "%m/%d/%Y", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date {value!r}")
+
+def normalize(record, categories):
+    """Turn a parsed record into an insertable (amount_cents, category, type, description, date) row.
+
+    Raises ValueError with the reason when the record must be rejected.
+    """
+    day = parse_date(record['date'])
+
+    raw_amount = (record['amount'] or "").strip().replace("$", "").replace(",", "")
+    try:
+        cents = to_cents(raw_amount)
+    except ValueError:
+        raise ValueError(f"invalid amount {record['amount']!r}")
+
+    type = (record.get('type') or "").strip().lower()
+    if not type:
+        type = 'expense' if cents < 0 else 'income'
+    if type not in ('income', 'expense'):
+        raise ValueError(f"invalid type {record['type']!r}")
+
+    cents = abs(cents)
+    if cents == 0:
+        raise ValueError("amount must be greater than 0")
+
+    category = (record.get('category') or "").strip() or DEFAULT_CATEGORIES[type]
+    if category not in categories:
+        raise ValueError(f"unknown category {category!r}")
+    if categories[category] != type:
+        raise ValueError(f"category {category!r} is not an {type} category")
+
+    description = (record.get('description') or "").strip() or None
+    return cents, category, type, description, day
+
+def content_hash(row, occurrence, fitid=None):
+    """Hash a row so identical re-imports collide while repeated lines within a file do not"""
+    if fitid:
+        key = f"fitid|{fitid}"
+    else:
+        cents, category, type, description, day = row
+        # Hash the dollar string so rows imported before amounts moved to cents still match
+        key = f"{day.isoformat()}|{cents_to_str(cents)}|{type}|{category}|{description or ''}|{occurrence}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+def _apply_rules(batch, positions, matcher, result):
+    """Categorize the rows of batch at positions, the ones whose statement line had no category"""
+    if matcher is None or not positions:
+        return batch
+    categorized = matcher.categorize(batch, positions)
+    result['categorized'] += sum(1 for i in positions if categorized[i][1] != batch[i][1])
+    return categorized
+
+def _batches(records, categories, batch_size, result, matcher=None):
+    """Validate records and group them into batches of hashed rows.
+
+    A FITID already seen in this import (overlapping downloads, or several
+    statements in one file) is counted as a duplicate and dropped, since
+    both rows would otherwise reach the INSERT with the same import_hash.
+    """
+    seen = {}
+    fitids = set()
+    batch = []
+    uncategorized = []
+    for line, record in records:
+        try:
+            row = normalize(record, categories)
+        except ValueError as e:
+            result['rejected_count'] += 1
+            if len(result['rejected']) < MAX_REJECTED_DETAILS:
+                result['rejected'].append((line, str(e)))
+            continue
+
+        fitid = record.get('fitid')
+        if fitid:
+            if fitid in fitids:
+                result['duplicates'] += 1
+                continue
+            fitids.add(fitid)
+        occurrence = seen.get(row, 0)
+        seen[row] = occurrence + 1
+        # The hash uses the fallback category, so a re-import still matches after the rules change
+        if not (record.get('category') or "").strip():
+            uncategorized.append(len(batch))
+        batch.append(row + (content_hash(row, occurrence, fitid),))
+        if len(batch) >= batch_size:
+            yield _apply_rules(batch, uncategorized, matcher, result)
+            batch = []
+            uncategorized = []
+    if batch:
+        yield _apply_rules(batch, uncategorized, matcher, result)
+
+def import_statement(db, stream, format='csv', batch_size=DEFAULT_BATCH_SIZE, categorize=True):
+    """Import a text stream of CSV or OFX statement lines in one transaction.
+
+    Returns a dict with inserted, duplicates, rejected_count, rejected
+    (line, reason) details, categorized (rows given a category by a rule),
+    seconds and rows_per_sec, or None if the import failed and was rolled
+    back. With categorize=False the category rules are not applied.
+    """
+    rows = db.execute_query("SELECT name, type FROM categories WHERE ledger_id = %s", (db.ledger_id,), fetch=True)
+    if rows is None:
+        return None
+    categories = {row['name']: row['type'] for row in rows}
+
+    matcher = load_matcher(db) if categorize else None
+
+    parser = parse_ofx if format == 'ofx' else parse_csv
+    result = {
+        'inserted': 0,
+        'duplicates': 0,
+        'rejected_count': 0,
+        'rejected': [],
+        'categorized': 0
+    }
+    started = time.perf_counter()
+
+    months = set()
+
+    def work(cursor):
+        for batch in _batches(parser(stream), categories, batch_size, result, matcher):
+            # Statements overlapping an archived year must not bring its rows back
+            days = [row[4] for row in batch]
+            archived = archived_import_hashes(cursor, db.ledger_id, min(days), max(days))
+            if archived is None:
+                raise db.Error("Could not read archived transactions")
+            fresh = [row for row in batch if row[-1] not in archived]
+            inserted = write_new_transactions(cursor, db.ledger_id, fresh) if fresh else []
+            months.update(row[4].strftime("%Y-%m") for row in inserted)
+            result['inserted'] += len(inserted)
+            result['duplicates'] += len(batch) - len(inserted)
+        return result
+
+    if db.run_in_transaction(work) is None:
+        return None
+    if months:
+        db.invalidate(transaction_write_tags(months))
+
+    result['seconds'] = time.perf_counter() - started
+    processed = result['inserted'] + result['duplicates'] + result['rejected_count']
+    result['rows_per_sec'] = processed / result['seconds'] if result['seconds'] else 0.0
+    return result
+
+def import_file(db, path, format=None, batch_size=DEFAULT_BATCH_SIZE, categorize=True):
+    """Import a statement file from disk"""
+    format = format or detect_format(path)
+    with open(path, newline="", encoding="utf-8-sig") as stream:
+        return import_statement(db, stream, format, batch_size, categorize)
+
+def import_upload(db, uploaded_file, batch_size=DEFAULT_BATCH_SIZE):
+    """Import a Streamlit UploadedFile without reading it all into a string"""
+    stream = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+    return import_statement(db, stream, detect_format(uploaded_file.name), batch_size)
+
+def main(argv=None):
+    from database import DEFAULT_LEDGER_ID, Database
+
+    parser = argparse.ArgumentParser(description="Import CSV or OFX bank statements")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--format", choices=["csv", "ofx"],
+                        help="statement format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--ledger", type=int, default=DEFAULT_LEDGER_ID, help="ledger to import into")
+    parser.add_argument("--no-rules", action="store_true",
+                        help="leave uncategorized lines in Other Income / Other Expense")
+    args = parser.parse_args(argv)
+
+    db = Database().for_ledger(args.ledger)
+    if not db.initialize_database():
+        return 1
+
+    status = 0
+    for path in args.files:
+        result = import_file(db, path, args.format, args.batch_size, not args.no_rules)
+        if result is None:
+            print(f"{path}: import failed, nothing was written")
+            status = 1
+            continue
+        print(
+            f"{path}: {result['inserted']} inserted, {result['duplicates']} duplicates, "
+            f"{result['rejected_count']} rejected, {result['categorized']} categorized by rules "
+            f"in {result['seconds']:.2f}s "
+            f"({result['rows_per_sec']:,.0f} rows/sec)"
+        )
+        for line, reason in result['rejected']:
+            print(f"    line {line}: {reason}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
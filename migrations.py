@@ -0,0 +1,709 @@
+import argparse
+import sys
+
+# Versioned schema migrations, applied in order by Database.initialize_database.
+# Each entry is (version, description, statements). A statement is either
+# portable SQL or a dict of per-backend SQL (a string or a list of strings)
+# keyed by backend name. Never edit a migration that has shipped; append a
+# new one instead.
+MIGRATIONS = [
+    (1, "Composite indexes for date-range, category and budget lookups", [
+        # Covers the date-range filters and the type/category aggregates
+        """
+            CREATE INDEX idx_transactions_date_type_category_amount
+            ON transactions (date, type, category, amount)
+        """,
+        # Budget vs actual joins transactions on category within a month
+        """
+            CREATE INDEX idx_transactions_category_date
+            ON transactions (category, date)
+        """,
+        # Keep the newest budget per (category, month) so the unique key can be added
+        {
+            'mysql': """
+                DELETE older FROM budgets older
+                JOIN budgets newer
+                    ON older.category = newer.category
+                    AND older.month = newer.month
+                    AND older.id < newer.id
+            """,
+            'sqlite': """
+                DELETE FROM budgets
+                WHERE id NOT IN (SELECT MAX(id) FROM budgets GROUP BY month, category)
+            """
+        },
+        {
+            'mysql': """
+                ALTER TABLE budgets
+                ADD UNIQUE KEY uq_budgets_month_category (month, category)
+            """,
+            'sqlite': """
+                CREATE UNIQUE INDEX uq_budgets_month_category
+                ON budgets (month, category)
+            """
+        }
+    ]),
+    (2, "Stored generated month column on transactions", [
+        # Lets month grouping and filtering use an index instead of
+        # formatting every row's date. SQLite can only add virtual generated
+        # columns, which it can still index.
+        {
+            'mysql': """
+                ALTER TABLE transactions
+                ADD COLUMN month CHAR(7) AS (DATE_FORMAT(date, '%Y-%m')) STORED
+            """,
+            'sqlite': """
+                ALTER TABLE transactions
+                ADD COLUMN month CHAR(7) GENERATED ALWAYS AS (strftime('%Y-%m', date)) VIRTUAL
+            """
+        },
+        """
+            CREATE INDEX idx_transactions_month_type_date_amount
+            ON transactions (month, type, date, amount)
+        """
+    ]),
+    (3, "Monthly per-category rollup of transaction totals", [
+        {
+            'mysql': """
+                CREATE TABLE IF NOT EXISTS monthly_category_totals (
+                    month CHAR(7) NOT NULL,
+                    type ENUM('income', 'expense') NOT NULL,
+                    category VARCHAR(50) NOT NULL,
+                    total_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+                    transaction_count INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (month, type, category)
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE IF NOT EXISTS monthly_category_totals (
+                    month CHAR(7) NOT NULL,
+                    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+                    category VARCHAR(50) NOT NULL,
+                    total_amount DECIMAL(15, 2) NOT NULL DEFAULT 0,
+                    transaction_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (month, type, category)
+                ) WITHOUT ROWID
+            """
+        },
+        """
+            INSERT INTO monthly_category_totals (month, type, category, total_amount, transaction_count)
+            SELECT month, type, category, SUM(amount), COUNT(*)
+            FROM transactions
+            GROUP BY month, type, category
+        """
+    ]),
+    (4, "Content hash on transactions for idempotent statement imports", [
+        {
+            'mysql': """
+                ALTER TABLE transactions
+                ADD COLUMN import_hash CHAR(64) NULL,
+                ADD UNIQUE KEY uq_transactions_import_hash (import_hash)
+            """,
+            'sqlite': [
+                "ALTER TABLE transactions ADD COLUMN import_hash CHAR(64) NULL",
+                "CREATE UNIQUE INDEX uq_transactions_import_hash ON transactions (import_hash)"
+            ]
+        }
+    ]),
+    (5, "Indexes matching the (date, id) keyset order of View Transactions", [
+        # Secondary indexes end in the primary key, so these are (date, id)
+        # and (type, date, id) and can be walked without a filesort
+        "CREATE INDEX idx_transactions_date ON transactions (date)",
+        "CREATE INDEX idx_transactions_type_date ON transactions (type, date)"
+    ]),
+    (6, "Store money as BIGINT cents instead of DECIMAL(10, 2)", [
+        # Exact integer sums with no DECIMAL(10, 2) ceiling of ~$99M. The
+        # amount-covering indexes are rebuilt on the new column.
+        {
+            'mysql': [
+                """
+                    ALTER TABLE transactions
+                    ADD COLUMN amount_cents BIGINT NOT NULL DEFAULT 0 AFTER amount
+                """,
+                "UPDATE transactions SET amount_cents = ROUND(amount * 100)",
+                """
+                    ALTER TABLE transactions
+                    ALTER COLUMN amount_cents DROP DEFAULT,
+                    DROP INDEX idx_transactions_date_type_category_amount,
+                    DROP INDEX idx_transactions_month_type_date_amount,
+                    DROP COLUMN amount,
+                    ADD INDEX idx_transactions_date_type_category_amount (date, type, category, amount_cents),
+                    ADD INDEX idx_transactions_month_type_date_amount (month, type, date, amount_cents)
+                """
+            ],
+            'sqlite': [
+                "ALTER TABLE transactions ADD COLUMN amount_cents BIGINT NOT NULL DEFAULT 0",
+                "UPDATE transactions SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)",
+                "DROP INDEX idx_transactions_date_type_category_amount",
+                "DROP INDEX idx_transactions_month_type_date_amount",
+                "ALTER TABLE transactions DROP COLUMN amount",
+                """
+                    CREATE INDEX idx_transactions_date_type_category_amount
+                    ON transactions (date, type, category, amount_cents)
+                """,
+                """
+                    CREATE INDEX idx_transactions_month_type_date_amount
+                    ON transactions (month, type, date, amount_cents)
+                """
+            ]
+        },
+        {
+            'mysql': [
+                "ALTER TABLE budgets ADD COLUMN amount_cents BIGINT NOT NULL DEFAULT 0 AFTER amount",
+                "UPDATE budgets SET amount_cents = ROUND(amount * 100)",
+                "ALTER TABLE budgets ALTER COLUMN amount_cents DROP DEFAULT, DROP COLUMN amount",
+                """
+                    ALTER TABLE monthly_category_totals
+                    ADD COLUMN total_cents BIGINT NOT NULL DEFAULT 0 AFTER total_amount
+                """,
+                "UPDATE monthly_category_totals SET total_cents = ROUND(total_amount * 100)",
+                "ALTER TABLE monthly_category_totals DROP COLUMN total_amount"
+            ],
+            'sqlite': [
+                "ALTER TABLE budgets ADD COLUMN amount_cents BIGINT NOT NULL DEFAULT 0",
+                "UPDATE budgets SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)",
+                "ALTER TABLE budgets DROP COLUMN amount",
+                "ALTER TABLE monthly_category_totals ADD COLUMN total_cents BIGINT NOT NULL DEFAULT 0",
+                "UPDATE monthly_category_totals SET total_cents = CAST(ROUND(total_amount * 100) AS INTEGER)",
+                "ALTER TABLE monthly_category_totals DROP COLUMN total_amount"
+            ]
+        }
+    ]),
+    (7, "Daily totals with running prefix sums for range totals and balances", [
+        {
+            'mysql': """
+                CREATE TABLE IF NOT EXISTS daily_balances (
+                    date DATE NOT NULL PRIMARY KEY,
+                    income_cents BIGINT NOT NULL DEFAULT 0,
+                    expense_cents BIGINT NOT NULL DEFAULT 0,
+                    transaction_count INT NOT NULL DEFAULT 0,
+                    cumulative_income_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_expense_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_count BIGINT NOT NULL DEFAULT 0
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE IF NOT EXISTS daily_balances (
+                    date DATE NOT NULL PRIMARY KEY,
+                    income_cents BIGINT NOT NULL DEFAULT 0,
+                    expense_cents BIGINT NOT NULL DEFAULT 0,
+                    transaction_count INTEGER NOT NULL DEFAULT 0,
+                    cumulative_income_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_expense_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_count BIGINT NOT NULL DEFAULT 0
+                ) WITHOUT ROWID
+            """
+        },
+        """
+            INSERT INTO daily_balances (
+                date, income_cents, expense_cents, transaction_count,
+                cumulative_income_cents, cumulative_expense_cents, cumulative_count
+            )
+            SELECT
+                date,
+                income_cents,
+                expense_cents,
+                transaction_count,
+                SUM(income_cents) OVER (ORDER BY date),
+                SUM(expense_cents) OVER (ORDER BY date),
+                SUM(transaction_count) OVER (ORDER BY date)
+            FROM (
+                SELECT
+                    date,
+                    SUM(CASE WHEN type = 'income' THEN amount_cents ELSE 0 END) as income_cents,
+                    SUM(CASE WHEN type = 'expense' THEN amount_cents ELSE 0 END) as expense_cents,
+                    COUNT(*) as transaction_count
+                FROM transactions
+                GROUP BY date
+            ) daily
+        """
+    ]),
+    (8, "Recurring transaction rules", [
+        {
+            'mysql': """
+                CREATE TABLE IF NOT EXISTS recurring_rules (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    category VARCHAR(50) NOT NULL,
+                    type ENUM('income', 'expense') NOT NULL,
+                    amount_cents BIGINT NOT NULL,
+                    frequency ENUM('weekly', 'monthly', 'yearly') NOT NULL,
+                    interval_count INT NOT NULL DEFAULT 1,
+                    start_date DATE NOT NULL,
+                    end_date DATE NULL,
+                    next_date DATE NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE IF NOT EXISTS recurring_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    description VARCHAR(255) NOT NULL,
+                    category VARCHAR(50) NOT NULL,
+                    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+                    amount_cents BIGINT NOT NULL,
+                    frequency TEXT NOT NULL CHECK (frequency IN ('weekly', 'monthly', 'yearly')),
+                    interval_count INTEGER NOT NULL DEFAULT 1,
+                    start_date DATE NOT NULL,
+                    end_date DATE NULL,
+                    next_date DATE NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+        },
+        # The scheduler looks up rules whose next occurrence has come due
+        "CREATE INDEX idx_recurring_rules_next_date ON recurring_rules (next_date)"
+    ]),
+    (9, "Full-text index over transaction descriptions", [
+        {
+            'mysql': """
+                ALTER TABLE transactions
+                ADD FULLTEXT INDEX ft_transactions_description (description)
+            """,
+            # An external-content FTS5 table stores only the index; triggers
+            # keep it in step with transactions. prefix adds indexes for 2-
+            # and 3-character prefixes so short prefix searches stay fast.
+            'sqlite': [
+                """
+                    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+                        description,
+                        content='transactions',
+                        content_rowid='id',
+                        prefix='2 3'
+                    )
+                """,
+                """
+                    CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+                        INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+                    END
+                """,
+                """
+                    CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+                        INSERT INTO transactions_fts (transactions_fts, rowid, description)
+                        VALUES ('delete', old.id, old.description);
+                    END
+                """,
+                """
+                    CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+                        INSERT INTO transactions_fts (transactions_fts, rowid, description)
+                        VALUES ('delete', old.id, old.description);
+                        INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description);
+                    END
+                """,
+                "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')"
+            ]
+        }
+    ]),
+    (10, "Category rules for automatic categorization", [
+        {
+            'mysql': """
+                CREATE TABLE IF NOT EXISTS category_rules (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    pattern VARCHAR(255) NOT NULL,
+                    match_type ENUM('contains', 'regex') NOT NULL DEFAULT 'contains',
+                    category VARCHAR(50) NOT NULL,
+                    min_amount_cents BIGINT NULL,
+                    max_amount_cents BIGINT NULL,
+                    priority INT NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE IF NOT EXISTS category_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    pattern VARCHAR(255) NOT NULL,
+                    match_type TEXT NOT NULL DEFAULT 'contains' CHECK (match_type IN ('contains', 'regex')),
+                    category VARCHAR(50) NOT NULL,
+                    min_amount_cents BIGINT NULL,
+                    max_amount_cents BIGINT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+        }
+    ]),
+    (11, "Ledgers: ledger_id on every table, leading every key", [
+        # One deployment can hold many households' ledgers. Existing rows
+        # become ledger 1, which is also the default for any insert that
+        # names no ledger. Every index starts with ledger_id, so a ledger's
+        # queries read only its own key range however many ledgers exist.
+        {
+            'mysql': """
+                CREATE TABLE IF NOT EXISTS ledgers (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    name VARCHAR(100) NOT NULL UNIQUE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE IF NOT EXISTS ledgers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name VARCHAR(100) NOT NULL UNIQUE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """
+        },
+        "INSERT INTO ledgers (id, name) VALUES (1, 'Personal')",
+        {
+            # InnoDB clusters rows by primary key, so (ledger_id, id) also
+            # stores each ledger's transactions together. Partitioning by
+            # ledger is not an option: partitioned InnoDB tables cannot have
+            # the FULLTEXT index added in migration 9.
+            'mysql': """
+                ALTER TABLE transactions
+                ADD COLUMN ledger_id INT NOT NULL DEFAULT 1 AFTER id,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (ledger_id, id),
+                ADD UNIQUE KEY uq_transactions_id (id),
+                DROP INDEX idx_transactions_date,
+                DROP INDEX idx_transactions_type_date,
+                DROP INDEX idx_transactions_category_date,
+                DROP INDEX idx_transactions_date_type_category_amount,
+                DROP INDEX idx_transactions_month_type_date_amount,
+                DROP INDEX uq_transactions_import_hash,
+                ADD INDEX idx_transactions_date (ledger_id, date),
+                ADD INDEX idx_transactions_type_date (ledger_id, type, date),
+                ADD INDEX idx_transactions_category_date (ledger_id, category, date),
+                ADD INDEX idx_transactions_date_type_category_amount (ledger_id, date, type, category, amount_cents),
+                ADD INDEX idx_transactions_month_type_date_amount (ledger_id, month, type, date, amount_cents),
+                ADD UNIQUE KEY uq_transactions_import_hash (ledger_id, import_hash)
+            """,
+            'sqlite': [
+                "ALTER TABLE transactions ADD COLUMN ledger_id INTEGER NOT NULL DEFAULT 1",
+                "DROP INDEX idx_transactions_date",
+                "DROP INDEX idx_transactions_type_date",
+                "DROP INDEX idx_transactions_category_date",
+                "DROP INDEX idx_transactions_date_type_category_amount",
+                "DROP INDEX idx_transactions_month_type_date_amount",
+                "DROP INDEX uq_transactions_import_hash",
+                "CREATE INDEX idx_transactions_date ON transactions (ledger_id, date)",
+                "CREATE INDEX idx_transactions_type_date ON transactions (ledger_id, type, date)",
+                "CREATE INDEX idx_transactions_category_date ON transactions (ledger_id, category, date)",
+                """
+                    CREATE INDEX idx_transactions_date_type_category_amount
+                    ON transactions (ledger_id, date, type, category, amount_cents)
+                """,
+                """
+                    CREATE INDEX idx_transactions_month_type_date_amount
+                    ON transactions (ledger_id, month, type, date, amount_cents)
+                """,
+                "CREATE UNIQUE INDEX uq_transactions_import_hash ON transactions (ledger_id, import_hash)",
+                # The full-text index also gets the ledger as a column, so a
+                # search reads only its ledger's postings
+                "DROP TRIGGER transactions_fts_insert",
+                "DROP TRIGGER transactions_fts_delete",
+                "DROP TRIGGER transactions_fts_update",
+                "DROP TABLE transactions_fts",
+                """
+                    CREATE VIRTUAL TABLE transactions_fts USING fts5(
+                        description,
+                        ledger_id,
+                        content='transactions',
+                        content_rowid='id',
+                        prefix='2 3'
+                    )
+                """,
+                """
+                    CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+                        INSERT INTO transactions_fts (rowid, description, ledger_id)
+                        VALUES (new.id, new.description, new.ledger_id);
+                    END
+                """,
+                """
+                    CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+                        INSERT INTO transactions_fts (transactions_fts, rowid, description, ledger_id)
+                        VALUES ('delete', old.id, old.description, old.ledger_id);
+                    END
+                """,
+                """
+                    CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+                        INSERT INTO transactions_fts (transactions_fts, rowid, description, ledger_id)
+                        VALUES ('delete', old.id, old.description, old.ledger_id);
+                        INSERT INTO transactions_fts (rowid, description, ledger_id)
+                        VALUES (new.id, new.description, new.ledger_id);
+                    END
+                """,
+                "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')"
+            ]
+        },
+        {
+            # SQLite cannot change the inline UNIQUE (name), so the table is rebuilt
+            'mysql': """
+                ALTER TABLE categories
+                ADD COLUMN ledger_id INT NOT NULL DEFAULT 1 AFTER id,
+                DROP INDEX name,
+                ADD UNIQUE KEY uq_categories_ledger_name (ledger_id, name)
+            """,
+            'sqlite': [
+                """
+                    CREATE TABLE categories_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        ledger_id INTEGER NOT NULL DEFAULT 1,
+                        name VARCHAR(50) NOT NULL,
+                        type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+                        UNIQUE (ledger_id, name)
+                    )
+                """,
+                "INSERT INTO categories_new (id, name, type) SELECT id, name, type FROM categories",
+                "DROP TABLE categories",
+                "ALTER TABLE categories_new RENAME TO categories"
+            ]
+        },
+        {
+            'mysql': """
+                ALTER TABLE budgets
+                ADD COLUMN ledger_id INT NOT NULL DEFAULT 1 AFTER id,
+                DROP INDEX uq_budgets_month_category,
+                ADD UNIQUE KEY uq_budgets_month_category (ledger_id, month, category)
+            """,
+            'sqlite': [
+                "ALTER TABLE budgets ADD COLUMN ledger_id INTEGER NOT NULL DEFAULT 1",
+                "DROP INDEX uq_budgets_month_category",
+                "CREATE UNIQUE INDEX uq_budgets_month_category ON budgets (ledger_id, month, category)"
+            ]
+        },
+        {
+            'mysql': """
+                ALTER TABLE recurring_rules
+                ADD COLUMN ledger_id INT NOT NULL DEFAULT 1 AFTER id,
+                DROP INDEX idx_recurring_rules_next_date,
+                ADD INDEX idx_recurring_rules_next_date (ledger_id, next_date)
+            """,
+            'sqlite': [
+                "ALTER TABLE recurring_rules ADD COLUMN ledger_id INTEGER NOT NULL DEFAULT 1",
+                "DROP INDEX idx_recurring_rules_next_date",
+                "CREATE INDEX idx_recurring_rules_next_date ON recurring_rules (ledger_id, next_date)"
+            ]
+        },
+        {
+            'mysql': """
+                ALTER TABLE category_rules
+                ADD COLUMN ledger_id INT NOT NULL DEFAULT 1 AFTER id,
+                ADD INDEX idx_category_rules_ledger (ledger_id)
+            """,
+            'sqlite': [
+                "ALTER TABLE category_rules ADD COLUMN ledger_id INTEGER NOT NULL DEFAULT 1",
+                "CREATE INDEX idx_category_rules_ledger ON category_rules (ledger_id)"
+            ]
+        },
+        # The rollup and the daily balances are derived, so they are
+        # recreated keyed by ledger and refilled from transactions
+        "DROP TABLE monthly_category_totals",
+        {
+            'mysql': """
+                CREATE TABLE monthly_category_totals (
+                    ledger_id INT NOT NULL,
+                    month CHAR(7) NOT NULL,
+                    type ENUM('income', 'expense') NOT NULL,
+                    category VARCHAR(50) NOT NULL,
+                    total_cents BIGINT NOT NULL DEFAULT 0,
+                    transaction_count INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (ledger_id, month, type, category)
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE monthly_category_totals (
+                    ledger_id INTEGER NOT NULL,
+                    month CHAR(7) NOT NULL,
+                    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+                    category VARCHAR(50) NOT NULL,
+                    total_cents BIGINT NOT NULL DEFAULT 0,
+                    transaction_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (ledger_id, month, type, category)
+                ) WITHOUT ROWID
+            """
+        },
+        """
+            INSERT INTO monthly_category_totals (ledger_id, month, type, category, total_cents, transaction_count)
+            SELECT ledger_id, month, type, category, SUM(amount_cents), COUNT(*)
+            FROM transactions
+            GROUP BY ledger_id, month, type, category
+        """,
+        "DROP TABLE daily_balances",
+        {
+            'mysql': """
+                CREATE TABLE daily_balances (
+                    ledger_id INT NOT NULL,
+                    date DATE NOT NULL,
+                    income_cents BIGINT NOT NULL DEFAULT 0,
+                    expense_cents BIGINT NOT NULL DEFAULT 0,
+                    transaction_count INT NOT NULL DEFAULT 0,
+                    cumulative_income_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_expense_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_count BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (ledger_id, date)
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE daily_balances (
+                    ledger_id INTEGER NOT NULL,
+                    date DATE NOT NULL,
+                    income_cents BIGINT NOT NULL DEFAULT 0,
+                    expense_cents BIGINT NOT NULL DEFAULT 0,
+                    transaction_count INTEGER NOT NULL DEFAULT 0,
+                    cumulative_income_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_expense_cents BIGINT NOT NULL DEFAULT 0,
+                    cumulative_count BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (ledger_id, date)
+                ) WITHOUT ROWID
+            """
+        },
+        """
+            INSERT INTO daily_balances (
+                ledger_id, date, income_cents, expense_cents, transaction_count,
+                cumulative_income_cents, cumulative_expense_cents, cumulative_count
+            )
+            SELECT
+                ledger_id,
+                date,
+                income_cents,
+                expense_cents,
+                transaction_count,
+                SUM(income_cents) OVER (PARTITION BY ledger_id ORDER BY date),
+                SUM(expense_cents) OVER (PARTITION BY ledger_id ORDER BY date),
+                SUM(transaction_count) OVER (PARTITION BY ledger_id ORDER BY date)
+            FROM (
+                SELECT
+                    ledger_id,
+                    date,
+                    SUM(CASE WHEN type = 'income' THEN amount_cents ELSE 0 END) as income_cents,
+                    SUM(CASE WHEN type = 'expense' THEN amount_cents ELSE 0 END) as expense_cents,
+                    COUNT(*) as transaction_count
+                FROM transactions
+                GROUP BY ledger_id, date
+            ) daily
+        """
+    ]),
+    (12, "Catalog of transactions archived to Parquet files", [
+        # One row per ledger and archived year, carrying the file's date
+        # range so readers can skip files outside a query's dates without
+        # opening them
+        {
+            'mysql': """
+                CREATE TABLE IF NOT EXISTS archived_partitions (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    ledger_id INT NOT NULL,
+                    year INT NOT NULL,
+                    version INT NOT NULL DEFAULT 1,
+                    path VARCHAR(255) NOT NULL,
+                    min_date DATE NOT NULL,
+                    max_date DATE NOT NULL,
+                    row_count INT NOT NULL,
+                    income_cents BIGINT NOT NULL DEFAULT 0,
+                    expense_cents BIGINT NOT NULL DEFAULT 0,
+                    checksum CHAR(64) NOT NULL,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE KEY uq_archived_partitions_ledger_year (ledger_id, year)
+                )
+            """,
+            'sqlite': """
+                CREATE TABLE IF NOT EXISTS archived_partitions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ledger_id INTEGER NOT NULL,
+                    year INTEGER NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    path VARCHAR(255) NOT NULL,
+                    min_date DATE NOT NULL,
+                    max_date DATE NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    income_cents BIGINT NOT NULL DEFAULT 0,
+                    expense_cents BIGINT NOT NULL DEFAULT 0,
+                    checksum CHAR(64) NOT NULL,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (ledger_id, year)
+                )
+            """
+        }
+    ]),
+]
+
+def latest_version():
+    """Return the schema version the code expects"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def get_applied_versions(cursor):
+    """Return the set of migration versions already applied"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def statements_for(statements, backend_name):
+    """Flatten a migration's statements into the SQL to run on one backend"""
+    for statement in statements:
+        if isinstance(statement, dict):
+            statement = statement[backend_name]
+        if isinstance(statement, str):
+            yield statement
+        else:
+            yield from statement
+
+def apply_migrations(conn, backend):
+    """Apply pending migrations in order, returning the versions applied"""
+    cursor = backend.cursor(conn)
+    applied = []
+    version = None
+    try:
+        done = get_applied_versions(cursor)
+        conn.commit()
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+            # MySQL commits DDL implicitly; SQLite applies the whole migration atomically
+            backend.begin(conn)
+            for statement in statements_for(statements, backend.name):
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            conn.commit()
+            applied.append(version)
+        return applied
+    except backend.Error as e:
+        conn.rollback()
+        print(f"Error applying migration {version}: {e}")
+        raise
+    finally:
+        cursor.close()
+
+def print_explain_report(report):
+    """Print EXPLAIN plans, returning True when no unexpected full scans were found"""
+    ok = True
+    for entry in report:
+        status = "FULL SCAN: " + ", ".join(entry['full_scans']) if entry['full_scans'] else "ok"
+        print(f"{entry['name']}: {status}")
+        for row in entry['plan']:
+            print(
+                f"    table={row.get('table')} type={row.get('type')} "
+                f"key={row.get('key')} rows={row.get('rows')} extra={row.get('Extra')}"
+            )
+        if entry['full_scans']:
+            ok = False
+    return ok
+
+def main(argv=None):
+    from database import Database
+    from queries import explain_canonical_queries
+
+    parser = argparse.ArgumentParser(description="Apply schema migrations and check query plans")
+    parser.add_argument("--explain", action="store_true",
+                        help="print EXPLAIN plans for the app's queries and fail on full table scans")
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if not db.initialize_database():
+        return 1
+    print(f"Schema is at version {latest_version()}")
+
+    if args.explain:
+        return 0 if print_explain_report(explain_canonical_queries(db)) else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+# Money is held as integer cents everywhere: BIGINT columns in the
+# database, Python ints in the data-access helpers and int64 arrays in
+# NumPy/pandas. Sums are therefore exact and never touch Decimal. Dollars
+# only appear at the edges, when parsing input and when formatting for
+# display or export.
+
+def to_cents(value):
+    """Convert a dollar amount (str, Decimal, int or float) to integer cents.
+
+    Fractions of a cent round half to even, as Decimal.quantize does, so
+    amounts parsed before the switch to cents round the same way.
+    """
+    if isinstance(value, float):
+        # repr is the shortest string that round-trips, so 0.1 stays 0.1
+        value = repr(value)
+    try:
+        dollars = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f"invalid amount {value!r}")
+    if not dollars.is_finite():
+        raise ValueError(f"invalid amount {value!r}")
+    return int((dollars * 100).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+def to_dollars(cents):
+    """Return cents as an exact Decimal dollar amount"""
+    return Decimal(int(cents)).scaleb(-2)
+
+def cents_to_str(cents):
+    """Plain dollar string with two decimals, e.g. 1234567 -> '12345.67'"""
+    cents = int(cents)
+    dollars, rest = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}{dollars}.{rest:02d}"
+
+def format_cents(cents):
+    """Display string for one amount, e.g. 1234567 -> '$12,345.67'"""
+    cents = int(cents)
+    dollars, rest = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}${dollars:,}.{rest:02d}"
+
+def format_cents_column(values):
+    """Format a whole column of cents (list, Series or array) for display in one pass"""
+    import numpy as np
+
+    cents = np.asarray(values, dtype=np.int64)
+    dollars, rest = np.divmod(np.abs(cents), 100)
+    signs = np.where(cents < 0, "-", "")
+    return [
+        f"{sign}${whole:,}.{part:02d}"
+        for sign, whole, part in zip(signs.tolist(), dollars.tolist(), rest.tolist())
+    ]
@@ -0,0 +1,257 @@
+import contextlib
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
+
+# Query and page timing shared by every session.
+#
+# Database records each query it runs: wall time, time spent waiting for a
+# pooled connection, rows returned and the helper that issued it. Timings
+# are kept as fixed-bucket histograms, so memory stays constant however
+# long the process runs. Queries slower than the slow-query threshold are
+# also logged.
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf'))
+
+# Distinct (helper, query) pairs tracked before new ones are folded into one entry
+MAX_QUERIES = 500
+
+# Frames from these files are skipped when looking for the calling helper
+_INTERNAL_FILES = set()
+
+def internal_module(path):
+    """Mark a source file whose frames are never reported as the calling helper"""
+    _INTERNAL_FILES.add(os.path.normcase(os.path.abspath(path)))
+
+internal_module(__file__)
+internal_module(contextlib.__file__)
+
+@lru_cache(maxsize=1024)
+def _is_internal(path):
+    return os.path.normcase(os.path.abspath(path)) in _INTERNAL_FILES
+
+def caller_name():
+    """Return module.function of the nearest frame outside the database layer"""
+    frame = sys._getframe(1)
+    while frame is not None and _is_internal(frame.f_code.co_filename):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}.{frame.f_code.co_name}"
+
+@lru_cache(maxsize=1024)
+def normalize_query(query):
+    """Collapse whitespace so the same query text always aggregates together"""
+    return " ".join(query.split())
+
+class Histogram:
+    """Counts of samples per BUCKETS_MS bucket plus count, total and max"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th percentile (capped at the max seen)"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total_ms,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'max_ms': self.max_ms
+        }
+
+    def distribution(self):
+        """Return [(label, count)] for every bucket"""
+        labels, lower = [], 0
+        for bound in BUCKETS_MS:
+            labels.append(f"{lower}-{bound:g} ms" if bound != float('inf') else f">{lower} ms")
+            lower = bound
+        return list(zip(labels, self.buckets))
+
+class QueryStats:
+    """Aggregated timings of one (helper, query) pair"""
+
+    def __init__(self, helper, query):
+        self.helper = helper
+        self.query = query
+        self.latency = Histogram()
+        self.acquire_ms = 0.0
+        self.rows = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+class QueryProfiler:
+    """Thread-safe collector of query and page timings with a slow-query log"""
+
+    def __init__(self, enabled=True, slow_query_ms=500.0, slow_query_log=None, max_slow_queries=100):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.slow_queries = deque(maxlen=max_slow_queries)
+        self._queries = {}
+        self._pages = {}
+        self._latency = Histogram()
+        self._acquire = Histogram()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a profiler from DB_PROFILE, DB_SLOW_QUERY_MS and DB_SLOW_QUERY_LOG"""
+        return cls(
+            enabled=os.getenv('DB_PROFILE', '1') != '0',
+            slow_query_ms=float(os.getenv('DB_SLOW_QUERY_MS', '500')),
+            slow_query_log=os.getenv('DB_SLOW_QUERY_LOG') or None
+        )
+
+    def record(self, query, seconds, acquire_seconds=0.0, rows=0, error=False, helper=None):
+        """Add one executed query; seconds is the full wall time including acquisition"""
+        if not self.enabled:
+            return
+        helper = helper or caller_name()
+        query = normalize_query(query)
+        ms = seconds * 1000
+        acquire_ms = acquire_seconds * 1000
+
+        with self._lock:
+            stats = self._stats(helper, query)
+            stats.latency.add(ms)
+            stats.acquire_ms += acquire_ms
+            stats.rows += rows
+            stats.errors += error
+            self._latency.add(ms)
+            self._acquire.add(acquire_ms)
+
+        if ms >= self.slow_query_ms:
+            self._log_slow(helper, query, ms, acquire_ms, rows)
+
+    def record_cache_hit(self, query, helper=None):
+        """Count a query answered from the query cache without touching the database"""
+        if not self.enabled:
+            return
+        helper = helper or caller_name()
+        query = normalize_query(query)
+        with self._lock:
+            self._stats(helper, query).cache_hits += 1
+
+    def record_page(self, page, seconds):
+        """Add one render of a Streamlit page"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._pages.get(page)
+            if histogram is None:
+                histogram = self._pages[page] = Histogram()
+            histogram.add(seconds * 1000)
+
+    def top_queries(self, n=10, by='total_ms'):
+        """Return the n most expensive queries as dicts, ordered by the given summary field"""
+        with self._lock:
+            rows = []
+            for stats in self._queries.values():
+                summary = stats.latency.summary()
+                summary.update({
+                    'helper': stats.helper,
+                    'query': stats.query,
+                    'rows': stats.rows,
+                    'rows_per_call': stats.rows / summary['count'] if summary['count'] else 0.0,
+                    'acquire_ms': stats.acquire_ms,
+                    'cache_hits': stats.cache_hits,
+                    'errors': stats.errors
+                })
+                rows.append(summary)
+        rows.sort(key=lambda row: row[by], reverse=True)
+        return rows[:n]
+
+    def page_timings(self):
+        """Return render time summaries per page, slowest mean first"""
+        with self._lock:
+            rows = [dict(page=page, **histogram.summary()) for page, histogram in self._pages.items()]
+        rows.sort(key=lambda row: row['mean_ms'], reverse=True)
+        return rows
+
+    def histograms(self):
+        """Return bucket counts for query latency and connection acquisition"""
+        with self._lock:
+            return {
+                'latency': self._latency.distribution(),
+                'acquire': self._acquire.distribution()
+            }
+
+    def stats(self):
+        """Return overall query and acquisition summaries"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'queries': self._latency.summary(),
+                'acquire': self._acquire.summary(),
+                'distinct_queries': len(self._queries),
+                'slow_query_ms': self.slow_query_ms,
+                'slow_queries': len(self.slow_queries)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._pages.clear()
+            self._latency = Histogram()
+            self._acquire = Histogram()
+            self.slow_queries.clear()
+
+    def _stats(self, helper, query):
+        key = (helper, query)
+        stats = self._queries.get(key)
+        if stats is None:
+            if len(self._queries) >= MAX_QUERIES:
+                key = helper, query = ("(other)", "(other queries)")
+                stats = self._queries.get(key)
+            if stats is None:
+                stats = self._queries[key] = QueryStats(helper, query)
+        return stats
+
+    def _log_slow(self, helper, query, ms, acquire_ms, rows):
+        entry = {
+            'at': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'helper': helper,
+            'ms': ms,
+            'acquire_ms': acquire_ms,
+            'rows': rows,
+            'query': query
+        }
+        self.slow_queries.append(entry)
+        line = f"{entry['at']} slow query {ms:.1f} ms (acquire {acquire_ms:.1f} ms, {rows} rows) in {helper}: {query}"
+        if self.slow_query_log:
+            try:
+                with open(self.slow_query_log, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                return
+            except OSError as e:
+                print(f"Error writing slow query log: {e}")
+        print(line)
@@ -0,0 +1,745 @@
+import heapq
+import re
+from datetime import date, timedelta
+from archive import archived_totals, archived_transactions, count_archived
+from balances import PREFIX_COLUMNS, apply_to_balances
+from database import DEFAULT_CATEGORIES, DEFAULT_LEDGER_ID
+from rollup import apply_to_rollup
+
+# Data-access helpers used by the Streamlit pages. Every helper reads and
+# writes only the rows of db.ledger_id (see Database.for_ledger). Listings,
+# counts and summaries include the rows archived to Parquet (see archive.py)
+# as well as those in the transactions table; searches only cover the latter.
+
+def month_bounds(month):
+    """Return the half-open [first day, first day of next month) range for YYYY-MM"""
+    start = date.fromisoformat(month + "-01")
+    if start.month == 12:
+        return start, start.replace(year=start.year + 1, month=1)
+    return start, start.replace(month=start.month + 1)
+
+def split_months(start_date=None, end_date=None):
+    """Split an inclusive date range into whole months and partial edge ranges.
+
+    Returns ((first_month, last_month), raw_ranges). Either month bound is None
+    when the range is open on that side, and the month pair itself is None
+    when no whole month fits. raw_ranges holds half-open (start, end) date
+    ranges for the partial months at either edge.
+    """
+    first_full = None
+    if start_date:
+        first_full = start_date if start_date.day == 1 else month_bounds(start_date.strftime("%Y-%m"))[1]
+
+    end_exclusive = end_full = None
+    if end_date:
+        end_exclusive = end_date + timedelta(days=1)
+        end_full = end_exclusive if end_exclusive.day == 1 else end_exclusive.replace(day=1)
+
+    if first_full and end_full and first_full >= end_full:
+        return None, [(start_date, end_exclusive)]
+
+    raw_ranges = []
+    if start_date and start_date < first_full:
+        raw_ranges.append((start_date, first_full))
+    if end_date and end_full < end_exclusive:
+        raw_ranges.append((end_full, end_exclusive))
+
+    first_month = first_full.strftime("%Y-%m") if first_full else None
+    last_month = (end_full - timedelta(days=1)).strftime("%Y-%m") if end_full else None
+    return (first_month, last_month), raw_ranges
+
+def _month_filter(ledger_id, first_month, last_month):
+    """Return a WHERE clause and params restricting a ledger's rollup rows to a month range"""
+    clauses, params = ["ledger_id = %s"], [ledger_id]
+    if first_month:
+        clauses.append("month >= %s")
+        params.append(first_month)
+    if last_month:
+        clauses.append("month <= %s")
+        params.append(last_month)
+    return " WHERE " + " AND ".join(clauses), params
+
+def month_tags(first_month=None, last_month=None):
+    """Cache tags for results computed from transactions in a month range"""
+    if not first_month or not last_month:
+        return ['month:*']
+    tags = []
+    month = first_month
+    while month <= last_month:
+        tags.append(f"month:{month}")
+        month = month_bounds(month)[1].strftime("%Y-%m")
+    return tags
+
+def transaction_write_tags(months):
+    """Cache tags to invalidate after writing transactions in the given months"""
+    return [f"month:{month}" for month in months] + ['month:*', 'balances']
+
+def budget_write_tags(month):
+    """Cache tags to invalidate after writing budgets for a month"""
+    return [f"budgets:{month}", 'budgets:*']
+
+def _range_tags(range_start, range_end):
+    return month_tags(range_start.strftime("%Y-%m"), (range_end - timedelta(days=1)).strftime("%Y-%m"))
+
+# Tables small enough that a full scan in an EXPLAIN plan is not a regression
+SMALL_TABLES = ('categories', 'monthly_category_totals', 'archived_partitions')
+
+def get_ledgers(db):
+    """Return every ledger's id and name; ledgers are not scoped, so this is not cached"""
+    result = db.execute_query("SELECT id, name FROM ledgers ORDER BY id", fetch=True)
+    return result if result else []
+
+def create_ledger(db, name):
+    """Create a ledger with the default categories and return its id, or None on error"""
+    def work(cursor):
+        cursor.execute("INSERT INTO ledgers (name) VALUES (%s)", (name,))
+        ledger_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO categories (ledger_id, name, type) VALUES (%s, %s, %s)",
+            [(ledger_id, category, type) for category, type in DEFAULT_CATEGORIES]
+        )
+        return ledger_id
+
+    return db.run_in_transaction(work)
+
+def get_categories(db, type_filter=None):
+    if type_filter:
+        query = "SELECT name FROM categories WHERE ledger_id = %s AND type = %s ORDER BY name"
+        result = db.execute_query(query, (db.ledger_id, type_filter), fetch=True, cache_tags=['categories'])
+        return [cat['name'] for cat in result] if result else []
+    else:
+        query = "SELECT name, type FROM categories WHERE ledger_id = %s ORDER BY type, name"
+        result = db.execute_query(query, (db.ledger_id,), fetch=True, cache_tags=['categories'])
+        return result if result else []
+
+def write_transactions(cursor, ledger_id, rows):
+    """Insert a ledger's (amount_cents, category, type, description, date, import_hash) rows and update the rollup and daily balances in the caller's transaction"""
+    query = """
+        INSERT INTO transactions (ledger_id, amount_cents, category, type, description, date, import_hash)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """
+    if len(rows) == 1:
+        cursor.execute(query, (ledger_id,) + tuple(rows[0]))
+    else:
+        cursor.executemany(query, [(ledger_id,) + tuple(row) for row in rows])
+    lastrowid = cursor.lastrowid
+
+    apply_to_rollup(cursor, ledger_id, [
+        (amount_cents, category, type, day)
+        for amount_cents, category, type, description, day, import_hash in rows
+    ])
+    apply_to_balances(cursor, ledger_id, [
+        (amount_cents, type, day)
+        for amount_cents, category, type, description, day, import_hash in rows
+    ])
+    return lastrowid
+
+# import_hash values looked up per query, under SQLite's bound-parameter limit
+HASH_LOOKUP_SIZE = 500
+
+def write_new_transactions(cursor, ledger_id, rows):
+    """Write the rows whose import_hash is not stored in the ledger yet, returning the rows written.
+
+    Of rows repeating an import_hash within rows only the first is written.
+    """
+    existing = set()
+    for i in range(0, len(rows), HASH_LOOKUP_SIZE):
+        hashes = [row[-1] for row in rows[i:i + HASH_LOOKUP_SIZE]]
+        placeholders = ", ".join(["%s"] * len(hashes))
+        cursor.execute(
+            f"SELECT import_hash FROM transactions WHERE ledger_id = %s AND import_hash IN ({placeholders})",
+            [ledger_id] + hashes
+        )
+        existing.update(row['import_hash'] for row in cursor.fetchall())
+    new_rows = []
+    for row in rows:
+        if row[-1] not in existing:
+            existing.add(row[-1])
+            new_rows.append(row)
+    if new_rows:
+        write_transactions(cursor, ledger_id, new_rows)
+    return new_rows
+
+def add_transaction(db, amount_cents, category, type, description, date):
+    result = db.run_in_transaction(
+        lambda cursor: write_transactions(cursor, db.ledger_id,
+                                          [(amount_cents, category, type, description, date, None)])
+    )
+    if result is not None:
+        db.invalidate(transaction_write_tags([date.strftime("%Y-%m")]))
+    return result
+
+# Columns shown on the View Transactions page and in exports
+TRANSACTION_COLUMNS = "id, date, type, category, amount_cents, description"
+TRANSACTION_FIELDS = [name.strip() for name in TRANSACTION_COLUMNS.split(",")]
+
+def transaction_filters(ledger_id, start_date=None, end_date=None, type_filter=None, category=None):
+    """Return a WHERE clause and params for a ledger's rows matching the View Transactions filters"""
+    # Qualified, since the full-text index joined in by searches has a ledger_id column too
+    clauses, params = ["transactions.ledger_id = %s"], [ledger_id]
+    if start_date:
+        clauses.append("transactions.date >= %s")
+        params.append(start_date)
+    if end_date:
+        clauses.append("transactions.date <= %s")
+        params.append(end_date)
+    if type_filter:
+        clauses.append("transactions.type = %s")
+        params.append(type_filter)
+    if category:
+        clauses.append("transactions.category = %s")
+        params.append(category)
+    return " WHERE " + " AND ".join(clauses), params
+
+def _newest_first(rows, archived):
+    """Merge table rows and archived rows, each newest first, into one list; None if either is None"""
+    if rows is None or archived is None:
+        return None
+    if not archived:
+        return rows
+    # Rows backdated into an archived year sit in the table, so the two interleave
+    return list(heapq.merge(rows, archived, key=lambda row: (row['date'], row['id']), reverse=True))
+
+def get_transactions(db, start_date=None, end_date=None, type_filter=None, category=None):
+    where, params = transaction_filters(db.ledger_id, start_date, end_date, type_filter, category)
+    query = f"SELECT {TRANSACTION_COLUMNS} FROM transactions" + where + " ORDER BY date DESC, id DESC"
+    rows = db.execute_query(query, params, fetch=True)
+    if rows is None:
+        return None
+    return _newest_first(rows, archived_transactions(db, TRANSACTION_FIELDS, start_date, end_date,
+                                                      type_filter, category))
+
+def _page_query(ledger_id, start_date, end_date, type_filter, category, after, page_size):
+    """Return the query and params for one keyset page of table rows, newest first"""
+    where, params = transaction_filters(ledger_id, start_date, end_date, type_filter, category)
+    if after:
+        after_date, after_id = after
+        where += " AND (date < %s OR (date = %s AND id < %s))"
+        params.extend([after_date, after_date, after_id])
+
+    query = (
+        f"SELECT {TRANSACTION_COLUMNS} FROM transactions" + where +
+        " ORDER BY date DESC, id DESC LIMIT %s"
+    )
+    return query, params + [page_size]
+
+def _archive_start(start_date, row_count, last_date, page_size):
+    """Return the first day archived rows can make a page on, given the table rows found for it"""
+    # Archived rows older than a full page of table rows cannot make the page
+    if row_count == page_size and (not start_date or last_date > start_date):
+        return last_date
+    return start_date
+
+def get_transactions_page(db, start_date=None, end_date=None, type_filter=None, category=None,
+                          after=None, page_size=50):
+    """Return one page of transactions, newest first.
+
+    after is the (date, id) of the last row on the previous page; the page
+    continues strictly below it, so the database never skips over rows the
+    way OFFSET does.
+    """
+    query, params = _page_query(db.ledger_id, start_date, end_date, type_filter, category, after, page_size)
+    rows = db.execute_query(query, params, fetch=True)
+    if rows is None:
+        return None
+
+    archive_start = _archive_start(start_date, len(rows), rows[-1]['date'] if rows else None, page_size)
+    archived = archived_transactions(db, TRANSACTION_FIELDS, archive_start, end_date, type_filter, category,
+                                     before=after, limit=page_size)
+    merged = _newest_first(rows, archived)
+    return merged[:page_size] if merged is not None else None
+
+def get_transactions_page_frame(db, start_date=None, end_date=None, type_filter=None, category=None,
+                                after=None, page_size=50):
+    """Return the page get_transactions_page would as a DataFrame, or None on error.
+
+    The table rows are fetched column-wise with fetch_frame rather than as
+    a dict per row; dates are datetime64.
+    """
+    import pandas as pd
+
+    query, params = _page_query(db.ledger_id, start_date, end_date, type_filter, category, after, page_size)
+    frame = db.fetch_frame(query, params)
+    if frame is None:
+        return None
+    if frame.empty:
+        frame = _empty_transactions_frame()
+
+    last_date = frame['date'].iloc[-1].date() if len(frame) else None
+    archive_start = _archive_start(start_date, len(frame), last_date, page_size)
+    archived = archived_transactions(db, TRANSACTION_FIELDS, archive_start, end_date, type_filter, category,
+                                     before=after, limit=page_size)
+    if archived is None:
+        return None
+    if not archived:
+        return frame
+    archived = pd.DataFrame(archived, columns=TRANSACTION_FIELDS).astype(frame.dtypes.to_dict())
+    merged = pd.concat([frame, archived], ignore_index=True)
+    merged = merged.sort_values(['date', 'id'], ascending=False, kind='stable', ignore_index=True)
+    return merged.head(page_size)
+
+def _empty_transactions_frame():
+    """A DataFrame with the TRANSACTION_FIELDS columns and no rows, typed like fetch_frame's"""
+    import numpy as np
+    import pandas as pd
+
+    dtypes = {'id': np.int64, 'date': 'datetime64[s]', 'amount_cents': np.int64}
+    return pd.DataFrame({name: np.array([], dtype=dtypes.get(name, object)) for name in TRANSACTION_FIELDS})
+
+def count_transactions(db, start_date=None, end_date=None, type_filter=None, category=None):
+    """Return the number of transactions, archived ones included, matching the filters, or None on error"""
+    where, params = transaction_filters(db.ledger_id, start_date, end_date, type_filter, category)
+    result = db.execute_query("SELECT COUNT(*) as total FROM transactions" + where, params, fetch=True)
+    archived = count_archived(db, start_date, end_date, type_filter, category)
+    if result is None or archived is None:
+        return None
+    return (result[0]['total'] if result else 0) + archived
+
+# Search text is reduced to plain words, so it can never inject search operators
+SEARCH_WORD = re.compile(r"\w+")
+MAX_SEARCH_TERMS = 8
+# Above this many index matches a search page is read in date order rather
+# than by sorting every match
+BROAD_SEARCH_MATCHES = 20000
+# A ledger with at most this share of all transactions has the full-text
+# lookup narrowed to its own rows; for a bigger one, intersecting with its
+# postings costs more than the other ledgers' matches it would skip
+NARROW_SEARCH_SHARE = 0.5
+
+LEDGER_SIZES = """
+    SELECT ledgers.id, (
+        SELECT cumulative_count FROM daily_balances
+        WHERE daily_balances.ledger_id = ledgers.id
+        ORDER BY date DESC LIMIT 1
+    ) AS transaction_count
+    FROM ledgers
+"""
+
+def search_terms(text):
+    """Split search text into at most MAX_SEARCH_TERMS lower-case words"""
+    return SEARCH_WORD.findall((text or "").lower())[:MAX_SEARCH_TERMS]
+
+def _index_ledger(db):
+    """Return the ledger id to narrow full-text lookups to, or None to read the whole index"""
+    # Sizes only steer the plan, so an answer a little out of date is harmless
+    rows = db.execute_query(LEDGER_SIZES, fetch=True, cache_tags=['balances'])
+    sizes = {row['id']: int(row['transaction_count'] or 0) for row in rows or []}
+    total = sum(sizes.values())
+    if total and sizes.get(db.ledger_id, 0) <= total * NARROW_SEARCH_SHARE:
+        return db.ledger_id
+    return None
+
+def _is_broad_search(db, terms, index_ledger):
+    """True when terms match enough rows that paging in date order beats sorting every match"""
+    count = db.backend.text_match_count(terms, index_ledger)
+    if count is None:
+        return False
+    query, param = count
+    rows = db.execute_query(query, [param], fetch=True, cache_tags=month_tags())
+    return bool(rows) and rows[0]['matches'] >= BROAD_SEARCH_MATCHES
+
+def _search_filters(db, terms, index_ledger, start_date, end_date, type_filter, category, broad=False):
+    """Return the FROM clause, WHERE clause and params of a description search with filters"""
+    source, match, param = db.backend.text_search(terms, index_ledger, broad)
+    where, params = transaction_filters(db.ledger_id, start_date, end_date, type_filter, category)
+    where = " WHERE " + match + " AND " + where[len(" WHERE "):]
+    return source, where, [param] + params
+
+def search_transactions(db, text, start_date=None, end_date=None, type_filter=None, category=None,
+                        after=None, page_size=50):
+    """Return one page of transactions whose description has every word of text as a prefix.
+
+    "ub ride" finds "Uber ride home". The full-text index finds the
+    matching rows; the filters are applied in the same query and pages
+    continue from the (date, id) cursor after, as in get_transactions_page.
+    Searches matching more than BROAD_SEARCH_MATCHES rows fill the page
+    from the newest transactions instead of sorting every match.
+    Returns [] when text has no words.
+    """
+    search = _search_page_query(db, text, start_date, end_date, type_filter, category, after, page_size)
+    if search is None:
+        return []
+    query, params = search
+    return db.execute_query(query, params, fetch=True, cache_tags=month_tags())
+
+def search_transactions_frame(db, text, start_date=None, end_date=None, type_filter=None, category=None,
+                              after=None, page_size=50):
+    """Return the page search_transactions would as a DataFrame built with fetch_frame, or None on error"""
+    search = _search_page_query(db, text, start_date, end_date, type_filter, category, after, page_size)
+    if search is None:
+        return _empty_transactions_frame()
+    query, params = search
+    frame = db.fetch_frame(query, params, cache_tags=month_tags())
+    if frame is not None and frame.empty:
+        return _empty_transactions_frame()
+    return frame
+
+def _search_page_query(db, text, start_date, end_date, type_filter, category, after, page_size):
+    """Return the query and params for one page of a description search, or None when text has no words"""
+    terms = search_terms(text)
+    if not terms:
+        return None
+    index_ledger = _index_ledger(db)
+    broad = _is_broad_search(db, terms, index_ledger)
+    source, where, params = _search_filters(db, terms, index_ledger, start_date, end_date, type_filter,
+                                            category, broad)
+    if after:
+        after_date, after_id = after
+        where += (" AND (transactions.date < %s OR "
+                  "(transactions.date = %s AND transactions.id < %s))")
+        params.extend([after_date, after_date, after_id])
+
+    columns = ", ".join(f"transactions.{column}" for column in TRANSACTION_COLUMNS.split(", "))
+    query = (
+        f"SELECT {columns} FROM {source}" + where +
+        " ORDER BY transactions.date DESC, transactions.id DESC LIMIT %s"
+    )
+    return query, params + [page_size]
+
+def search_totals(db, text, start_date=None, end_date=None, type_filter=None, category=None):
+    """Return the count and income/expense cents of every transaction search_transactions would page through"""
+    terms = search_terms(text)
+    if not terms:
+        return {'transaction_count': 0, 'income_cents': 0, 'expense_cents': 0}
+    source, where, params = _search_filters(db, terms, _index_ledger(db), start_date, end_date,
+                                            type_filter, category)
+    query = f"""
+        SELECT
+            COUNT(*) as transaction_count,
+            SUM(CASE WHEN transactions.type = 'income' THEN transactions.amount_cents ELSE 0 END) as income_cents,
+            SUM(CASE WHEN transactions.type = 'expense' THEN transactions.amount_cents ELSE 0 END) as expense_cents
+        FROM {source}
+    """ + where
+    rows = db.execute_query(query, params, fetch=True, cache_tags=month_tags())
+    if not rows:
+        return None if rows is None else {'transaction_count': 0, 'income_cents': 0, 'expense_cents': 0}
+    row = rows[0]
+    # MySQL returns SUM() of a BIGINT as DECIMAL; SUM over no rows is NULL
+    return {
+        'transaction_count': int(row['transaction_count']),
+        'income_cents': int(row['income_cents'] or 0),
+        'expense_cents': int(row['expense_cents'] or 0)
+    }
+
+def get_transactions_summary(db, start_date=None, end_date=None):
+    full_months, raw_ranges = split_months(start_date, end_date)
+    totals = {}
+
+    def add(rows):
+        for row in rows:
+            key = (row['type'], row['category'])
+            cents, count = totals.get(key, (0, 0))
+            # MySQL returns SUM() of a BIGINT as DECIMAL
+            totals[key] = (cents + int(row['total_cents']), count + int(row['transaction_count']))
+
+    # Whole months come from the rollup, partial edge months from raw rows, archived or not
+    if full_months:
+        query = """
+            SELECT 
+                type,
+                category,
+                SUM(total_cents) as total_cents,
+                SUM(transaction_count) as transaction_count
+            FROM monthly_category_totals
+        """
+        where, params = _month_filter(db.ledger_id, *full_months)
+        query += where + " GROUP BY type, category"
+        rows = db.execute_query(query, params, fetch=True, cache_tags=month_tags(*full_months))
+        if rows is None:
+            return None
+        add(rows)
+
+    for range_start, range_end in raw_ranges:
+        query = """
+            SELECT 
+                type,
+                category,
+                SUM(amount_cents) as total_cents,
+                COUNT(*) as transaction_count
+            FROM transactions
+            WHERE ledger_id = %s AND date >= %s AND date < %s
+            GROUP BY type, category
+        """
+        rows = db.execute_query(query, (db.ledger_id, range_start, range_end), fetch=True,
+                                cache_tags=_range_tags(range_start, range_end))
+        if rows is None:
+            return None
+        add(rows)
+        archived = archived_totals(db, range_start, range_end - timedelta(days=1), ('type', 'category'))
+        if archived is None:
+            return None
+        add(archived)
+
+    summary = [
+        {'type': type, 'category': category, 'total_cents': cents, 'transaction_count': count}
+        for (type, category), (cents, count) in totals.items()
+        if count
+    ]
+    summary.sort(key=lambda row: (row['type'], -row['total_cents']))
+    return summary
+
+def _prefix_at(db, day=None):
+    """Return (income, expense, count) cents/rows of every transaction up to and including day"""
+    query = f"SELECT {PREFIX_COLUMNS} FROM daily_balances WHERE ledger_id = %s"
+    params = [db.ledger_id]
+    if day:
+        query += " AND date <= %s"
+        params.append(day)
+    query += " ORDER BY date DESC LIMIT 1"
+    rows = db.execute_query(query, params, fetch=True, cache_tags=['balances'])
+    if rows is None:
+        return None
+    if not rows:
+        return 0, 0, 0
+    row = rows[0]
+    return (int(row['cumulative_income_cents']), int(row['cumulative_expense_cents']),
+            int(row['cumulative_count']))
+
+def get_period_totals(db, start_date=None, end_date=None):
+    """Return income, expense and net cents, the transaction count and the closing balance for a date range.
+
+    Two lookups of the daily_balances prefix sums, at end_date and at the
+    day before start_date, whatever the length of the range.
+    """
+    closing = _prefix_at(db, end_date)
+    opening = _prefix_at(db, start_date - timedelta(days=1)) if start_date else (0, 0, 0)
+    if closing is None or opening is None:
+        return None
+    income, expense, count = (after - before for after, before in zip(closing, opening))
+    return {
+        'income_cents': income,
+        'expense_cents': expense,
+        'net_cents': income - expense,
+        'transaction_count': count,
+        'opening_balance_cents': opening[0] - opening[1],
+        'closing_balance_cents': closing[0] - closing[1]
+    }
+
+BALANCE_SERIES_QUERY = """
+    SELECT
+        date,
+        income_cents,
+        expense_cents,
+        cumulative_income_cents - cumulative_expense_cents as balance_cents
+    FROM daily_balances
+    WHERE ledger_id = %s AND date >= %s AND date <= %s
+    ORDER BY date
+"""
+
+def get_balance_series(db, start_date, end_date):
+    """Return the running balance at the end of each day with transactions in the range.
+
+    Each row has date, income_cents, expense_cents and balance_cents (all
+    income minus all expenses up to and including that day).
+    """
+    return db.execute_query(BALANCE_SERIES_QUERY, (db.ledger_id, start_date, end_date), fetch=True,
+                            cache_tags=['balances'])
+
+def get_balance_arrays(db, start_date, end_date):
+    """Return get_balance_series as {column: NumPy array} from fetch_arrays, or None on error"""
+    return db.fetch_arrays(BALANCE_SERIES_QUERY, (db.ledger_id, start_date, end_date), cache_tags=['balances'])
+
+# Budgets are unique per (ledger, month, category), so a write is a single upsert
+BUDGET_UPSERT = """
+    INSERT INTO budgets (ledger_id, category, amount_cents, month)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE amount_cents = VALUES(amount_cents)
+"""
+
+def set_budget(db, category, amount_cents, month):
+    result = db.execute_query(BUDGET_UPSERT, (db.ledger_id, category, amount_cents, month))
+    db.invalidate(budget_write_tags(month))
+    return result is not None
+
+def save_month_budgets(db, month, amounts):
+    """Write a whole month of budgets in one transaction.
+
+    amounts maps category -> amount in cents; categories whose amount is
+    None or 0 have their budget for the month removed. Returns True on success.
+    """
+    upserts = [(db.ledger_id, category, cents, month) for category, cents in amounts.items() if cents]
+    removed = [(db.ledger_id, month, category) for category, cents in amounts.items() if not cents]
+
+    def work(cursor):
+        if upserts:
+            cursor.executemany(BUDGET_UPSERT, upserts)
+        if removed:
+            cursor.executemany(
+                "DELETE FROM budgets WHERE ledger_id = %s AND month = %s AND category = %s", removed
+            )
+        return True
+
+    result = db.run_in_transaction(work)
+    db.invalidate(budget_write_tags(month))
+    return result is not None
+
+def copy_budgets(db, from_month, to_month, overwrite=False):
+    """Copy every budget of from_month to to_month in one statement.
+
+    Existing to_month budgets are kept unless overwrite is set. Returns
+    True on success.
+    """
+    query = """
+        INSERT INTO budgets (ledger_id, category, amount_cents, month)
+        SELECT ledger_id, category, amount_cents, %s FROM budgets WHERE ledger_id = %s AND month = %s
+    """
+    if overwrite:
+        query += " ON DUPLICATE KEY UPDATE amount_cents = VALUES(amount_cents)"
+    else:
+        query = query.replace("INSERT INTO", "INSERT IGNORE INTO", 1)
+    result = db.execute_query(query, (to_month, db.ledger_id, from_month))
+    db.invalidate(budget_write_tags(to_month))
+    return result is not None
+
+def get_budgets(db, month=None):
+    query = "SELECT * FROM budgets WHERE ledger_id = %s"
+    params = [db.ledger_id]
+    
+    if month:
+        query += " AND month = %s"
+        params.append(month)
+    
+    query += " ORDER BY category"
+    tags = [f"budgets:{month}"] if month else ['budgets:*']
+    return db.execute_query(query, params, fetch=True, cache_tags=tags)
+
+# Budgets are always for a whole month, so actuals come straight from the rollup
+BUDGET_VS_ACTUAL_QUERY = """
+    SELECT 
+        b.category,
+        b.amount_cents as budget_cents,
+        COALESCE(r.total_cents, 0) as actual_cents
+    FROM budgets b
+    LEFT JOIN monthly_category_totals r ON r.ledger_id = b.ledger_id
+        AND r.month = b.month
+        AND r.type = 'expense'
+        AND r.category = b.category
+    WHERE b.ledger_id = %s AND b.month = %s
+    ORDER BY b.category
+"""
+
+def get_budget_vs_actual(db, month):
+    return db.execute_query(BUDGET_VS_ACTUAL_QUERY, (db.ledger_id, month), fetch=True,
+                            cache_tags=[f"budgets:{month}", f"month:{month}"])
+
+def get_budget_vs_actual_frame(db, month):
+    """Return get_budget_vs_actual's rows as a DataFrame built with fetch_frame, or None on error"""
+    return db.fetch_frame(BUDGET_VS_ACTUAL_QUERY, (db.ledger_id, month),
+                          cache_tags=[f"budgets:{month}", f"month:{month}"])
+
+def get_monthly_trend(db, start_date, end_date):
+    full_months, raw_ranges = split_months(start_date, end_date)
+    totals = {}
+
+    def add(rows):
+        for row in rows:
+            key = (row['month'], row['type'])
+            totals[key] = totals.get(key, 0) + int(row['total_cents'])
+
+    if full_months:
+        query = """
+            SELECT 
+                month,
+                type,
+                SUM(total_cents) as total_cents
+            FROM monthly_category_totals
+        """
+        where, params = _month_filter(db.ledger_id, *full_months)
+        query += where + " GROUP BY month, type"
+        rows = db.execute_query(query, params, fetch=True, cache_tags=month_tags(*full_months))
+        if rows is None:
+            return None
+        add(rows)
+
+    # month is a stored generated column; filtering on it as well as on the
+    # half-open date range lets the (ledger_id, month, type, date, amount_cents)
+    # index cover both the filter and the GROUP BY
+    for range_start, range_end in raw_ranges:
+        query = """
+            SELECT 
+                month,
+                type,
+                SUM(amount_cents) as total_cents
+            FROM transactions
+            WHERE ledger_id = %s
+                AND month BETWEEN %s AND %s
+                AND date >= %s AND date < %s
+            GROUP BY month, type
+        """
+        params = (
+            db.ledger_id,
+            range_start.strftime("%Y-%m"),
+            (range_end - timedelta(days=1)).strftime("%Y-%m"),
+            range_start,
+            range_end
+        )
+        rows = db.execute_query(query, params, fetch=True, cache_tags=_range_tags(range_start, range_end))
+        if rows is None:
+            return None
+        add(rows)
+        archived = archived_totals(db, range_start, range_end - timedelta(days=1), ('date', 'type'))
+        if archived is None:
+            return None
+        add({'month': row['date'].strftime("%Y-%m"), **row} for row in archived)
+
+    return [
+        {'month': month, 'type': type, 'total_cents': cents}
+        for (month, type), cents in sorted(totals.items())
+    ]
+
+class _RecordingDatabase:
+    """Stand-in Database that records read queries instead of running them"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.ledger_id = DEFAULT_LEDGER_ID
+        self.queries = []
+
+    def execute_query(self, query, params=None, fetch=False, cache_tags=None):
+        if fetch:
+            self.queries.append((query, params))
+        return []
+
+def canonical_queries(backend, today=None):
+    """Return (name, query, params) for every read query the pages issue on backend"""
+    today = today or date.today()
+    month_start = today.replace(day=1)
+    month = today.strftime("%Y-%m")
+    calls = [
+        ('get_categories', lambda db: get_categories(db, 'expense')),
+        ('get_transactions', lambda db: get_transactions(db, month_start, today)),
+        ('get_transactions_page', lambda db: get_transactions_page(db, month_start, today, 'expense')),
+        ('count_transactions', lambda db: count_transactions(db, month_start, today, 'expense')),
+        ('get_transactions_summary', lambda db: get_transactions_summary(db, month_start, today)),
+        ('get_budgets', lambda db: get_budgets(db, month)),
+        ('get_budget_vs_actual', lambda db: get_budget_vs_actual(db, month)),
+        ('get_monthly_trend', lambda db: get_monthly_trend(db, month_start, today)),
+        ('get_period_totals', lambda db: get_period_totals(db, month_start, today)),
+        ('get_balance_series', lambda db: get_balance_series(db, month_start, today)),
+        ('search_transactions', lambda db: search_transactions(db, "rent", month_start, today)),
+        ('search_totals', lambda db: search_totals(db, "rent", month_start, today)),
+    ]
+
+    result = []
+    for name, call in calls:
+        recorder = _RecordingDatabase(backend)
+        call(recorder)
+        for query, params in recorder.queries:
+            result.append((name, query, params))
+    return result
+
+def explain_canonical_queries(db, today=None):
+    """Run EXPLAIN for each canonical query and flag full table scans"""
+    report = []
+    for name, query, params in canonical_queries(db.backend, today):
+        plan = db.explain(query, params) or []
+        full_scans = [
+            row['table'] for row in plan
+            if row.get('type') == 'ALL' and row.get('table') not in SMALL_TABLES
+        ]
+        report.append({
+            'name': name,
+            'plan': plan,
+            'full_scans': full_scans
+        })
+    return report
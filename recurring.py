@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import sys
+from calendar import monthrange
+from datetime import date, timedelta
+from money import format_cents
+from queries import transaction_write_tags, write_new_transactions
+
+# Recurring rules post transactions such as rent or a salary on a schedule.
+#
+# Each rule keeps next_date, its first occurrence not posted yet. Posting
+# walks every due rule from next_date up to today, writes all of the
+# occurrences in one bulk insert and moves next_date past them, in a single
+# transaction, so catching up after months of downtime costs the same few
+# statements as a single day. Every occurrence carries an import_hash
+# derived from (rule, date), so it can never be posted twice.
+
+FREQUENCIES = ('weekly', 'monthly', 'yearly')
+
+RULE_COLUMNS = (
+    "id, description, category, type, amount_cents, frequency, interval_count, "
+    "start_date, end_date, next_date"
+)
+
+def add_months(start, months):
+    """Return the date months after start, on start's day clamped to the month's length"""
+    year, month = divmod(start.year * 12 + start.month - 1 + months, 12)
+    month += 1
+    return date(year, month, min(start.day, monthrange(year, month)[1]))
+
+def occurrence(rule, n):
+    """Return the date of the rule's n-th occurrence, counting start_date as 0.
+
+    Months are always counted from start_date, so a rule starting on the
+    31st falls on the last day of shorter months and returns to the 31st.
+    """
+    start = rule['start_date']
+    step = rule['interval_count'] * n
+    if rule['frequency'] == 'weekly':
+        return start + timedelta(weeks=step)
+    if rule['frequency'] == 'yearly':
+        step *= 12
+    return add_months(start, step)
+
+def _index_near(rule, day):
+    """Return an occurrence index at or just before the first occurrence on or after day"""
+    start = rule['start_date']
+    if day <= start:
+        return 0
+    if rule['frequency'] == 'weekly':
+        periods = (day - start).days // 7
+    else:
+        periods = (day.year - start.year) * 12 + day.month - start.month
+        if rule['frequency'] == 'yearly':
+            periods //= 12
+    return max(periods // rule['interval_count'] - 1, 0)
+
+def occurrences(rule, start, end):
+    """Yield the rule's occurrence dates from start to end inclusive, stopping at its end_date"""
+    if rule['end_date'] and rule['end_date'] < end:
+        end = rule['end_date']
+    n = _index_near(rule, start)
+    while True:
+        day = occurrence(rule, n)
+        if day > end:
+            return
+        if day >= start:
+            yield day
+        n += 1
+
+def next_occurrence(rule, after):
+    """Return the first occurrence strictly after the given date"""
+    day = after + timedelta(days=1)
+    n = _index_near(rule, day)
+    while occurrence(rule, n) < day:
+        n += 1
+    return occurrence(rule, n)
+
+def occurrence_hash(rule_id, day):
+    """Hash stored as import_hash so an occurrence is only ever posted once"""
+    return hashlib.sha256(f"recurring|{rule_id}|{day.isoformat()}".encode()).hexdigest()
+
+def add_rule(db, description, category, type, amount_cents, frequency, start_date,
+             end_date=None, interval_count=1):
+    """Create a rule and return its id; occurrences are written by post_due"""
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"frequency must be one of {', '.join(FREQUENCIES)}")
+    if interval_count < 1:
+        raise ValueError("interval_count must be at least 1")
+    if end_date and end_date < start_date:
+        raise ValueError("end_date is before start_date")
+
+    result = db.execute_query(
+        """
+            INSERT INTO recurring_rules (ledger_id, description, category, type, amount_cents, frequency,
+                                         interval_count, start_date, end_date, next_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (db.ledger_id, description, category, type, amount_cents, frequency, interval_count,
+         start_date, end_date, start_date)
+    )
+    db.invalidate(['recurring'])
+    return result
+
+def get_rules(db):
+    query = f"SELECT {RULE_COLUMNS} FROM recurring_rules WHERE ledger_id = %s ORDER BY next_date, id"
+    result = db.execute_query(query, (db.ledger_id,), fetch=True, cache_tags=['recurring'])
+    return result if result else []
+
+def delete_rule(db, rule_id):
+    """Remove a rule; transactions it already posted are kept"""
+    result = db.execute_query("DELETE FROM recurring_rules WHERE ledger_id = %s AND id = %s",
+                              (db.ledger_id, rule_id))
+    db.invalidate(['recurring'])
+    return result is not None
+
+def post_due(db, through=None):
+    """Post every occurrence due on or before through (default today) in one transaction.
+
+    Returns a dict with posted, duplicates (occurrences already stored) and
+    rules (rules that were due), or None if the transaction was rolled back.
+    """
+    through = through or date.today()
+    months = set()
+
+    def work(cursor):
+        # FOR UPDATE keeps two schedulers from posting the same rules at once
+        cursor.execute(
+            f"""
+                SELECT {RULE_COLUMNS} FROM recurring_rules
+                WHERE ledger_id = %s AND next_date <= %s AND (end_date IS NULL OR next_date <= end_date)
+                FOR UPDATE
+            """,
+            (db.ledger_id, through)
+        )
+        rules = cursor.fetchall()
+
+        rows, advanced = [], []
+        for rule in rules:
+            for day in occurrences(rule, rule['next_date'], through):
+                rows.append((rule['amount_cents'], rule['category'], rule['type'],
+                             rule['description'], day, occurrence_hash(rule['id'], day)))
+            advanced.append((next_occurrence(rule, through), rule['id']))
+
+        posted = write_new_transactions(cursor, db.ledger_id, rows) if rows else []
+        if advanced:
+            cursor.executemany("UPDATE recurring_rules SET next_date = %s WHERE id = %s", advanced)
+        months.update(row[4].strftime("%Y-%m") for row in posted)
+        return {'posted': len(posted), 'duplicates': len(rows) - len(posted), 'rules': len(rules)}
+
+    result = db.run_in_transaction(work)
+    if result is not None and result['rules']:
+        db.invalidate(transaction_write_tags(months) + ['recurring'])
+    return result
+
+def preview(db, start_date, end_date):
+    """Return the occurrences the rules would post between two dates, without writing anything.
+
+    Only occurrences from each rule's next_date on are included; earlier
+    ones are already transactions.
+    """
+    items = []
+    for rule in get_rules(db):
+        for day in occurrences(rule, max(start_date, rule['next_date']), end_date):
+            items.append({
+                'date': day,
+                'rule_id': rule['id'],
+                'description': rule['description'],
+                'category': rule['category'],
+                'type': rule['type'],
+                'amount_cents': rule['amount_cents']
+            })
+    items.sort(key=lambda item: (item['date'], item['rule_id']))
+    return items
+
+def projected_cash_flow(db, start_date, end_date):
+    """Return projected income, expense and net cents per month from preview()"""
+    months = {}
+    for item in preview(db, start_date, end_date):
+        totals = months.setdefault(item['date'].strftime("%Y-%m"), {'income': 0, 'expense': 0})
+        totals[item['type']] += item['amount_cents']
+    return [
+        {'month': month, 'income_cents': totals['income'], 'expense_cents': totals['expense'],
+         'net_cents': totals['income'] - totals['expense']}
+        for month, totals in sorted(months.items())
+    ]
+
+def main(argv=None):
+    from database import DEFAULT_LEDGER_ID, Database
+    from queries import get_ledgers
+
+    parser = argparse.ArgumentParser(description="Post and preview recurring transactions")
+    parser.add_argument("--ledger", type=int,
+                        help=f"ledger id (default: every ledger for post, {DEFAULT_LEDGER_ID} otherwise)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    post = subparsers.add_parser("post", help="post every occurrence that has come due")
+    post.add_argument("--through", type=date.fromisoformat, help="post up to this date (default: today)")
+    show = subparsers.add_parser("preview", help="list upcoming occurrences without posting them")
+    show.add_argument("--months", type=int, default=3)
+    subparsers.add_parser("list", help="list the rules")
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if not db.initialize_database():
+        return 1
+
+    if args.command == "post":
+        ledger_ids = [args.ledger] if args.ledger else [ledger['id'] for ledger in get_ledgers(db)]
+        status = 0
+        for ledger_id in ledger_ids:
+            result = post_due(db.for_ledger(ledger_id), args.through)
+            if result is None:
+                status = 1
+                continue
+            print(f"Ledger {ledger_id}: posted {result['posted']} transactions from {result['rules']} "
+                  f"due rules ({result['duplicates']} already posted)")
+        return status
+
+    db = db.for_ledger(args.ledger or DEFAULT_LEDGER_ID)
+
+    if args.command == "list":
+        for rule in get_rules(db):
+            every = f"every {rule['interval_count']} " if rule['interval_count'] > 1 else ""
+            print(f"{rule['id']:>4} {rule['description']:<30} {rule['type']:<7} "
+                  f"{format_cents(rule['amount_cents']):>12} {every}{rule['frequency']} "
+                  f"next {rule['next_date']}" + (f" until {rule['end_date']}" if rule['end_date'] else ""))
+        return 0
+
+    today = date.today()
+    for item in preview(db, today, add_months(today, args.months)):
+        print(f"{item['date']} {item['description']:<30} {item['type']:<7} "
+              f"{format_cents(item['amount_cents']):>12}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import argparse
+import sys
+from collections import defaultdict
+
+# monthly_category_totals holds SUM(amount_cents) and COUNT(*) of transactions per
+# (ledger, month, type, category). It is kept in step with every insert so
+# the summary pages can read a handful of rollup rows instead of scanning
+# transactions. Rows moved to the archive (see archive.py) stay counted.
+
+UPSERT_QUERY = """
+    INSERT INTO monthly_category_totals (ledger_id, month, type, category, total_cents, transaction_count)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        total_cents = total_cents + VALUES(total_cents),
+        transaction_count = transaction_count + VALUES(transaction_count)
+"""
+
+REBUILD_QUERY = """
+    INSERT INTO monthly_category_totals (ledger_id, month, type, category, total_cents, transaction_count)
+    SELECT ledger_id, month, type, category, SUM(amount_cents), COUNT(*)
+    FROM transactions
+    GROUP BY ledger_id, month, type, category
+"""
+
+def apply_to_rollup(cursor, ledger_id, rows, sign=1):
+    """Add a ledger's freshly inserted (amount_cents, category, type, date) rows to the rollup; sign=-1 takes them out"""
+    totals = defaultdict(lambda: [0, 0])
+    for cents, category, type, day in rows:
+        key = (day.strftime("%Y-%m"), type, category)
+        totals[key][0] += sign * cents
+        totals[key][1] += sign
+
+    if totals:
+        cursor.executemany(
+            UPSERT_QUERY,
+            [(ledger_id, month, type, category, cents, count)
+             for (month, type, category), (cents, count) in totals.items()]
+        )
+
+def _archived_months(db):
+    """Return {(ledger_id, month, type, category): [cents, count]} over the archive, or None on error"""
+    from archive import archived_daily_totals
+
+    rows = archived_daily_totals(db)
+    if rows is None:
+        return None
+    totals = defaultdict(lambda: [0, 0])
+    for ledger_id, day, type, category, cents, count in rows:
+        total = totals[(ledger_id, day.strftime("%Y-%m"), type, category)]
+        total[0] += cents
+        total[1] += count
+    return totals
+
+def rebuild_rollup(db):
+    """Recompute the whole rollup, for every ledger, from the transactions table and the archive"""
+    archived = _archived_months(db)
+    if archived is None:
+        return None
+
+    def rebuild(cursor):
+        cursor.execute("DELETE FROM monthly_category_totals")
+        cursor.execute(REBUILD_QUERY)
+        if not archived:
+            return cursor.rowcount
+        cursor.executemany(UPSERT_QUERY, [key + tuple(total) for key, total in archived.items()])
+        cursor.execute("SELECT COUNT(*) AS n FROM monthly_category_totals")
+        return cursor.fetchall()[0]['n']
+
+    return db.run_in_transaction(rebuild)
+
+def verify_rollup(db):
+    """Return (ledger_id, month, type, category, expected, actual) for every rollup row that disagrees with transactions"""
+    expected = db.execute_query("""
+        SELECT ledger_id, month, type, category, SUM(amount_cents) as total_cents, COUNT(*) as transaction_count
+        FROM transactions
+        GROUP BY ledger_id, month, type, category
+    """, fetch=True)
+    actual = db.execute_query("""
+        SELECT ledger_id, month, type, category, total_cents, transaction_count
+        FROM monthly_category_totals
+        WHERE transaction_count <> 0
+    """, fetch=True)
+    archived = _archived_months(db)
+    if expected is None or actual is None or archived is None:
+        return None
+
+    # MySQL returns SUM() of a BIGINT as DECIMAL
+    def index(rows):
+        return {
+            (row['ledger_id'], row['month'], row['type'], row['category']):
+                (int(row['total_cents']), int(row['transaction_count']))
+            for row in rows
+        }
+
+    expected, actual = index(expected), index(actual)
+    for key, (cents, count) in archived.items():
+        table_cents, table_count = expected.get(key, (0, 0))
+        expected[key] = (table_cents + cents, table_count + count)
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            mismatches.append(key + (expected.get(key), actual.get(key)))
+    return mismatches
+
+def main(argv=None):
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Maintain the monthly_category_totals rollup")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if not db.initialize_database():
+        return 1
+
+    if args.command == "rebuild":
+        rows = rebuild_rollup(db)
+        if rows is None:
+            return 1
+        print(f"Rebuilt rollup with {rows} rows")
+        return 0
+
+    mismatches = verify_rollup(db)
+    if mismatches is None:
+        return 1
+    for ledger_id, month, type, category, expected, actual in mismatches:
+        print(f"ledger {ledger_id} {month} {type} {category}: expected {expected}, rollup has {actual}")
+    print("Rollup is consistent" if not mismatches else f"{len(mismatches)} mismatched rollup rows")
+    return 0 if not mismatches else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def sqlite_env(tmp_path, monkeypatch):
+    """Point DB_BACKEND and DB_PATH at a fresh SQLite file, returning its path"""
+    path = str(tmp_path / "finance.db")
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('DB_PATH', path)
+    monkeypatch.setenv('ARCHIVE_DIR', str(tmp_path / "archive"))
+    return path
+
+@pytest.fixture
+def db(sqlite_env):
+    """An initialized Database on a fresh SQLite file, with the default ledger and categories"""
+    from database import Database
+
+    database = Database()
+    assert database.initialize_database()
+    yield database
+    database.close()
@@ -0,0 +1,122 @@
+import io
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from archive import archive_closed_years, archive_dir, backup, get_partitions, restore, verify_archive
+from balances import verify_balances
+from export import export_transactions
+from importer import import_statement
+from queries import (count_transactions, get_monthly_trend, get_transactions, get_transactions_page,
+                     get_transactions_summary, write_transactions)
+from rollup import verify_rollup
+
+TODAY = date(2024, 6, 30)
+
+@pytest.fixture
+def ledger(db):
+    """A ledger with transactions in 2022, 2023 and 2024"""
+    rng = random.Random(7)
+    rows = [
+        (rng.randint(100, 50000), rng.choice(["Food", "Transportation"]) if kind == 'expense' else "Salary",
+         kind, f"row {i}", date(2022, 1, 1) + timedelta(days=rng.randint(0, 900)), None)
+        for i, kind in enumerate(rng.choice(["income", "expense", "expense"]) for _ in range(600))
+    ]
+
+    def work(cursor):
+        write_transactions(cursor, db.ledger_id, rows)
+        return True
+
+    assert db.run_in_transaction(work)
+    return db
+
+def snapshot(db):
+    ranges = [(None, None), (date(2022, 3, 10), date(2024, 2, 17)), (date(2023, 12, 31), date(2024, 1, 1))]
+    result = {}
+    for start, end in ranges:
+        result['count', start, end] = count_transactions(db, start, end)
+        result['count expense', start, end] = count_transactions(db, start, end, 'expense', 'Food')
+        result['rows', start, end] = get_transactions(db, start, end)
+        result['summary', start, end] = sorted(map(str, get_transactions_summary(db, start, end)))
+        if start:
+            result['trend', start, end] = sorted(map(str, get_monthly_trend(db, start, end)))
+    return result
+
+def pages(db, *filters, page_size=37):
+    rows, after = [], None
+    while True:
+        page = get_transactions_page(db, *filters, after=after, page_size=page_size)
+        assert page is not None
+        rows += page
+        if len(page) < page_size:
+            return rows
+        after = (page[-1]['date'], page[-1]['id'])
+
+def test_archived_years_read_like_table_rows(ledger):
+    db = ledger
+    before = snapshot(db)
+    paged = pages(db)
+    paged_food = pages(db, date(2022, 6, 1), date(2024, 3, 1), 'expense', 'Food')
+
+    results = archive_closed_years(db, keep_years=1, today=TODAY)
+    assert [result['year'] for result in results] == [2022, 2023]
+    assert [partition['year'] for partition in get_partitions(db)] == [2022, 2023]
+    old = db.execute_query("SELECT COUNT(*) AS n FROM transactions WHERE date < %s", (date(2024, 1, 1),), fetch=True)
+    assert old[0]['n'] == 0
+
+    db.cache.clear()
+    assert snapshot(db) == before
+    assert pages(db) == paged
+    assert pages(db, date(2022, 6, 1), date(2024, 3, 1), 'expense', 'Food') == paged_food
+    assert verify_archive(db) == []
+    assert verify_rollup(db) == []
+    assert verify_balances(db) == []
+
+def test_export_merges_archived_rows_in_date_order(ledger):
+    db = ledger
+    expected = count_transactions(db)
+    archive_closed_years(db, keep_years=1, today=TODAY)
+    out = io.BytesIO()
+    assert export_transactions(db, out, 'csv') == expected
+    lines = out.getvalue().decode("utf-8").splitlines()[1:]
+    days = [line.split(",")[1] for line in lines]
+    assert days == sorted(days)
+
+def test_reimport_of_an_archived_line_is_a_duplicate(db):
+    statement = "date,description,amount,type,category\n2022-05-05,Coffee,3.50,expense,Food\n"
+    assert import_statement(db, io.StringIO(statement))['inserted'] == 1
+    archive_closed_years(db, keep_years=1, today=TODAY)
+    result = import_statement(db, io.StringIO(statement))
+    assert (result['inserted'], result['duplicates']) == (0, 1)
+    assert count_transactions(db) == 1
+
+def test_backup_and_restore(ledger, tmp_path, monkeypatch):
+    db = ledger
+    archive_closed_years(db, keep_years=1, today=TODAY)
+    before = snapshot(db)
+    assert backup(db, str(tmp_path / "backup")) is not None
+
+    from database import Database
+
+    monkeypatch.setenv('DB_PATH', str(tmp_path / "restored.db"))
+    monkeypatch.setenv('ARCHIVE_DIR', str(tmp_path / "restored-archive"))
+    restored = Database()
+    assert restored.initialize_database()
+    assert restore(restored, str(tmp_path / "backup")) is not None
+    assert os.path.isdir(archive_dir())
+    assert snapshot(restored) == before
+    assert restore(restored, str(tmp_path / "backup")) is None
+    restored.close()
+
+def test_unreadable_archive_fails_the_count(ledger):
+    db = ledger
+    archive_closed_years(db, keep_years=1, today=TODAY)
+    os.remove(os.path.join(archive_dir(), get_partitions(db)[0]['path']))
+    db.cache.clear()
+    # A filtered count has to open the file; a wrong total must not be shown
+    assert count_transactions(db, None, None, 'expense') is None
+    assert count_transactions(db, date(2024, 1, 1)) is not None
@@ -0,0 +1,44 @@
+import random
+from datetime import date, timedelta
+
+from balances import verify_balances
+from queries import create_ledger, get_period_totals, write_transactions
+
+def _write_batches(db, seed, batches=40):
+    rng = random.Random(seed)
+    for _ in range(batches):
+        rows = [
+            (rng.randint(1, 10000), "Food", rng.choice(["income", "expense"]), "x",
+             date(2024, 1, 1) + timedelta(days=rng.randint(0, 400)), None)
+            for _ in range(rng.randint(1, 30))
+        ]
+        def work(cursor):
+            write_transactions(cursor, db.ledger_id, rows)
+            return True
+
+        assert db.run_in_transaction(work)
+    return rng
+
+def test_incremental_balances_match_transactions(db):
+    other = db.for_ledger(create_ledger(db, "Business"))
+    _write_batches(other, seed=2, batches=10)
+    rng = _write_batches(db, seed=1)
+    assert verify_balances(db) == []
+
+    db.cache.clear()
+    for _ in range(30):
+        start = date(2024, 1, 1) + timedelta(days=rng.randint(0, 400))
+        end = start + timedelta(days=rng.randint(0, 200))
+        totals = get_period_totals(db, start, end)
+        expected = db.execute_query(
+            """
+                SELECT
+                    COALESCE(SUM(CASE WHEN type = 'income' THEN amount_cents ELSE 0 END), 0) AS income_cents,
+                    COALESCE(SUM(CASE WHEN type = 'expense' THEN amount_cents ELSE 0 END), 0) AS expense_cents,
+                    COUNT(*) AS transaction_count
+                FROM transactions
+                WHERE ledger_id = %s AND date BETWEEN %s AND %s
+            """,
+            (db.ledger_id, start, end), fetch=True
+        )[0]
+        assert {key: totals[key] for key in expected} == expected
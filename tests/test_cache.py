@@ -0,0 +1,86 @@
+from datetime import date
+
+from cache import QueryCache
+from queries import add_transaction, create_ledger, get_budgets, get_transactions_summary, set_budget
+
+def _hits(db):
+    return db.cache_stats()['hits']
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = QueryCache()
+    cache.set('march', 1, ['month:2024-03'])
+    cache.set('april', 2, ['month:2024-04'])
+    cache.set('both', 3, ['month:2024-03', 'month:2024-04'])
+
+    assert cache.invalidate(['month:2024-03']) == 2
+    assert cache.get('march') == (False, None)
+    assert cache.get('both') == (False, None)
+    assert cache.get('april') == (True, 2)
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(max_entries=2)
+    cache.set('a', 1, [])
+    cache.set('b', 2, [])
+    cache.get('a')
+    cache.set('c', 3, [])
+
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.stats()['evictions'] == 1
+
+def test_expired_and_disabled_caches_miss():
+    expired = QueryCache(ttl=0)
+    expired.set('a', 1, [])
+    assert expired.get('a') == (False, None)
+    assert expired.stats()['expirations'] == 1
+
+    disabled = QueryCache(max_entries=0)
+    disabled.set('a', 1, [])
+    assert disabled.get('a') == (False, None)
+
+def test_repeated_read_is_served_from_the_cache(db):
+    assert set_budget(db, "Food", 30000, "2024-01")
+    first = get_budgets(db, "2024-01")
+    hits = _hits(db)
+
+    assert get_budgets(db, "2024-01") == first
+    assert _hits(db) == hits + 1
+
+def test_budget_write_invalidates_its_month_only(db):
+    assert set_budget(db, "Food", 30000, "2024-01")
+    assert set_budget(db, "Food", 40000, "2024-02")
+    get_budgets(db, "2024-01")
+    get_budgets(db, "2024-02")
+
+    assert set_budget(db, "Food", 35000, "2024-01")
+    hits = _hits(db)
+    assert [row['amount_cents'] for row in get_budgets(db, "2024-01")] == [35000]
+    assert _hits(db) == hits
+    assert [row['amount_cents'] for row in get_budgets(db, "2024-02")] == [40000]
+    assert _hits(db) == hits + 1
+
+def test_transaction_write_invalidates_summaries_of_its_month(db):
+    january = (date(2024, 1, 1), date(2024, 1, 31))
+    february = (date(2024, 2, 1), date(2024, 2, 29))
+    assert add_transaction(db, 1250, "Food", "expense", "Lunch", date(2024, 1, 10)) is not None
+    get_transactions_summary(db, *january)
+    before_february = get_transactions_summary(db, *february)
+
+    assert add_transaction(db, 750, "Food", "expense", "Coffee", date(2024, 1, 11)) is not None
+    hits = _hits(db)
+    summary = get_transactions_summary(db, *january)
+    assert _hits(db) == hits
+    assert sum(row['total_cents'] for row in summary) == 2000
+    assert get_transactions_summary(db, *february) == before_february
+    assert _hits(db) > hits
+
+def test_writes_to_one_ledger_keep_another_ledgers_entries(db):
+    other = db.for_ledger(create_ledger(db, "Business"))
+    assert set_budget(db, "Food", 30000, "2024-01")
+    get_budgets(db, "2024-01")
+
+    assert set_budget(other, "Food", 50000, "2024-01")
+    hits = _hits(db)
+    assert [row['amount_cents'] for row in get_budgets(db, "2024-01")] == [30000]
+    assert _hits(db) == hits + 1
+    assert [row['amount_cents'] for row in get_budgets(other, "2024-01")] == [50000]
@@ -0,0 +1,84 @@
+import io
+from datetime import date
+
+import pytest
+
+from categorize import CategoryMatcher, add_category_rule, recategorize
+from importer import import_statement
+from queries import add_transaction, get_transactions, get_transactions_summary
+
+def _rule(id, pattern, category, type='expense', match_type='contains', priority=0,
+          min_amount_cents=None, max_amount_cents=None):
+    return {'id': id, 'pattern': pattern, 'match_type': match_type, 'category': category, 'type': type,
+            'min_amount_cents': min_amount_cents, 'max_amount_cents': max_amount_cents, 'priority': priority}
+
+def _categories(db):
+    return {row['description']: row['category'] for row in get_transactions(db)}
+
+def test_matcher_picks_the_best_rule():
+    matcher = CategoryMatcher([
+        _rule(1, "uber", "Transportation"),
+        _rule(2, "uber eats", "Food", priority=5),
+        _rule(3, "ubs", "Other Expense"),
+        _rule(4, "payroll", "Salary", type='income', min_amount_cents=100000),
+        _rule(5, r"^netflix\b", "Entertainment", match_type='regex'),
+    ])
+
+    assert matcher.match("UBER EATS order 123", 'expense', 2000) == "Food"
+    assert matcher.match("Uber ride home", 'expense', 1500) == "Transportation"
+    assert matcher.match("UBS fee", 'expense', 500) == "Other Expense"
+    assert matcher.match("Netflix.com", 'expense', 1599) == "Entertainment"
+    assert matcher.match("Pay Netflix", 'expense', 1599) is None
+    # A rule only applies to its category's type and amount range
+    assert matcher.match("Uber payroll", 'income', 250000) == "Salary"
+    assert matcher.match("Uber payroll", 'income', 5000) is None
+    assert matcher.match("ACME payroll", 'expense', 250000) is None
+
+def test_equal_priorities_go_to_the_oldest_rule():
+    matcher = CategoryMatcher([_rule(2, "shell", "Transportation"), _rule(1, "shell", "Shopping")])
+    assert matcher.match("Shell station", 'expense', 4000) == "Shopping"
+
+def test_invalid_rules_are_refused(db):
+    with pytest.raises(ValueError):
+        add_category_rule(db, "uber", "Taxis")
+    with pytest.raises(ValueError):
+        add_category_rule(db, "(uber", "Transportation", match_type='regex')
+    with pytest.raises(ValueError):
+        add_category_rule(db, "uber", "Transportation", min_amount_cents=500, max_amount_cents=100)
+
+def test_import_categorizes_lines_without_a_category(db):
+    assert add_category_rule(db, "uber", "Transportation") is not None
+    assert add_category_rule(db, "uber eats", "Food", priority=5) is not None
+    statement = """date,description,amount,type,category
+2024-01-05,Uber ride,15.00,expense,
+2024-01-06,Uber Eats,22.00,expense,
+2024-01-07,Uber gift card,50.00,expense,Shopping
+2024-01-08,Corner shop,9.00,expense,
+"""
+    result = import_statement(db, io.StringIO(statement))
+    assert (result['inserted'], result['categorized']) == (4, 2)
+    assert _categories(db) == {
+        "Uber ride": "Transportation", "Uber Eats": "Food",
+        "Uber gift card": "Shopping", "Corner shop": "Other Expense"
+    }
+
+def test_recategorize_moves_rows_and_rollup(db):
+    for day, description, category in [(5, "Uber ride", "Other Expense"), (6, "Uber ride", "Shopping"),
+                                        (7, "Corner shop", "Other Expense")]:
+        assert add_transaction(db, 1000, category, "expense", description, date(2024, 1, day)) is not None
+    assert recategorize(db) is None
+    assert add_category_rule(db, "uber", "Transportation") is not None
+
+    assert recategorize(db, dry_run=True) == {'scanned': 2, 'changed': 1, 'months': {"2024-01"}}
+    assert "Transportation" not in {row['category'] for row in get_transactions(db)}
+
+    assert recategorize(db, batch_size=1)['changed'] == 1
+    totals = {row['category']: row['total_cents']
+              for row in get_transactions_summary(db, date(2024, 1, 1), date(2024, 1, 31))}
+    assert totals == {"Transportation": 1000, "Shopping": 1000, "Other Expense": 1000}
+
+    # Only overwrite touches rows that already had a category of their own
+    assert recategorize(db, overwrite=True)['changed'] == 1
+    totals = {row['category']: row['total_cents']
+              for row in get_transactions_summary(db, date(2024, 1, 1), date(2024, 1, 31))}
+    assert totals == {"Transportation": 2000, "Other Expense": 1000}
@@ -0,0 +1,27 @@
+import csv
+import io
+
+import pytest
+
+from benchmarks.export_memory import SyntheticDatabase, measure
+from export import COLUMNS, export_transactions
+
+# Generous for a 1,000-row chunk, yet far below what 20,000 buffered rows take
+CEILING = 8 * 2**20
+
+@pytest.mark.parametrize("format", ["csv", "csv.gz"])
+def test_export_memory_stays_bounded(format):
+    small_peak, _ = measure(2000, format, chunk_size=1000)
+    peak, _ = measure(20000, format, chunk_size=1000)
+    assert small_peak < CEILING
+    assert peak < CEILING
+    # Ten times the rows must not take anywhere near ten times the memory
+    assert peak < small_peak * 2
+
+def test_export_writes_every_row():
+    out = io.BytesIO()
+    assert export_transactions(SyntheticDatabase(2500), out, 'csv', chunk_size=1000) == 2500
+    rows = list(csv.reader(io.StringIO(out.getvalue().decode("utf-8"))))
+    assert rows[0] == COLUMNS
+    assert len(rows) == 2501
+    assert [row[0] for row in rows[1:4]] == ["1", "2", "3"]
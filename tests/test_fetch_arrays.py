@@ -0,0 +1,32 @@
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+
+from database import _column_to_array
+from queries import add_transaction
+
+def test_mysql_decimal_sums_of_cents_stay_cents():
+    # MySQL returns SUM(amount_cents) as a NEWDECIMAL, read raw as bytes
+    values = _column_to_array([b'12345', b'700', b'-5'], 'decimal')
+    assert values.dtype == np.int64
+    assert values.tolist() == [12345, 700, -5]
+
+def test_decimal_objects_match_the_raw_path():
+    values = _column_to_array([Decimal('12345'), Decimal('700')], 'decimal')
+    assert values.dtype == np.int64
+    assert values.tolist() == [12345, 700]
+
+def test_fractional_decimals_are_kept():
+    # e.g. AVG(amount_cents)
+    assert _column_to_array([b'1234.5', b'700'], 'decimal').tolist() == [1234.5, 700.0]
+
+def test_sqlite_sums_match_the_mysql_path(db):
+    for cents in (12345, 700):
+        add_transaction(db, cents, "Food", "expense", "x", date(2024, 1, 15))
+    arrays = db.fetch_arrays(
+        "SELECT category, SUM(amount_cents) AS total_cents FROM transactions GROUP BY category"
+    )
+    assert arrays['total_cents'].tolist() == [13045]
+    assert arrays['total_cents'].dtype == np.int64
+    assert (_column_to_array([b'13045'], 'decimal') == arrays['total_cents']).all()
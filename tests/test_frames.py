@@ -0,0 +1,102 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from charts import bucket_start, trend_points
+from database import _column_to_array
+from queries import (get_balance_series, get_budget_vs_actual, get_budget_vs_actual_frame, get_transactions_page,
+                     get_transactions_page_frame, search_transactions, search_transactions_frame, set_budget,
+                     write_transactions)
+
+@pytest.fixture
+def ledger(db):
+    rng = random.Random(3)
+    rows = [
+        (rng.randint(100, 50000), rng.choice(["Food", "Transportation"]), rng.choice(["income", "expense"]),
+         rng.choice(["Uber ride", "Lunch", None]), date(2022, 1, 1) + timedelta(days=rng.randint(0, 900)), None)
+        for _ in range(400)
+    ]
+
+    def work(cursor):
+        write_transactions(cursor, db.ledger_id, rows)
+        return True
+
+    assert db.run_in_transaction(work)
+    return db
+
+def records(frame):
+    """A frame's rows as dicts shaped like execute_query's"""
+    rows = frame.to_dict('records')
+    for row in rows:
+        row['date'] = row['date'].date()
+        row['id'] = int(row['id'])
+        row['amount_cents'] = int(row['amount_cents'])
+        if row['description'] != row['description']:
+            row['description'] = None
+    return rows
+
+def test_decimal_and_int_columns_with_nulls_stay_in_cents():
+    decimal = _column_to_array([b'12345', None], 'decimal')
+    integer = _column_to_array([12345, None], 'int')
+    assert decimal.dtype == integer.dtype == np.float64
+    assert decimal[0] == integer[0] == 12345
+    assert np.isnan(decimal[1]) and np.isnan(integer[1])
+
+@pytest.mark.parametrize("filters", [(), (date(2022, 6, 1), date(2024, 1, 31), 'expense', 'Food')])
+def test_page_frames_match_page_rows(ledger, filters):
+    after = None
+    while True:
+        rows = get_transactions_page(ledger, *filters, after=after, page_size=30)
+        frame = get_transactions_page_frame(ledger, *filters, after=after, page_size=30)
+        assert records(frame) == rows
+        if len(rows) < 30:
+            break
+        after = (frame['date'].iloc[-1].date(), int(frame['id'].iloc[-1]))
+
+def test_page_frame_merges_archived_rows(ledger):
+    pytest.importorskip("pyarrow")
+    from archive import archive_closed_years
+
+    archive_closed_years(ledger, keep_years=1, today=date(2024, 6, 30))
+    ledger.cache.clear()
+    after = None
+    for _ in range(20):
+        rows = get_transactions_page(ledger, after=after, page_size=30)
+        frame = get_transactions_page_frame(ledger, after=after, page_size=30)
+        assert records(frame) == rows
+        if len(rows) < 30:
+            break
+        after = (rows[-1]['date'], rows[-1]['id'])
+
+def test_search_frames_match_search_rows(ledger):
+    rows = search_transactions(ledger, "ub", page_size=25)
+    assert rows
+    assert records(search_transactions_frame(ledger, "ub", page_size=25)) == rows
+    assert len(search_transactions_frame(ledger, "  ")) == 0
+
+def test_budget_vs_actual_frame(ledger):
+    set_budget(ledger, "Food", 100000, "2023-03")
+    set_budget(ledger, "Shopping", 5000, "2023-03")
+    rows = get_budget_vs_actual(ledger, "2023-03")
+    frame = get_budget_vs_actual_frame(ledger, "2023-03")
+    assert frame.to_dict('records') == rows
+    # Cached arrays are shared; the frame handed out must be safe to change
+    frame['budget_cents'] = 0
+    assert get_budget_vs_actual_frame(ledger, "2023-03").to_dict('records') == rows
+
+@pytest.mark.parametrize("granularity", ["day", "week", "month"])
+def test_trend_points_match_daily_rows(ledger, granularity):
+    start, end = date(2022, 3, 15), date(2023, 2, 10)
+    expected = {}
+    for row in get_balance_series(ledger, start, end):
+        bucket = expected.setdefault(bucket_start(row['date'], granularity), [0, 0])
+        bucket[0] += row['income_cents']
+        bucket[1] += row['expense_cents']
+    points = trend_points(ledger, start, end, granularity)
+    assert {day: [income, expense] for day, income, expense in points if income or expense} == expected
+    assert points[0][0] == bucket_start(start, granularity)
+    assert trend_points(ledger, date(2030, 1, 1), date(2030, 1, 5), 'day') == [
+        (date(2030, 1, day), 0, 0) for day in range(1, 6)
+    ]
@@ -0,0 +1,43 @@
+import io
+
+from importer import import_statement
+from queries import count_transactions
+
+CSV = """date,description,amount,type,category
+2024-01-05,Coffee,3.50,expense,Food
+2024-01-05,Coffee,3.50,expense,Food
+2024-01-06,Salary,2500.00,income,Salary
+"""
+
+def ofx(*transactions):
+    blocks = "".join(
+        f"<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>{day}<TRNAMT>{amount}<FITID>{fitid}<NAME>{name}</STMTTRN>\n"
+        for fitid, day, amount, name in transactions
+    )
+    return f"OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n{blocks}</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+
+def test_csv_reimport_is_idempotent(db):
+    first = import_statement(db, io.StringIO(CSV))
+    assert (first['inserted'], first['duplicates']) == (3, 0)
+    again = import_statement(db, io.StringIO(CSV))
+    assert (again['inserted'], again['duplicates']) == (0, 3)
+    assert count_transactions(db) == 3
+
+def test_repeated_fitid_within_one_import(db):
+    statement = ofx(("ABC1", "20240105", "-3.50", "Coffee"),
+                    ("ABC1", "20240105", "-3.50", "Coffee"),
+                    ("ABC2", "20240106", "-12.00", "Lunch"))
+    result = import_statement(db, io.StringIO(statement), format='ofx')
+    assert result is not None
+    assert (result['inserted'], result['duplicates']) == (2, 1)
+    assert count_transactions(db) == 2
+
+def test_repeated_fitid_across_batches(db):
+    # Overlapping downloads concatenated into one file, one row per batch
+    statement = ofx(("A", "20240105", "-1.00", "One"), ("B", "20240106", "-2.00", "Two")) + \
+        ofx(("B", "20240106", "-2.00", "Two"), ("C", "20240107", "-3.00", "Three"))
+    result = import_statement(db, io.StringIO(statement), format='ofx', batch_size=1)
+    assert result is not None
+    assert (result['inserted'], result['duplicates']) == (3, 1)
+    again = import_statement(db, io.StringIO(statement), format='ofx', batch_size=1)
+    assert (again['inserted'], again['duplicates']) == (0, 4)
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+import pytest
+
+import migrations
+from backends import SQLiteBackend
+from money import cents_to_str, format_cents, format_cents_column, to_cents, to_dollars
+
+def test_to_cents_rounds_half_to_even():
+    assert to_cents("0.125") == 12
+    assert to_cents("0.135") == 14
+    assert to_cents("-0.125") == -12
+    assert to_cents("2.675") == 268
+    assert to_cents(Decimal("10.005")) == 1000
+
+def test_to_cents_reads_floats_through_repr():
+    # 0.1 + 0.2 is 0.30000000000000004 in binary, but still 30 cents
+    assert to_cents(0.1 + 0.2) == 30
+    assert to_cents(19.99) == 1999
+    assert to_cents(1.005) == 100
+    assert to_cents(-0.07) == -7
+
+def test_to_cents_accepts_ints_negatives_and_strings():
+    assert to_cents(12) == 1200
+    assert to_cents("-45.6") == -4560
+    assert to_cents(" 3.50 ") == 350
+    assert to_cents("99999999999.99") == 9999999999999
+
+@pytest.mark.parametrize("value", ["", "abc", "1.2.3", None, "NaN", "Infinity", float("inf")])
+def test_to_cents_rejects_invalid_amounts(value):
+    with pytest.raises(ValueError):
+        to_cents(value)
+
+def test_to_dollars_is_exact():
+    assert to_dollars(1) == Decimal("0.01")
+    assert to_dollars(-1234567) == Decimal("-12345.67")
+    assert sum(to_dollars(10) for _ in range(10)) == Decimal("1.00")
+
+@pytest.mark.parametrize("cents, plain, display", [
+    (0, "0.00", "$0.00"),
+    (5, "0.05", "$0.05"),
+    (-5, "-0.05", "-$0.05"),
+    (1999, "19.99", "$19.99"),
+    (-100, "-1.00", "-$1.00"),
+    (1234567, "12345.67", "$12,345.67"),
+    (9999999999999, "99999999999.99", "$99,999,999,999.99"),
+])
+def test_formatting(cents, plain, display):
+    assert cents_to_str(cents) == plain
+    assert format_cents(cents) == display
+    assert to_cents(cents_to_str(cents)) == cents
+
+def test_format_cents_column_matches_format_cents():
+    values = [0, 5, -5, 1999, -100, 1234567, 9999999999999, -9999999999999]
+    assert format_cents_column(values) == [format_cents(value) for value in values]
+    assert format_cents_column([]) == []
+
+def test_migration_6_converts_decimal_amounts_to_cents(sqlite_env, monkeypatch):
+    amounts = ["0.10", "0.29", "19.99", "-5.05", "1234567.89", "99999999.99", "0.01"]
+    backend = SQLiteBackend()
+    conn = backend.connect()
+    cursor = backend.cursor(conn)
+    for statement in backend.schema:
+        cursor.execute(statement)
+    for i, amount in enumerate(amounts):
+        cursor.execute(
+            "INSERT INTO transactions (amount, category, type, description, date) VALUES (%s, %s, %s, %s, %s)",
+            (Decimal(amount), "Food", "expense", f"row {i}", "2024-01-15")
+        )
+        cursor.execute(
+            "INSERT INTO budgets (category, amount, month) VALUES (%s, %s, %s)",
+            (f"Budget {i}", Decimal(amount), "2024-01")
+        )
+
+    # Stop at version 6, before any later table rewrites
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [m for m in migrations.MIGRATIONS if m[0] <= 6])
+    assert migrations.apply_migrations(conn, backend) == [1, 2, 3, 4, 5, 6]
+
+    cursor.execute("SELECT amount_cents FROM transactions ORDER BY id")
+    expected = [to_cents(amount) for amount in amounts]
+    assert [row[0] for row in cursor.fetchall()] == expected
+    cursor.execute("SELECT amount_cents FROM budgets ORDER BY id")
+    assert [row[0] for row in cursor.fetchall()] == expected
+    cursor.execute("SELECT total_cents FROM monthly_category_totals")
+    assert [row[0] for row in cursor.fetchall()] == [sum(expected)]
+    cursor.execute("SELECT typeof(amount_cents) FROM transactions GROUP BY 1")
+    assert cursor.fetchall() == [("integer",)]
+    cursor.close()
+    conn.close()
@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from queries import get_transactions, get_transactions_summary
+from recurring import add_rule, get_rules, occurrences, post_due, preview
+
+def _rent(db, start=date(2024, 1, 31), **kwargs):
+    rule_id = add_rule(db, "Rent", "Housing", "expense", 120000, 'monthly', start, **kwargs)
+    assert rule_id is not None
+    return rule_id
+
+def test_month_end_start_is_clamped_and_returns():
+    rule = {'start_date': date(2024, 1, 31), 'frequency': 'monthly', 'interval_count': 1, 'end_date': None}
+    assert list(occurrences(rule, date(2024, 1, 1), date(2024, 4, 30))) == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)
+    ]
+
+def test_invalid_rules_are_refused(db):
+    with pytest.raises(ValueError):
+        add_rule(db, "Rent", "Housing", "expense", 120000, 'daily', date(2024, 1, 1))
+    with pytest.raises(ValueError):
+        add_rule(db, "Rent", "Housing", "expense", 120000, 'monthly', date(2024, 1, 1),
+                 end_date=date(2023, 12, 31))
+
+def test_catch_up_posts_every_missed_occurrence_once(db):
+    _rent(db)
+    add_rule(db, "Gym", "Health", "expense", 2500, 'weekly', date(2024, 6, 3), interval_count=2)
+
+    assert post_due(db, through=date(2024, 6, 30)) == {'posted': 8, 'duplicates': 0, 'rules': 2}
+    rows = get_transactions(db)
+    assert sorted(row['date'] for row in rows if row['description'] == "Rent") == [
+        date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31),
+        date(2024, 4, 30), date(2024, 5, 31), date(2024, 6, 30)
+    ]
+    assert sorted(row['date'] for row in rows if row['description'] == "Gym") == [
+        date(2024, 6, 3), date(2024, 6, 17)
+    ]
+    assert {rule['description']: rule['next_date'] for rule in get_rules(db)} == {
+        "Rent": date(2024, 7, 31), "Gym": date(2024, 7, 1)
+    }
+    # Posted occurrences reach the rollup too
+    summary = get_transactions_summary(db, date(2024, 1, 1), date(2024, 6, 30))
+    assert {row['category']: row['total_cents'] for row in summary} == {"Housing": 720000, "Health": 5000}
+
+    assert post_due(db, through=date(2024, 6, 30)) == {'posted': 0, 'duplicates': 0, 'rules': 0}
+    assert len(get_transactions(db)) == 8
+
+def test_reposting_an_occurrence_counts_as_duplicate(db):
+    _rent(db)
+    assert post_due(db, through=date(2024, 3, 31))['posted'] == 3
+    # A scheduler that lost its place would walk the same dates again
+    assert db.execute_query("UPDATE recurring_rules SET next_date = %s", (date(2024, 1, 31),)) is not None
+    db.invalidate(['recurring'])
+
+    assert post_due(db, through=date(2024, 4, 30)) == {'posted': 1, 'duplicates': 3, 'rules': 1}
+    assert len(get_transactions(db)) == 4
+
+def test_end_date_stops_posting(db):
+    _rent(db, end_date=date(2024, 3, 15))
+    assert post_due(db, through=date(2024, 6, 30))['posted'] == 2
+    assert post_due(db, through=date(2024, 12, 31))['rules'] == 0
+
+def test_preview_starts_at_next_date_and_writes_nothing(db):
+    _rent(db)
+    assert post_due(db, through=date(2024, 2, 29))['posted'] == 2
+
+    items = preview(db, date(2024, 1, 1), date(2024, 4, 30))
+    assert [item['date'] for item in items] == [date(2024, 3, 31), date(2024, 4, 30)]
+    assert all(item['amount_cents'] == 120000 for item in items)
+    assert len(get_transactions(db)) == 2
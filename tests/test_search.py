@@ -0,0 +1,38 @@
+from datetime import date
+
+from queries import add_transaction, create_ledger, search_totals, search_transactions
+
+def _add(db, description, cents=1000, day=15):
+    assert add_transaction(db, cents, "Food", "expense", description, date(2024, 1, day)) is not None
+
+def test_numeric_search_matches_descriptions_only(db):
+    # The default ledger holds every row, so the index is read unnarrowed
+    _add(db, "Coffee")
+    _add(db, "Groceries")
+    _add(db, "Bus ticket 12", cents=250)
+
+    rows = search_transactions(db, "1")
+    assert [row['description'] for row in rows] == ["Bus ticket 12"]
+    assert search_totals(db, "1") == {'transaction_count': 1, 'income_cents': 0, 'expense_cents': 250}
+    assert search_transactions(db, "12")[0]['description'] == "Bus ticket 12"
+    assert search_transactions(db, "3") == []
+
+def test_word_prefix_search(db):
+    _add(db, "Uber ride home", day=10)
+    _add(db, "Uber eats", day=11)
+    _add(db, "Rideshare refund", day=12)
+
+    assert [row['description'] for row in search_transactions(db, "ub")] == ["Uber eats", "Uber ride home"]
+    assert [row['description'] for row in search_transactions(db, "ub ride")] == ["Uber ride home"]
+
+def test_numeric_search_in_a_small_ledger(db):
+    # A ledger with few of the rows has the index narrowed to its own token
+    for day in range(1, 6):
+        _add(db, f"Rent {day}", day=day)
+    small = db.for_ledger(create_ledger(db, "Business"))
+    _add(small, "Invoice 2")
+    _add(small, "Office supplies")
+
+    assert [row['description'] for row in search_transactions(small, "2")] == ["Invoice 2"]
+    assert search_totals(small, "2")['transaction_count'] == 1
+    assert [row['description'] for row in search_transactions(db, "2")] == ["Rent 2"]